@@ -1,4 +1,4 @@
-import { fileService, resultService, schedulerService } from "../lib/api.js";
+import { fileService, resultService, schedulerService, getPage } from "../lib/api.js";
 
 export async function getSubmissionsByTask(req, res) {
   try {
@@ -8,10 +8,11 @@ export async function getSubmissionsByTask(req, res) {
       return res.status(400).json({ message: "Task ID is required" });
     }
 
-    const response = await schedulerService.get(`/api/jobs/?task_id=${taskId}`);
+    const { items, next } = await getPage(schedulerService, `/api/jobs/?task_id=${taskId}`, req.query);
     res.status(200).json({
       message: "Submissions retrieved successfully",
-      data: response.data,
+      data: items,
+      next,
     });
   } catch (error) {
     console.error("Error fetching submissions by task:", error);
@@ -29,10 +30,15 @@ export async function getSubmissionByGroup(req, res) {
       return res.status(400).json({ message: "Task ID and Group ID are required" });
     }
 
-    const response = await schedulerService.get(`/api/jobs/?task_id=${taskId}&group_id=${groupId}`);
+    const { items, next } = await getPage(
+      schedulerService,
+      `/api/jobs/?task_id=${taskId}&group_id=${groupId}`,
+      req.query,
+    );
     res.status(200).json({
       message: "Submissions retrieved successfully",
-      data: response.data,
+      data: items,
+      next,
     });
   } catch (error) {
     console.error("Error fetching submissions by group:", error);
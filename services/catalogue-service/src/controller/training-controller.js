@@ -1,4 +1,4 @@
-import { schedulerService, resultService } from "../lib/api.js";
+import { schedulerService, resultService, getPage } from "../lib/api.js";
 
 export async function getTrainingJobByGroup(req, res) {
     try {
@@ -8,10 +8,15 @@ export async function getTrainingJobByGroup(req, res) {
             return res.status(400).json({ message: "Task ID and Group ID are required" });
         }
 
-        const response = await schedulerService.get(`/api/training_jobs/?task_id=${taskId}&group_id=${groupId}`);
+        const { items, next } = await getPage(
+            schedulerService,
+            `/api/training_jobs/?task_id=${taskId}&group_id=${groupId}`,
+            req.query,
+        );
         res.status(200).json({
             message: "Training jobs retrieved successfully",
-            data: response.data,
+            data: items,
+            next,
         });
     } catch (error) {
         console.error("Error fetching training jobs by group:", error);
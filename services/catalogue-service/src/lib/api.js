@@ -32,3 +32,31 @@ export const resultService = axios.create({
     "Content-Type": "application/json",
   },
 });
+
+/**
+ * GET one page of a paginated list endpoint (DRF cursor pagination), newest first.
+ * The `cursor`, `page_size` and `status` query parameters of the incoming request
+ * are passed through, so that a client polling the first page costs a single
+ * index range scan however long the history is, and asks for older pages only
+ * when it needs them.
+ * @param service - The axios instance of the service.
+ * @param url - The URL of the list endpoint, with its filters.
+ * @param query - The query parameters of the incoming request.
+ * @returns The items of the page, and the cursor of the next (older) page or null.
+ */
+export async function getPage(service, url, query = {}) {
+  const params = {};
+  for (const name of ["cursor", "page_size", "status"]) {
+    if (typeof query[name] === "string" && query[name] !== "") {
+      params[name] = query[name];
+    }
+  }
+  const response = await service.get(url, { params });
+  if (Array.isArray(response.data)) {
+    return { items: response.data, next: null };
+  }
+  const next = response.data.next
+    ? new URL(response.data.next).searchParams.get("cursor")
+    : null;
+  return { items: response.data.results, next };
+}
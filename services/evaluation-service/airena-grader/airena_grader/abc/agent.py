@@ -13,6 +13,16 @@ class Agent(metaclass=ABCMeta):
         """
         pass
 
+    def step_batch(self, states):
+        """Returns actions from states observed in independent episodes at the same time,
+        as in `VectorReinforcementLearningTestCase`. Override this to batch the inference;
+        by default `step` is called on every state.
+
+        :param states: batch of states, as returned by a vector environment
+        :return: one action per state
+        """
+        return [self.step(state) for state in states]
+
     @abstractmethod
     def reset(self):
         """Resets internal state of this agent.
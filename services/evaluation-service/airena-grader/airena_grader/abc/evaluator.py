@@ -1,4 +1,7 @@
 from abc import ABCMeta, abstractmethod
+from typing import Optional
+
+from ..trajectory import STEP_FIELDS, Trajectory
 
 
 class EvaluationResult:
@@ -8,24 +11,28 @@ class EvaluationResult:
     `value` store a single cumulative score for all episodes.
     """
 
-    def __init__(self, value, error, name: str = "score", results=None):
+    def __init__(self, value, error, name: str = "score", results=None, timing: Optional[dict] = None):
         if results is None:
             results = []
         self.name = name
         self.results = results
         self.value = value
         self.error = error
+        self.timing = timing  # time spent by the agent and the environment, see `TimeBudget.get_json`
 
     def __str__(self):
         return str(self.get_json())
 
     def get_json(self) -> dict:
-        return {
+        json = {
             "name": self.name,
             "detail": self.results,
             "value": self.value,
             "error": repr(self.error),
         }
+        if self.timing is not None:
+            json["timing"] = self.timing
+        return json
 
 
 class Evaluator(metaclass=ABCMeta):
@@ -66,6 +73,17 @@ class Evaluator(metaclass=ABCMeta):
         """
         pass
 
+    def merge(self, other: "Evaluator") -> None:
+        """Adds the records of `other`, an Evaluator of the same class that recorded the episodes
+        following the episodes of this one (e.g. in another process) - used to run the episodes of
+        a test case in parallel. Merging must give the same result as recording all the episodes
+        with this Evaluator, up to the rounding of floating-point aggregates.
+
+        :param other: an Evaluator
+        :return: None
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support merge")
+
     def terminate(self, e: Exception) -> None:
         """Terminates this Evaluator due to errors.
 
@@ -73,3 +91,34 @@ class Evaluator(metaclass=ABCMeta):
         :return: None
         """
         self.error = e
+
+
+class TrajectoryEvaluator(Evaluator, metaclass=ABCMeta):
+    """Abstract base class for Evaluators computing their results from whole episodes: steps are
+    stored in a columnar `Trajectory` (`self.trajectory`) and `get_result` works on its arrays,
+    e.g. `self.trajectory.episode(i)["reward"]`.
+
+    Test cases give the steps to `record`, without building a dict per step.
+    """
+
+    def __init__(self, trajectory: Optional[Trajectory] = None):
+        """
+        :param trajectory: where to store the steps, e.g. `Trajectory(fields=("reward", "done"))` to
+        store only what is needed, default as every field but `info`, in memory
+        """
+        super().__init__()
+        self.trajectory = Trajectory() if trajectory is None else trajectory
+
+    def reset(self) -> None:
+        self.trajectory.start_episode()
+
+    def step(self, full_state: dict) -> None:
+        self.trajectory.append(*(full_state.get(field) for field in STEP_FIELDS))
+
+    def record(self, state, action, reward, next_state, done, info, episode_count, t) -> None:
+        """Same as `step` with the fields of `full_state` as arguments."""
+        self.trajectory.append(state, action, reward, next_state, done, info, episode_count, t)
+
+    def merge(self, other: "TrajectoryEvaluator") -> None:
+        self.trajectory.merge(other.trajectory)
+        self.error = self.error or other.error
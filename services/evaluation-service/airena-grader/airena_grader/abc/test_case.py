@@ -5,7 +5,7 @@ import gymnasium as gym
 
 from .agent import Agent
 from .evaluator import Evaluator, EvaluationResult
-from .util import time_limiter
+from .util import TimeBudget, time_limiter
 
 
 class TestCase(metaclass=ABCMeta):
@@ -22,7 +22,7 @@ class TestCase(metaclass=ABCMeta):
     ):
         """
         :param case_id:
-        :param time_limit: time limit in seconds
+        :param time_limit: time limit in seconds, fractions allowed, 0 for no limit
         :param n_runs: number of episodes to run
         :param agent_init: init params passed to __init__ method of Agent
         :param env: OpenAI Gym compatible environment
@@ -34,6 +34,8 @@ class TestCase(metaclass=ABCMeta):
         self._agent_init = {} if agent_init is None else agent_init
         self.env = env
         self.evaluator = evaluator
+        # time spent by the agent and the environment, `run` implementations charge their calls to it
+        self.budget = TimeBudget(time_limit)
 
     @abstractmethod
     def run(self, agent) -> EvaluationResult:
@@ -49,14 +51,18 @@ class TestCase(metaclass=ABCMeta):
         with `evaluator` attached.
 
         :param create_agent: a function that returns an Agent
-        :return: EvaluationResult
+        :return: EvaluationResult, with the time used by the agent and the environment in `timing`
         """
+        self.budget = TimeBudget(self.time_limit)
         try:
-            with time_limiter(self.time_limit):
-                agent = create_agent(**self._agent_init)
-                return self.run(agent)
+            with self.budget.total, time_limiter(self.time_limit):
+                with self.budget.agent:
+                    agent = create_agent(**self._agent_init)
+                result = self.run(agent)
         except Exception as e:
-            return self._terminate(e)
+            result = self._terminate(e)
+        result.timing = self.budget.get_json()
+        return result
 
     def _terminate(self, e: Exception) -> EvaluationResult:
         self.evaluator.terminate(e)
@@ -1,20 +1,151 @@
+import ctypes
 import signal
+import threading
+import time
 from contextlib import contextmanager
+from typing import Optional
 
 from .exception import TimeoutException
 
 
+class TimeMeter:
+    """Wall time and CPU time spent in its `with` blocks, e.g. `with budget.agent: agent.step(state)`.
+
+    CPU time is the time of the calling thread (`time.thread_time`), so that test cases running in
+    threads are not charged for each other; the CPU time of threads started by the agent or the
+    environment is not counted.
+    """
+
+    __slots__ = ("wall", "cpu", "_wall_start", "_cpu_start")
+
+    def __init__(self):
+        self.wall = 0.0
+        self.cpu = 0.0
+        self._wall_start = 0.0
+        self._cpu_start = 0.0
+
+    def __enter__(self):
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.cpu += time.thread_time() - self._cpu_start
+        self.wall += time.perf_counter() - self._wall_start
+
+    def merge(self, other: "TimeMeter"):
+        self.wall += other.wall
+        self.cpu += other.cpu
+
+    def get_json(self, limit: Optional[float] = None) -> dict:
+        json = {"wall": self.wall, "cpu": self.cpu}
+        if limit:
+            json["budget"] = self.wall / limit  # share of the time limit
+        return json
+
+
+class TimeBudget:
+    """Time limit of a test case, and the time spent in it by the agent and by the environment.
+
+    `total` covers the whole evaluation, `agent` the calls to the agent (including its creation) and
+    `env` the calls to the environment (including the wait for a remote judge); the rest is spent
+    by the test case and the evaluator. With episodes run by several processes, the times of the
+    workers are summed into `agent` and `env`.
+    """
+
+    def __init__(self, seconds: Optional[float] = None):
+        """
+        :param seconds: time limit in seconds, None or 0 for no limit
+        """
+        self.seconds = seconds
+        self.total = TimeMeter()
+        self.agent = TimeMeter()
+        self.env = TimeMeter()
+
+    def merge(self, other: "TimeBudget"):
+        """Add the agent and environment times of `other`, e.g. of a worker process."""
+        self.agent.merge(other.agent)
+        self.env.merge(other.env)
+
+    def get_json(self) -> dict:
+        return {
+            "limit": self.seconds,
+            "total": self.total.get_json(self.seconds),
+            "agent": self.agent.get_json(self.seconds),
+            "env": self.env.get_json(self.seconds),
+        }
+
+
+def _set_async_exc(thread_id: int, exc_type) -> int:
+    """Raise `exc_type` in the thread `thread_id` at its next bytecode, or cancel it if `exc_type` is None."""
+    exc = None if exc_type is None else ctypes.py_object(exc_type)  # None is passed as NULL
+    return ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(thread_id), exc)
+
+
+def _can_use_itimer() -> bool:
+    """:return: True if SIGALRM is free: main thread, default handler and no interval timer running"""
+    return (
+        hasattr(signal, "setitimer")
+        and threading.current_thread() is threading.main_thread()
+        and signal.getsignal(signal.SIGALRM) in (signal.SIG_DFL, signal.SIG_IGN)
+        and signal.getitimer(signal.ITIMER_REAL)[0] == 0
+    )
+
+
 @contextmanager
-def time_limiter(seconds):
-    # Reference: https://stackoverflow.com/a/601168
-    if seconds:
+def time_limiter(seconds: Optional[float]):
+    """Raise `TimeoutException` in the calling thread if its block runs for more than `seconds`.
+
+    In the main thread, when SIGALRM is not used by anyone else, the deadline is enforced by an
+    interval timer (`signal.setitimer`); otherwise (other threads, nested limits, SIGALRM handler
+    already installed) by a timer thread raising the exception asynchronously in the calling thread.
+    The previous SIGALRM handler is restored on exit.
+
+    Either way, the exception is raised between two Python bytecodes: code blocked in a C extension
+    is interrupted only when it returns. Such code can only be stopped by running the test case in
+    a process that is killed, see `TestSuite.run(n_workers=...)`.
+
+    :param seconds: time limit in seconds (fractions allowed), None or 0 for no limit
+    """
+    if not seconds:
+        yield
+        return
+    if _can_use_itimer():
 
         def signal_handler(signum, frame):
             raise TimeoutException("Timed out!")
 
-        signal.signal(signal.SIGALRM, signal_handler)
-        signal.alarm(seconds)
+        previous_handler = signal.signal(signal.SIGALRM, signal_handler)
+        signal.setitimer(signal.ITIMER_REAL, seconds)
+        try:
+            yield
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+        return
+
+    thread_id = threading.get_ident()
+    lock = threading.Lock()
+    active = True
+    expired = False
+
+    def expire():
+        nonlocal expired
+        with lock:
+            if active:
+                expired = True
+                _set_async_exc(thread_id, TimeoutException)
+
+    timer = threading.Timer(seconds, expire)
+    timer.daemon = True
+    timer.start()
     try:
         yield
     finally:
-        signal.alarm(0)
+        with lock:
+            active = False
+            if expired:
+                _set_async_exc(thread_id, None)  # not raised yet, e.g. the block ended meanwhile
+        timer.cancel()
+    if expired:
+        raise TimeoutException("Timed out!")
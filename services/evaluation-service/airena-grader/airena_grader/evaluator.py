@@ -1,4 +1,10 @@
-from .abc.evaluator import Evaluator, EvaluationResult
+from typing import Optional, Sequence
+
+import numpy as np
+
+from .abc.evaluator import Evaluator, EvaluationResult, TrajectoryEvaluator
+from .stats import MinMax, P2Quantile, RecordBuffer, RunningSum, Welford
+from .trajectory import Trajectory
 
 
 class RewardEvaluator(Evaluator):
@@ -6,20 +12,26 @@ class RewardEvaluator(Evaluator):
 
     def __init__(self):
         super().__init__()
-        self.episodes = []
+        self.episodes = []  # total reward of each episode, one `RunningSum` per episode
 
     def reset(self) -> None:
-        self.episodes.append([])
+        self.episodes.append(RunningSum())
 
     def step(self, full_state) -> None:
-        self.episodes[-1].append(full_state["reward"])
+        self.episodes[-1].add(full_state["reward"])
+
+    def merge(self, other: "RewardEvaluator") -> None:
+        self.episodes.extend(other.episodes)
+        self.error = self.error or other.error
 
     def get_result(self) -> EvaluationResult:
-        total_reward_per_episode = [sum(r) for r in self.episodes]
-        total_reward = sum(total_reward_per_episode)
+        total_reward_per_episode = [r.value for r in self.episodes]
+        total_reward = RunningSum()
+        for r in total_reward_per_episode:
+            total_reward.add(r)
         return EvaluationResult(
             name="reward evaluation",
-            value=total_reward / len(self.episodes),
+            value=total_reward.value / len(self.episodes) if self.episodes else 0,
             results=total_reward_per_episode,
             error=self.error,
         )
@@ -39,13 +51,129 @@ class StepCountEvaluator(Evaluator):
     def step(self, full_state) -> None:
         self.total_steps += 1
 
+    def merge(self, other: "StepCountEvaluator") -> None:
+        self.total_episodes += other.total_episodes
+        self.total_steps += other.total_steps
+        self.error = self.error or other.error
+
     def get_result(self) -> EvaluationResult:
         return EvaluationResult(
             name="step count evaluation (average survival steps)",
-            value=self.total_steps / self.total_episodes,
+            value=self.total_steps / self.total_episodes if self.total_episodes else 0,
             results={
                 "total_episodes": self.total_episodes,
                 "total_steps": self.total_steps,
             },
             error=self.error,
         )
+
+
+class RewardStatsEvaluator(Evaluator):
+    """Evaluates average reward across episodes, with statistics of the episode rewards and of the
+    step rewards.
+
+    Memory is O(1) per step: the rewards of the steps are aggregated as they come (mean, standard
+    deviation, min, max, and estimates of `step_quantiles`), only the total reward of each episode
+    is kept. Set `record_steps` to also keep every step reward in `records` (a `RecordBuffer`).
+    """
+
+    def __init__(
+        self,
+        quantiles: Sequence[float] = (0.05, 0.5, 0.95),
+        step_quantiles: Sequence[float] = (),
+        record_steps: bool = False,
+    ):
+        """
+        :param quantiles: quantiles of the episode rewards to report (exact)
+        :param step_quantiles: quantiles of the step rewards to report (P² estimates, which cannot
+        be merged: leave empty to run the episodes of a test case in parallel)
+        :param record_steps: whether to keep every step reward
+        """
+        super().__init__()
+        self.quantiles = tuple(quantiles)
+        self.episodes = []  # total reward of each episode, one `RunningSum` per episode
+        self.step_stats = Welford()
+        self.step_range = MinMax()
+        self.step_quantiles = [P2Quantile(q) for q in step_quantiles]
+        self.records = RecordBuffer() if record_steps else None
+
+    def reset(self) -> None:
+        self.episodes.append(RunningSum())
+        if self.records is not None:
+            self.records.reset()
+
+    def step(self, full_state) -> None:
+        reward = float(full_state["reward"])
+        self.episodes[-1].add(reward)
+        self.step_stats.add(reward)
+        self.step_range.add(reward)
+        for quantile in self.step_quantiles:
+            quantile.add(reward)
+        if self.records is not None:
+            self.records.add(reward)
+
+    def merge(self, other: "RewardStatsEvaluator") -> None:
+        if self.step_quantiles:
+            raise NotImplementedError("step quantile estimates cannot be merged")
+        self.episodes.extend(other.episodes)
+        self.step_stats.merge(other.step_stats)
+        self.step_range.merge(other.step_range)
+        if self.records is not None:
+            self.records.merge(other.records)
+        self.error = self.error or other.error
+
+    def get_result(self) -> EvaluationResult:
+        episode_rewards = np.array([r.value for r in self.episodes], dtype=np.float64)
+        if len(episode_rewards):
+            episodes = {
+                "mean": float(np.mean(episode_rewards)),
+                "std": float(np.std(episode_rewards)),
+                "min": float(np.min(episode_rewards)),
+                "max": float(np.max(episode_rewards)),
+                "quantiles": {str(q): float(np.quantile(episode_rewards, q)) for q in self.quantiles},
+            }
+        else:
+            episodes = {}
+        steps = {"count": self.step_stats.count}
+        if self.step_stats.count:
+            steps.update(
+                mean=self.step_stats.mean,
+                std=self.step_stats.std,
+                min=self.step_range.min,
+                max=self.step_range.max,
+                quantiles={str(quantile.q): quantile.value for quantile in self.step_quantiles},
+            )
+        return EvaluationResult(
+            name="reward statistics evaluation",
+            value=episodes.get("mean", 0),
+            results={
+                "total_episodes": len(episode_rewards),
+                "episode_rewards": episodes,
+                "step_rewards": steps,
+            },
+            error=self.error,
+        )
+
+
+class DiscountedReturnEvaluator(TrajectoryEvaluator):
+    """Evaluates average discounted return across episodes, computed on whole episodes at once."""
+
+    def __init__(self, gamma: float = 0.99, trajectory: Optional[Trajectory] = None):
+        """
+        :param gamma: discount factor
+        :param trajectory: where to store the steps, default as only the rewards, in memory
+        """
+        super().__init__(Trajectory(fields=("reward",)) if trajectory is None else trajectory)
+        self.gamma = gamma
+
+    def get_result(self) -> EvaluationResult:
+        returns = []
+        for episode in self.trajectory.episodes():
+            rewards = np.asarray(episode["reward"], dtype=np.float64)
+            returns.append(float(np.dot(rewards, self.gamma ** np.arange(len(rewards)))))
+        return EvaluationResult(
+            name=f"discounted return evaluation (gamma {self.gamma})",
+            value=float(np.mean(returns)) if returns else 0,
+            results=returns,
+            error=self.error,
+        )
@@ -0,0 +1,206 @@
+"""
+Streaming aggregates used by the evaluators: O(1) memory whatever the number of values added, except
+`RecordBuffer`, which keeps every value in a compact NumPy array.
+"""
+import math
+from typing import Optional
+
+import numpy as np
+
+
+class RunningSum:
+    """Sum with Neumaier compensation: the rounding error does not grow with the number of values."""
+
+    __slots__ = ("_sum", "_compensation")
+
+    def __init__(self):
+        self._sum = 0.0
+        self._compensation = 0.0
+
+    def add(self, value: float):
+        value = float(value)
+        total = self._sum + value
+        if abs(self._sum) >= abs(value):
+            self._compensation += (self._sum - total) + value
+        else:
+            self._compensation += (value - total) + self._sum
+        self._sum = total
+
+    def merge(self, other: "RunningSum"):
+        self.add(other._sum)
+        self._compensation += other._compensation
+
+    @property
+    def value(self) -> float:
+        return self._sum + self._compensation
+
+
+class Welford:
+    """Count, mean and variance with Welford's algorithm, merged with Chan's formula."""
+
+    __slots__ = ("count", "mean", "_m2")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0  # sum of the squared differences to the mean
+
+    def add(self, value: float):
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    def merge(self, other: "Welford"):
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self._m2 += other._m2 + delta * delta * self.count * other.count / count
+        self.count = count
+
+    @property
+    def variance(self) -> float:
+        """:return: population variance, 0 with less than 2 values"""
+        return self._m2 / self.count if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+
+class MinMax:
+    __slots__ = ("min", "max")
+
+    def __init__(self):
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float):
+        value = float(value)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "MinMax"):
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+
+class P2Quantile:
+    """
+    Estimate of the `q`-quantile with the P² algorithm (Jain & Chlamtac, 1985): five markers, O(1)
+    memory and time per value. Exact for up to 5 values. Estimates cannot be merged.
+    """
+
+    __slots__ = ("q", "_heights", "_positions", "_desired", "_increments")
+
+    def __init__(self, q: float):
+        assert 0 < q < 1
+        self.q = q
+        self._heights = []
+        self._positions = [1, 2, 3, 4, 5]
+        self._desired = [1, 1 + 2 * q, 1 + 4 * q, 3 + 2 * q, 5]
+        self._increments = [0, q / 2, q, (1 + q) / 2, 1]
+
+    def add(self, value: float):
+        value = float(value)
+        heights = self._heights
+        if len(heights) < 5:
+            heights.append(value)
+            heights.sort()
+            return
+        if value < heights[0]:
+            heights[0] = value
+            k = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            k = 3
+        else:
+            k = 0
+            while value >= heights[k + 1]:
+                k += 1
+        positions = self._positions
+        for i in range(k + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+        for i in range(1, 4):
+            d = self._desired[i] - positions[i]
+            if (d >= 1 and positions[i + 1] - positions[i] > 1) or (d <= -1 and positions[i - 1] - positions[i] < -1):
+                d = 1 if d > 0 else -1
+                height = self._parabolic(i, d)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = self._linear(i, d)
+                heights[i] = height
+                positions[i] += d
+
+    def _parabolic(self, i: int, d: int) -> float:
+        h, n = self._heights, self._positions
+        return h[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (h[i + 1] - h[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (h[i] - h[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def _linear(self, i: int, d: int) -> float:
+        h, n = self._heights, self._positions
+        return h[i] + d * (h[i + d] - h[i]) / (n[i + d] - n[i])
+
+    @property
+    def value(self) -> Optional[float]:
+        """:return: the estimate, None without values"""
+        heights = self._heights
+        if not heights:
+            return None
+        if len(heights) < 5:
+            return float(np.quantile(heights, self.q))
+        return heights[2]
+
+
+class RecordBuffer:
+    """
+    Per-step values of every episode in one growable NumPy array (8 bytes per float64 value instead
+    of a boxed float in a list), for evaluators that need the detail of the steps.
+    """
+
+    def __init__(self, dtype=np.float64, capacity: int = 1024):
+        self._data = np.empty(capacity, dtype=dtype)
+        self._size = 0
+        self._episode_starts = []
+
+    def reset(self):
+        """Start the records of a new episode."""
+        self._episode_starts.append(self._size)
+
+    def add(self, value):
+        if self._size == len(self._data):
+            self._data = np.resize(self._data, 2 * len(self._data))
+        self._data[self._size] = value
+        self._size += 1
+
+    def merge(self, other: "RecordBuffer"):
+        values = other.values
+        size = self._size + len(values)
+        if size > len(self._data):
+            self._data = np.resize(self._data, max(size, 2 * len(self._data)))
+        self._data[self._size:size] = values
+        self._episode_starts.extend(start + self._size for start in other._episode_starts)
+        self._size = size
+
+    @property
+    def values(self) -> np.ndarray:
+        """:return: values of all the episodes, a view valid until the next `add`"""
+        return self._data[:self._size]
+
+    @property
+    def n_episodes(self) -> int:
+        return len(self._episode_starts)
+
+    def episode(self, i: int) -> np.ndarray:
+        """:return: values of the `i`-th episode, a view valid until the next `add`"""
+        starts = self._episode_starts
+        stop = starts[i + 1] if i + 1 < len(starts) else self._size
+        return self._data[starts[i]:stop]
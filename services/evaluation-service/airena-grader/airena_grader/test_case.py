@@ -1,9 +1,24 @@
-from typing import List
+import copy
+import multiprocessing
+from typing import Callable, List, Optional
 
 import gymnasium as gym
+import numpy as np
+from gymnasium.vector.utils import iterate
 
 from .abc.evaluator import Evaluator
 from .abc.test_case import TestCase
+from .abc.util import TimeBudget
+from .trajectory import STEP_FIELDS
+
+
+def _record_step(evaluator: Evaluator, step: tuple):
+    """Give `step` (the values of `STEP_FIELDS`) to `evaluator`, without a dict if it has `record`."""
+    record = getattr(evaluator, "record", None)
+    if record is not None:
+        record(*step)
+    else:
+        evaluator.step(dict(zip(STEP_FIELDS, step)))
 
 
 class ReinforcementLearningTestCase(TestCase):
@@ -17,12 +32,20 @@ class ReinforcementLearningTestCase(TestCase):
         env: gym.Env,
         evaluator: Evaluator,
         agent_init: dict = None,
+        n_workers: int = 1,
+        make_env: Optional[Callable[[], gym.Env]] = None,
     ):
         """
         Additional params please refer to `TestCase` base class.
 
         :param t_max: maximum steps per episode
         :param seeds: list of seeds for every episode, either empty or same length as n_runs
+        :param n_workers: number of processes running episodes at the same time. With more than 1,
+        the episodes are split in `n_workers` consecutive shards, each run in a forked process with
+        its own environment from `make_env`, a copy of the agent and a copy of `evaluator`; the
+        copies of the evaluator are merged in episode order (see `Evaluator.merge`)
+        :param make_env: returns a new environment (e.g. an `AgentEnv` of a new judge), called in
+        each worker process, required if `n_workers` > 1
         """
         super().__init__(case_id, time_limit, n_runs, agent_init, env, evaluator)
         self.t_max = t_max
@@ -32,31 +55,232 @@ class ReinforcementLearningTestCase(TestCase):
             assert (
                 len(self.seeds) == self.n_runs
             )  # provide fixed random seed for each episode
+        self.n_workers = n_workers
+        self.make_env = make_env
+        assert n_workers <= 1 or make_env is not None  # every worker needs its own environment
+        # copied by each worker, which records its episodes only (see `_run_shard`)
+        self._empty_evaluator = copy.deepcopy(evaluator) if n_workers > 1 else None
 
     def run(self, agent):
+        if self.n_workers > 1 and self.n_runs > 1:
+            return self._run_parallel(agent)
         for i_episode in range(self.n_runs):
-            state = self.env.reset()
-            if self.use_seed:
-                state = self.env.reset(seed=self.seeds[i_episode])
+            self._run_episode(self.env, agent, i_episode)
+        return self.evaluator.get_result()
+
+    def _run_episode(self, env: gym.Env, agent, i_episode: int):
+        budget = self.budget
+        with budget.env:
+            state = self._reset(env, self.seeds[i_episode] if self.use_seed else None)
+        with budget.agent:
             agent.reset()
-            self.evaluator.reset()
-            for t in range(self.t_max):
+        self.evaluator.reset()
+        # with an env that can step asynchronously (e.g. `AgentEnv`), the evaluator records each step
+        # while the judge computes the next one
+        step_async = getattr(env, "step_async", None)
+        last_step = None
+        for t in range(self.t_max):
+            with budget.agent:
                 action = agent.step(state)
-                next_state, reward, terminated, truncated, info = self.env.step(action)
-                done = terminated or truncated
-                self.evaluator.step(
-                    {
-                        "state": state,
-                        "action": action,
-                        "reward": reward,
-                        "next_state": next_state,
-                        "done": done,
-                        "info": info,
-                        "episode_count": i_episode,
-                        "t": t,
-                    }
+            if step_async is not None:
+                with budget.env:
+                    step_async(action)
+            if last_step is not None:
+                _record_step(self.evaluator, last_step)
+            with budget.env:
+                if step_async is not None:
+                    next_state, reward, terminated, truncated, info = env.step_wait()
+                else:
+                    next_state, reward, terminated, truncated, info = env.step(action)
+            done = terminated or truncated
+            last_step = (state, action, reward, next_state, done, info, i_episode, t)
+            state = next_state
+            if done:
+                break
+        if last_step is not None:
+            _record_step(self.evaluator, last_step)
+
+    @staticmethod
+    def _reset(env: gym.Env, seed):
+        """:return: initial state of `env`, returned alone by `AgentEnv` and with an info by gymnasium envs"""
+        result = env.reset(seed=seed)
+        if (
+            isinstance(result, tuple)
+            and len(result) == 2
+            and isinstance(result[1], dict)
+            # unless the observation itself is such a tuple
+            and not (isinstance(env.observation_space, gym.spaces.Tuple) and env.observation_space.contains(result))
+        ):
+            return result[0]
+        return result
+
+    def _run_shard(self, agent, episodes: range, conn):
+        # what the parent recorded and spent before the fork (e.g. creating the agent) stays in the
+        # parent, the worker sends back only its own episodes to be merged
+        self.budget = TimeBudget(self.time_limit)
+        self.evaluator = copy.deepcopy(self._empty_evaluator)
+        try:
+            env = self.make_env()
+            try:
+                for i_episode in episodes:
+                    self._run_episode(env, agent, i_episode)
+            finally:
+                env.close()
+            conn.send((True, (self.evaluator, self.budget)))
+        except Exception as e:
+            conn.send((False, e))
+        conn.close()
+
+    def _run_parallel(self, agent):
+        # forked, so that the agent and `make_env` need not be picklable
+        context = multiprocessing.get_context("fork")
+        n_workers = min(self.n_workers, self.n_runs)
+        bounds = [self.n_runs * i // n_workers for i in range(n_workers + 1)]
+        workers = []  # (connection, process), in episode order
+        try:
+            for start, stop in zip(bounds, bounds[1:]):
+                conn, child_conn = context.Pipe(duplex=False)
+                process = context.Process(target=self._run_shard, args=(agent, range(start, stop), child_conn))
+                process.start()
+                child_conn.close()  # so that `recv` fails if the process dies
+                workers.append((conn, process))
+            shards = []
+            for conn, process in workers:
+                try:
+                    ok, value = conn.recv()
+                except EOFError:
+                    process.join()
+                    raise RuntimeError(f"episode worker exited with code {process.exitcode}")
+                if not ok:
+                    raise value
+                shards.append(value)
+            for _, process in workers:
+                process.join()
+        finally:
+            # also stops the workers when the time limit is reached
+            for conn, process in workers:
+                if process.is_alive():
+                    process.kill()
+                process.join()
+                conn.close()
+        for evaluator, budget in shards:
+            self.evaluator.merge(evaluator)
+            self.budget.merge(budget)
+        return self.evaluator.get_result()
+
+
+class VectorReinforcementLearningTestCase(TestCase):
+    def __init__(
+        self,
+        t_max: int,
+        seeds: List[int],
+        case_id,
+        time_limit: float,
+        n_runs: int,
+        env: gym.vector.VectorEnv,
+        evaluator: Evaluator,
+        agent_init: dict = None,
+    ):
+        """
+        Runs up to `env.num_envs` episodes at the same time, e.g. with an `airena_gym.VectorAgentEnv`,
+        so that every step of the vector environment steps all of them, and the agent chooses their
+        actions at once with `Agent.step_batch`. The agent is reset once before the first episodes:
+        it must not keep per-episode state.
+
+        Episodes are given to the evaluator one after another in episode order, as in
+        `ReinforcementLearningTestCase`, once they are finished.
+
+        Additional params please refer to `ReinforcementLearningTestCase`.
+
+        :param env: vector environment
+        """
+        super().__init__(case_id, time_limit, n_runs, agent_init, env, evaluator)
+        self.t_max = t_max
+        self.seeds = seeds
+        self.use_seed = len(self.seeds) > 0
+        if self.use_seed:
+            assert (
+                len(self.seeds) == self.n_runs
+            )  # provide fixed random seed for each episode
+
+    def run(self, agent):
+        n_envs = self.env.num_envs
+        n_active = min(n_envs, self.n_runs)
+        # episode run by each copy of the environment, None once there is no episode left for it
+        episode_of = [i if i < n_active else None for i in range(n_envs)]
+        t_of = [0] * n_envs
+        steps_of = [[] for _ in range(n_envs)]  # steps of the running episodes
+        finished = {}  # steps of finished episodes, until the episodes before them are finished
+        next_episode = n_active
+        next_to_evaluate = 0
+
+        budget = self.budget
+        with budget.env:
+            states, _ = self.env.reset(seed=self._seeds_for(episode_of))
+        with budget.agent:
+            agent.reset()
+        while next_to_evaluate < self.n_runs:
+            with budget.agent:
+                actions = agent.step_batch(states)
+            with budget.env:
+                next_states, rewards, terminations, truncations, infos = self.env.step(actions)
+            reset_mask = np.zeros(n_envs, dtype=np.bool_)
+            for i, (state, action, next_state) in enumerate(
+                zip(
+                    iterate(self.env.observation_space, states),
+                    iterate(self.env.action_space, actions),
+                    iterate(self.env.observation_space, next_states),
+                )
+            ):
+                if episode_of[i] is None:
+                    continue  # the copy keeps running, its steps are ignored
+                done = bool(terminations[i] or truncations[i])
+                steps_of[i].append(
+                    (state, action, rewards[i], next_state, done, self._info_of(infos, i), episode_of[i], t_of[i])
                 )
-                state = next_state
-                if done:
-                    break
+                t_of[i] += 1
+                if not done and t_of[i] < self.t_max:
+                    continue
+                finished[episode_of[i]] = steps_of[i]
+                steps_of[i] = []
+                t_of[i] = 0
+                if next_episode < self.n_runs:
+                    episode_of[i] = next_episode
+                    next_episode += 1
+                    reset_mask[i] = True
+                else:
+                    episode_of[i] = None
+            while next_to_evaluate in finished:
+                self.evaluator.reset()
+                for step in finished.pop(next_to_evaluate):
+                    _record_step(self.evaluator, step)
+                next_to_evaluate += 1
+            states = next_states
+            if reset_mask.any():
+                # start the next episodes now rather than with the autoreset of the next step,
+                # so that they get their seeds
+                # (the states of the other copies are returned unchanged)
+                with budget.env:
+                    states, _ = self.env.reset(
+                        seed=self._seeds_for([e if reset else None for e, reset in zip(episode_of, reset_mask)]),
+                        options={"reset_mask": reset_mask},
+                    )
         return self.evaluator.get_result()
+
+    def _seeds_for(self, episodes):
+        if not self.use_seed:
+            return None
+        return [None if episode is None else self.seeds[episode] for episode in episodes]
+
+    @classmethod
+    def _info_of(cls, infos: dict, i: int) -> dict:
+        """:return: info of the `i`-th copy from the infos of a vector environment"""
+        info = {}
+        for key, value in infos.items():
+            if key.startswith("_"):
+                continue
+            mask = infos.get(f"_{key}")
+            if mask is not None and not mask[i]:
+                continue
+            info[key] = cls._info_of(value, i) if isinstance(value, dict) else value[i]
+        return info
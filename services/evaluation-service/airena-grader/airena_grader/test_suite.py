@@ -1,9 +1,22 @@
+import multiprocessing
+import time
+from multiprocessing.connection import wait
 from typing import List, Callable
 
 from .abc.agent import Agent
 from .abc.evaluator import EvaluationResult
+from .abc.exception import TimeoutException
 from .abc.test_case import TestCase
 
+# seconds a test case run by a worker process may take after its time limit before the process is killed
+# (the time limit is enforced in the process itself, this catches agents stuck where it cannot be)
+KILL_GRACE_PERIOD = 5.0
+
+
+def _evaluate_in_process(case: TestCase, create_agent: Callable[..., Agent], conn):
+    conn.send(case.evaluate(create_agent))
+    conn.close()
+
 
 class TestResult:
     def __init__(self, case_id, result: EvaluationResult):
@@ -30,17 +43,23 @@ class TestSuite:
         self.suite_id = suite_id
         self.test_cases = cases
 
-    def run(self, create_agent: Callable[..., Agent]) -> dict:
+    def run(self, create_agent: Callable[..., Agent], n_workers: int = 1) -> dict:
         """Run the test cases in this test suite.
 
         :param create_agent: a function that returns an `Agent` object. Parameters
         to this function will be passed to the constructor of the underlying `Agent` object.
+        :param n_workers: number of test cases run at the same time, each in its own forked process.
+        With 1, the test cases are run one after another in this process. Test cases run in parallel
+        must not share environments (or judges).
         :return: A dict containing the results of all test cases and the average score.
         """
+        if n_workers > 1 and len(self.test_cases) > 1:
+            evaluations = self._evaluate_parallel(create_agent, n_workers)
+        else:
+            evaluations = [case.evaluate(create_agent) for case in self.test_cases]
         results = []
         total_score = 0
-        for case in self.test_cases:
-            res = case.evaluate(create_agent)
+        for case, res in zip(self.test_cases, evaluations):
             total_score += res.value
             results.append(TestResult(case_id=case.case_id, result=res))
         return {
@@ -48,3 +67,49 @@ class TestSuite:
             "results": [x.get_json() for x in results],
             "score": total_score / len(self.test_cases) if self.test_cases else 0,
         }
+
+    def _evaluate_parallel(self, create_agent: Callable[..., Agent], n_workers: int) -> List[EvaluationResult]:
+        """:return: results of the test cases, in order, evaluated by at most `n_workers` processes at a time"""
+        # forked, so that environments, agents and `create_agent` need not be picklable
+        context = multiprocessing.get_context("fork")
+        evaluations: List[EvaluationResult] = [None] * len(self.test_cases)
+        pending = list(reversed(range(len(self.test_cases))))
+        running = {}  # connection -> (index, process, deadline)
+        try:
+            while pending or running:
+                while pending and len(running) < n_workers:
+                    index = pending.pop()
+                    case = self.test_cases[index]
+                    conn, child_conn = context.Pipe(duplex=False)
+                    process = context.Process(target=_evaluate_in_process, args=(case, create_agent, child_conn))
+                    process.start()
+                    child_conn.close()  # so that `recv` fails if the process dies
+                    deadline = time.monotonic() + case.time_limit + KILL_GRACE_PERIOD if case.time_limit else None
+                    running[conn] = (index, process, deadline)
+                deadlines = [deadline for _, _, deadline in running.values() if deadline is not None]
+                timeout = max(min(deadlines) - time.monotonic(), 0) if deadlines else None
+                for conn in wait(list(running), timeout):
+                    index, process, _ = running.pop(conn)
+                    try:
+                        evaluations[index] = conn.recv()
+                    except EOFError:
+                        process.join()
+                        evaluations[index] = self.test_cases[index]._terminate(
+                            RuntimeError(f"test case process exited with code {process.exitcode}")
+                        )
+                    conn.close()
+                    process.join()
+                now = time.monotonic()
+                for conn, (index, process, deadline) in list(running.items()):
+                    if deadline is not None and now >= deadline:
+                        del running[conn]
+                        process.kill()
+                        process.join()
+                        conn.close()
+                        evaluations[index] = self.test_cases[index]._terminate(TimeoutException("Timed out!"))
+        finally:
+            for conn, (_, process, _) in running.items():
+                process.kill()
+                process.join()
+                conn.close()
+        return evaluations
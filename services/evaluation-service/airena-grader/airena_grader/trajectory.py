@@ -0,0 +1,186 @@
+"""Columnar store of the steps of the episodes of a test case, see `Trajectory`."""
+import os
+import tempfile
+from typing import Dict, Iterator, Optional, Sequence
+
+import numpy as np
+
+# fields of the steps given to evaluators, in the order of `Evaluator.record`
+STEP_FIELDS = ("state", "action", "reward", "next_state", "done", "info", "episode_count", "t")
+# dtypes of the fields that are always numbers of the same kind, whatever the type of the first one
+FIELD_DTYPES = {"reward": np.float64, "done": np.bool_, "episode_count": np.int64, "t": np.int64}
+
+
+class _Column:
+    """Growable array of the values of one field, in memory or in a memory-mapped file past `spill_bytes`."""
+
+    def __init__(self, capacity: int, spill_dir: Optional[str], spill_bytes: int, dtype=None):
+        self._dtype = dtype  # fixed dtype of the values, None to widen it as needed (see `_upcast`)
+        self._data = None  # created from the first value
+        self._objects = None  # values that are not arrays of a fixed dtype and shape, as a list
+        self._size = 0
+        self._capacity = capacity
+        self._spill_dir = spill_dir
+        self._spill_bytes = spill_bytes
+
+    def append(self, value):
+        if self._objects is not None:
+            self._objects.append(value)
+            return
+        try:
+            if self._data is None:
+                array = np.asarray(value, dtype=self._dtype)
+                if array.dtype.hasobject:
+                    self._objects = [value]
+                    return
+                self._data = np.empty((self._capacity,) + array.shape, dtype=array.dtype)
+            else:
+                if self._size == len(self._data):
+                    self._grow(2 * len(self._data))
+                if self._dtype is None:
+                    self._upcast(np.asarray(value).dtype)
+            self._data[self._size] = value
+        except (TypeError, ValueError, OverflowError):  # e.g. observations of another shape
+            self._objects = list(self.values) + [value]
+            self._data = None
+            return
+        self._size += 1
+
+    def extend(self, values):
+        if self._objects is None and isinstance(values, np.ndarray) and len(values):
+            if self._data is None:
+                self.append(values[0])
+                values = values[1:]
+            if self._data is not None and self._data.shape[1:] == values.shape[1:]:
+                try:
+                    if self._dtype is None:
+                        self._upcast(values.dtype)
+                except TypeError:
+                    pass  # appended one by one below, and kept in a list
+                else:
+                    size = self._size + len(values)
+                    if size > len(self._data):
+                        self._grow(max(size, 2 * len(self._data)))
+                    self._data[self._size:size] = values
+                    self._size = size
+                    return
+        for value in values:
+            self.append(value)
+
+    def _upcast(self, dtype: np.dtype):
+        """Convert the array to a dtype that can also hold values of `dtype`, e.g. ints to floats."""
+        if dtype == self._data.dtype:
+            return
+        dtype = np.result_type(self._data.dtype, dtype)
+        if dtype.hasobject:
+            raise TypeError(f"no common dtype of {self._data.dtype} and {dtype}")
+        if dtype != self._data.dtype:
+            self._grow(len(self._data), dtype)
+
+    def _grow(self, capacity: int, dtype: Optional[np.dtype] = None):
+        dtype = self._data.dtype if dtype is None else dtype
+        shape = (capacity,) + self._data.shape[1:]
+        nbytes = dtype.itemsize * int(np.prod(shape))
+        if self._spill_dir is not None and nbytes > self._spill_bytes:
+            fd, path = tempfile.mkstemp(prefix="trajectory-", suffix=".bin", dir=self._spill_dir)
+            os.close(fd)
+            data = np.memmap(path, dtype=dtype, mode="w+", shape=shape)
+            os.unlink(path)  # the mapping stays valid, and nothing is left behind
+        else:
+            data = np.empty(shape, dtype=dtype)
+        data[:self._size] = self._data[:self._size]
+        self._data = data
+
+    @property
+    def values(self):
+        """:return: array of the values (a view valid until the next `append`), or list if they are not arrays"""
+        if self._objects is not None:
+            return self._objects
+        if self._data is None:
+            return np.empty(0, dtype=self._dtype)
+        return self._data[:self._size]
+
+    def __len__(self):
+        return len(self._objects) if self._objects is not None else self._size
+
+    def __getstate__(self):
+        # memory-mapped data is sent (e.g. to another process) as a plain array
+        state = self.__dict__.copy()
+        if self._data is not None:
+            state["_data"] = np.array(self.values)
+        return state
+
+
+class Trajectory:
+    """
+    Steps of the episodes of a test case stored by field: one growable NumPy array per field
+    (`state`, `action`, `reward`, ...) instead of one dict per step, so that evaluators compute
+    their metrics on whole episodes at once, e.g. `trajectory.episode(i)["reward"].sum()`.
+
+    `reward`, `done`, `episode_count` and `t` are stored as float64, bool and int64 (`FIELD_DTYPES`).
+    The other fields are stored in an array of the shape of their first value, whose dtype is widened
+    when a value needs it (e.g. int actions followed by float ones), or in a list if their values
+    are not arrays (e.g. dict observations). Past `spill_bytes`, the arrays are moved to
+    memory-mapped files in `spill_dir` (if set), so that long test cases do not exhaust memory.
+    """
+
+    def __init__(
+        self,
+        fields: Sequence[str] = ("state", "action", "reward", "next_state", "done", "episode_count", "t"),
+        capacity: int = 1024,
+        spill_dir: Optional[str] = None,
+        spill_bytes: int = 1 << 28,
+    ):
+        """
+        :param fields: fields of `STEP_FIELDS` to store, e.g. only "reward" and "done"
+        :param capacity: initial number of steps of the arrays, doubled when they are full
+        :param spill_dir: directory of the memory-mapped files, None to keep everything in memory
+        :param spill_bytes: size above which an array is moved to a memory-mapped file
+        """
+        self.fields = tuple(fields)
+        self._columns = {
+            field: _Column(capacity, spill_dir, spill_bytes, FIELD_DTYPES.get(field)) for field in self.fields
+        }
+        # indices of the fields in the arguments of `append`
+        self._indices = [(STEP_FIELDS.index(field), self._columns[field]) for field in self.fields]
+        self._episode_starts = []
+        self._size = 0
+
+    def start_episode(self):
+        self._episode_starts.append(self._size)
+
+    def append(self, *step):
+        """Add a step, given as the values of `STEP_FIELDS` in order."""
+        for index, column in self._indices:
+            column.append(step[index])
+        self._size += 1
+
+    def merge(self, other: "Trajectory"):
+        """Add the episodes of `other`, which follow the episodes of this trajectory."""
+        offset = self._size
+        for field in self.fields:
+            self._columns[field].extend(other.column(field))
+        self._episode_starts.extend(start + offset for start in other._episode_starts)
+        self._size += len(other)
+
+    def __len__(self):
+        """:return: number of steps"""
+        return self._size
+
+    @property
+    def n_episodes(self) -> int:
+        return len(self._episode_starts)
+
+    def column(self, field: str):
+        """:return: values of `field` for all the steps, a view valid until the next `append`"""
+        return self._columns[field].values
+
+    def episode(self, i: int) -> Dict[str, np.ndarray]:
+        """:return: values of each field for the steps of the `i`-th episode, views valid until the next `append`"""
+        start = self._episode_starts[i]
+        stop = self._episode_starts[i + 1] if i + 1 < len(self._episode_starts) else self._size
+        return {field: self._columns[field].values[start:stop] for field in self.fields}
+
+    def episodes(self) -> Iterator[Dict[str, np.ndarray]]:
+        for i in range(self.n_episodes):
+            yield self.episode(i)
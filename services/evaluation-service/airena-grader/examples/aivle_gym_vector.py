@@ -0,0 +1,68 @@
+import gymnasium as gym
+import numpy
+from airena_gym import launch_judge
+from airena_gym import VectorAgentEnv
+from airena_gym import VectorJudgeEnv
+
+from airena_grader.abc.agent import Agent
+from airena_grader.evaluator import StepCountEvaluator
+from airena_grader.test_case import VectorReinforcementLearningTestCase
+from airena_grader.test_suite import TestSuite
+
+N_ENVS = 8
+
+
+class CartPoleAgent(Agent):
+    def step(self, state):
+        return gym.spaces.Discrete(2).sample()
+
+    def step_batch(self, states):
+        # one "inference" for all the episodes
+        return numpy.random.randint(0, 2, size=len(states))
+
+    def reset(self):
+        pass
+
+
+def create_agent(**kwargs):
+    return CartPoleAgent()
+
+
+def create_judge():
+    return VectorJudgeEnv(None, [lambda: gym.make("CartPole-v1")] * N_ENVS)
+
+
+def main():
+    # returns as soon as the judge is listening, raises `JudgeLaunchError` if it fails to start
+    with launch_judge(create_judge) as judge:
+        port = judge.port
+        n_runs = 100
+        base_env = gym.make("CartPole-v1")
+        env = VectorAgentEnv(
+            None,  # serializer derived from the spaces
+            base_env.action_space,
+            base_env.observation_space,
+            num_envs=N_ENVS,
+            uid=0,
+            port=port,
+        )
+        evaluator = StepCountEvaluator()
+        seeds = list(range(n_runs))
+        test_case = VectorReinforcementLearningTestCase(
+            t_max=10000,
+            env=env,
+            evaluator=evaluator,
+            agent_init={},
+            seeds=seeds,
+            case_id=0,
+            time_limit=3600,
+            n_runs=n_runs,
+        )
+        test_suite = TestSuite(suite_id="cart_pole_vector_test", cases=[test_case])
+        res = test_suite.run(create_agent)
+        print(res)
+        env.close()
+
+
+if __name__ == "__main__":
+    main()
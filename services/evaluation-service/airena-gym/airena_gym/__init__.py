@@ -1,4 +1,10 @@
 from .agent_env import AgentEnv
+from .async_agent_env import AsyncAgentEnv
 from .env_serializer import EnvSerializer
 from .judge_env import JudgeEnv
 from .judge_multi_env import JudgeMultiEnv
+from .judge_server import JudgeServer
+from .launcher import launch_judge, JudgeProcess
+from .space_serializer import SpaceSerializer
+from .vector_agent_env import VectorAgentEnv
+from .vector_judge_env import VectorJudgeEnv
@@ -1,11 +1,16 @@
-import json
 import logging
-from typing import Tuple, Any
+import os
+from typing import Tuple, Any, Optional
 
 import gymnasium as gym
 import zmq
 
+from .codec import JSON_CODEC, get_codec, preferred_codecs
 from .env_serializer import EnvSerializer
+from .exceptions import RequestFailedError
+from .space_serializer import SpaceSerializer
+from .tracing import frames_size, get_tracer
+from .transport import PREFERRED_TRANSPORTS
 
 
 class NotAllowedToReset(Exception):
@@ -19,22 +24,151 @@ class AgentEnv(gym.Env):
 
     def __init__(
         self,
-        serializer: EnvSerializer,
+        serializer: Optional[EnvSerializer],
         action_space,
         observation_space,
         uid,
         port,
+        codec: Optional[str] = None,
+        transport: Optional[str] = None,
     ):
+        """
+        :param serializer: serializer of the actions and observations, default as a `SpaceSerializer`
+                           derived from `action_space` and `observation_space`
+        :param codec: wire codec ("binary" or "json"), default as the binary codec if the observations
+                      or actions carry large arrays and the judge supports it, JSON otherwise
+        :param transport: "ipc" or "tcp", default as ipc if the judge supports it
+
+        The codec and the transport are negotiated with an optional `hello` field of the first
+        request, sent in JSON over TCP. Judges that do not know it ignore it and answer without
+        `hello`, and the agent keeps using JSON over TCP.
+        """
         self.uid = uid
         self.action_space = action_space
         self.observation_space = observation_space
-        self.serializer = serializer
+        self.serializer = serializer if serializer is not None else SpaceSerializer(action_space, observation_space)
         self.port = port
         assert isinstance(port, int)
         assert isinstance(uid, int)
-        context = zmq.Context()
-        self.socket = context.socket(zmq.REQ)
-        self.socket.connect(f"tcp://localhost:{self.port}")
+        self.codec_name = codec
+        self.transport_name = transport
+        self.codec = None  # JSON until the judge answers the `hello` of the first request
+        self._hello_sent = False  # the pending request carries a `hello`
+        self.socket = None
+        self._pending = None  # method of the request waiting for its response
+        self._tracer = get_tracer()
+        self._trace_start = None  # start time of the pending request if it is traced
+        self._trace_bytes = 0
+        self._pid = None  # process that owns the connection, see `_ensure_connected`
+
+    def _ensure_connected(self):
+        """
+        Connect to the judge before the first request, and again in a process forked after the
+        connection (e.g. a test case run by `TestSuite.run` with `n_workers` > 1): ZMQ sockets cannot
+        be used by two processes.
+        """
+        if self._pid == os.getpid():
+            return
+        # what was inherited from the parent is dropped without closing it, the parent may still use it
+        self.codec = None
+        self._hello_sent = False
+        self._pending = None
+        self._trace_start = None
+        self._pid = os.getpid()
+        self._connect(f"tcp://localhost:{self.port}")
+
+    def _connect(self, endpoint):
+        # one context (and I/O thread) for all the environments of the process
+        self.socket = zmq.Context.instance().socket(zmq.REQ)
+        self.socket.connect(endpoint)
+
+    def _hello(self) -> Optional[dict]:
+        """:return: `hello` field of the first request, None if there is nothing to negotiate"""
+        if self.codec_name:
+            codecs = [self.codec_name]
+        else:
+            codecs = list(preferred_codecs(self.observation_space, self.action_space))
+        # the judge always runs on the same host
+        transports = [self.transport_name] if self.transport_name else list(PREFERRED_TRANSPORTS)
+        if codecs == [JSON_CODEC.name] and transports == ["tcp"]:
+            return None
+        return {"codecs": codecs, "transports": transports}
+
+    def _accept_hello(self, hello: Optional[dict]):
+        """
+        Apply the `hello` field of the response to the first request, and reconnect to the transport
+        chosen by the judge.
+
+        :param hello: field of the response, None if the judge did not negotiate (e.g. an older judge)
+        """
+        if hello is None:
+            logging.debug("[AgentEnv %s| _accept_hello] judge did not negotiate, staying on JSON over TCP", self.uid)
+            return
+        self.codec = get_codec(hello.get("codec", JSON_CODEC.name))
+        logging.debug(
+            "[AgentEnv %s| _accept_hello] codec: %s, transport: %s",
+            self.uid, self.codec.name, hello.get("transport", "tcp"),
+        )
+        if "transport" not in hello:
+            return
+        self.socket.close()
+        self._connect(hello["endpoint"])
+
+    def _encode(self, req: dict) -> list:
+        """:return: frames of request `req`"""
+        if self._pending is not None:
+            raise gym.error.AlreadyPendingCallError(
+                f"`{self._pending}` is still waiting for the judge, cannot send `{req['method']}`", self._pending
+            )
+        if self.codec is None:
+            # first request: in JSON over TCP, with the `hello` negotiating the codec and the transport
+            self.codec = JSON_CODEC
+            hello = self._hello()
+            if hello is not None:
+                req = {**req, "hello": hello}
+                self._hello_sent = True
+        return self.codec.encode(req)
+
+    def _decode(self, frames) -> Any:
+        """:return: response in received `frames`"""
+        resp = self.codec.decode(frames)
+        if self._hello_sent:
+            self._hello_sent = False
+            self._accept_hello(resp.pop("hello", None) if isinstance(resp, dict) else None)
+        # refused resets are answered with `accepted` and raise `NotAllowedToReset`
+        if isinstance(resp, dict) and resp.get("status") == "failed" and "accepted" not in resp:
+            raise RequestFailedError(f"judge failed to serve the request of {self.uid}: {resp.get('reason')}")
+        return resp
+
+    def _send(self, req: dict):
+        """Send `req` to the judge, its response is returned by `_recv`."""
+        self._ensure_connected()
+        frames = self._encode(req)
+        self._trace_start = self._tracer.sample()
+        if self._trace_start is not None:
+            self._trace_bytes = frames_size(frames)
+        # large arrays are sent and received without copy, see `codec.BinaryCodec`
+        self.socket.send_multipart(frames, copy=False)
+        self._pending = req["method"]
+
+    def _recv(self, timeout_ms: Optional[int] = None):
+        """
+        :param timeout_ms: raise `TimeoutError` if the judge does not answer in time, default as no timeout
+        :return: response of the judge to the last request
+        """
+        if timeout_ms is not None and not self.socket.poll(timeout_ms):
+            raise TimeoutError(f"no answer from judge to {self._pending}")
+        frames = self.socket.recv_multipart(copy=False)
+        if self._trace_start is not None:
+            self._tracer.record(self.uid, self._pending, self._trace_start, self._trace_bytes + frames_size(frames))
+            self._trace_start = None
+        self._pending = None
+        return self._decode(frames)
+
+    def _request(self, req: dict, timeout_ms: Optional[int] = None):
+        """Send `req` to the judge and return its response, see `_recv`."""
+        self._send(req)
+        return self._recv(timeout_ms)
 
     # def reset_socket(self):
     #     context = zmq.Context()
@@ -44,6 +178,36 @@ class AgentEnv(gym.Env):
     def step(self, action):
         return self._remote_step(action)
 
+    def step_async(self, action) -> None:
+        """
+        Send `action` to the judge without waiting for the result, which is returned by `step_wait`.
+        The agent can do other work (e.g. preprocess the last observation) while the judge steps.
+        """
+        # observations, actions and infos are only formatted if debug messages are logged
+        logging.debug("[AgentEnv %s| step_async] action: %s", self.uid, action)
+        self._send(
+            {
+                "uid": self.uid,
+                "method": "step",
+                "action": self.serializer.action_to_json(action),
+            }
+        )
+
+    def step_wait(self, timeout_ms: Optional[int] = None) -> Tuple[Any, float, bool, bool, dict]:
+        """
+        :param timeout_ms: raise `TimeoutError` if the step is not done in time (it can be waited for
+                           again), default as no timeout
+        :return: (observation, reward, terminated, truncated, info) of the step started by `step_async`
+        """
+        if self._pending != "step":
+            raise gym.error.NoAsyncCallError("`step_wait` called without `step_async`", "step")
+        obs, reward, terminated, truncated, info = self._json_to_ordi(self._recv(timeout_ms))
+        logging.debug(
+            "[AgentEnv %s| step_wait] response obs: %s, reward: %s, terminated: %s, truncated: %s, info: %s",
+            self.uid, obs, reward, terminated, truncated, info,
+        )
+        return obs, reward, terminated, truncated, info
+
     def reset(self, seed=None) -> Any:
         ok, obs = self._remote_reset(seed)
         if ok:
@@ -65,22 +229,8 @@ class AgentEnv(gym.Env):
 
         Returns: (observation, reward, terminated, truncated, info)
         """
-        logging.debug(f"[AgentEnv {self.uid}| _remote_step] action: {action}")
-        self.socket.send_string(
-            json.dumps(
-                {
-                    "uid": self.uid,
-                    "method": "step",
-                    "action": self.serializer.action_to_json(action),
-                }
-            )
-        )
-        msg = self.socket.recv_string()
-        obs, reward, terminated, truncated, info = self._json_to_ordi(json.loads(msg))
-        logging.debug(
-            f"[AgentEnv {self.uid}| _remote_step] response obs: {obs}, reward: {reward}, done: {terminated or truncated}, info: {info}"
-        )
-        return obs, reward, terminated, truncated, info
+        self.step_async(action)
+        return self.step_wait()
 
     def _remote_reset(self, seed) -> Tuple[bool, Any]:
         """Request remote to reset the environment
@@ -89,11 +239,9 @@ class AgentEnv(gym.Env):
             accepted (bool): whether the reset request is accepted by the remote\n
             observation (object): if accepted, initial observation will be returned
         """
-        logging.debug(f"[AgentEnv {self.uid}| _remote_reset] requesting, seed: {seed}")
-        self.socket.send_string(json.dumps({"uid": self.uid, "method": "reset", "seed": seed}))
-        msg = self.socket.recv_string()
-        obj = json.loads(msg)
-        logging.debug(f"[AgentEnv {self.uid}| _remote_reset] response: {obj}")
+        logging.debug("[AgentEnv %s| _remote_reset] requesting, seed: %s", self.uid, seed)
+        obj = self._request({"uid": self.uid, "method": "reset", "seed": seed})
+        logging.debug("[AgentEnv %s| _remote_reset] response: %s", self.uid, obj)
         if obj["accepted"]:
             return True, self.serializer.json_to_observation(obj["observation"])
         else:
@@ -101,16 +249,15 @@ class AgentEnv(gym.Env):
 
     def _remote_render(self) -> Any:
         # logging.debug(f"[AgentEnv | _remote_render] requesting")
-        self.socket.send_string(
-            json.dumps({"uid": self.uid, "method": "render"})
-        )
-        msg = self.socket.recv_string()
-        return json.loads(msg)
+        return self._request({"uid": self.uid, "method": "render"})
 
     def _remote_close(self) -> None:
-        logging.debug(f"[AgentEnv {self.uid}| _remote_close] requesting")
-        self.socket.send_string(json.dumps({"uid": self.uid, "method": "close"}))
-        _ = self.socket.recv_string()
+        logging.debug("[AgentEnv %s| _remote_close] requesting", self.uid)
+        try:
+            _ = self._request({"uid": self.uid, "method": "close"})
+        except RequestFailedError as e:
+            # e.g. the session expired: there is nothing left to close on the judge
+            logging.warning(f"[AgentEnv {self.uid}| _remote_close] {e}")
 
     def _json_to_ordi(self, ordi_json) -> Tuple[Any, float, bool, bool, dict]:
         obs = ordi_json["observation"]
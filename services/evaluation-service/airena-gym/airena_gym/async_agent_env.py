@@ -0,0 +1,81 @@
+import asyncio
+import logging
+from typing import Any, Optional, Tuple
+
+import zmq
+import zmq.asyncio
+
+from .agent_env import AgentEnv, NotAllowedToReset
+from .exceptions import RequestFailedError
+from .tracing import frames_size
+
+
+class AsyncAgentEnv(AgentEnv):
+    """
+    `AgentEnv` built on `zmq.asyncio`: `step`, `reset`, `render` and `close` are coroutines, so that
+    many environments (or agents) of one process can wait for their judges at the same time, e.g.
+
+        results = await asyncio.gather(*(env.step(action) for env, action in zip(envs, actions)))
+
+    Requests to the same environment are sent one after another.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._lock = None  # created in the event loop, by the first request
+        super().__init__(*args, **kwargs)
+
+    def _connect(self, endpoint):
+        # one context (and I/O thread) for all the environments of the process
+        self.socket = zmq.asyncio.Context.instance().socket(zmq.REQ)
+        self.socket.connect(endpoint)
+
+    async def _request(self, req: dict, timeout_ms: Optional[int] = None):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            self._ensure_connected()
+            frames = self._encode(req)
+            trace_start = self._tracer.sample()
+            await self.socket.send_multipart(frames, copy=False)
+            self._pending = req["method"]
+            if timeout_ms is not None and not await self.socket.poll(timeout_ms):
+                raise TimeoutError(f"no answer from judge to {req['method']}")
+            resp_frames = await self.socket.recv_multipart(copy=False)
+            if trace_start is not None:
+                self._tracer.record(self.uid, req["method"], trace_start, frames_size(frames) + frames_size(resp_frames))
+            self._pending = None
+            return self._decode(resp_frames)
+
+    async def step(self, action) -> Tuple[Any, float, bool, bool, dict]:
+        logging.debug("[AsyncAgentEnv %s| step] action: %s", self.uid, action)
+        resp = await self._request(
+            {
+                "uid": self.uid,
+                "method": "step",
+                "action": self.serializer.action_to_json(action),
+            }
+        )
+        return self._json_to_ordi(resp)
+
+    async def reset(self, seed=None) -> Any:
+        resp = await self._request({"uid": self.uid, "method": "reset", "seed": seed})
+        if not resp["accepted"]:
+            raise NotAllowedToReset
+        return self.serializer.json_to_observation(resp["observation"])
+
+    async def render(self) -> Any:
+        return await self._request({"uid": self.uid, "method": "render"})
+
+    async def close(self) -> None:
+        try:
+            await self._request({"uid": self.uid, "method": "close"})
+        except RequestFailedError as e:
+            # e.g. the session expired: there is nothing left to close on the judge
+            logging.warning(f"[AsyncAgentEnv {self.uid}| close] {e}")
+        self.socket.close()
+
+    def step_async(self, action) -> None:
+        raise NotImplementedError("`step` of `AsyncAgentEnv` is a coroutine, use asyncio tasks instead")
+
+    def step_wait(self, timeout_ms: Optional[int] = None):
+        raise NotImplementedError("`step` of `AsyncAgentEnv` is a coroutine, use asyncio tasks instead")
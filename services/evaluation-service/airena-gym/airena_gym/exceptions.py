@@ -16,3 +16,12 @@ class UnexpectedMethodError(Exception):
 
 class UnsupportedMethodError(Exception):
     pass
+
+
+class JudgeLaunchError(Exception):
+    pass
+
+
+class RequestFailedError(Exception):
+    """The judge could not serve a request, e.g. because the session of the agent expired."""
+    pass
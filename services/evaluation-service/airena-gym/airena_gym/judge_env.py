@@ -1,11 +1,14 @@
 import abc
-import json
 import logging
+from typing import Optional
 
 import zmq
 
+from .codec import get_codec_for
 from .env_serializer import EnvSerializer
 from .judge_env_base import JudgeEnvBase
+from .space_serializer import SpaceSerializer
+from .tracing import frames_size, get_tracer
 
 
 class JudgeEnv(JudgeEnvBase, metaclass=abc.ABCMeta):
@@ -15,16 +18,21 @@ class JudgeEnv(JudgeEnvBase, metaclass=abc.ABCMeta):
 
     def __init__(
             self,
-            serializer: EnvSerializer,
+            serializer: Optional[EnvSerializer],
             action_space,
             observation_space,
             #reward_range,
             port=None,
     ):
+        """
+        :param serializer: serializer of the actions and observations, default as a `SpaceSerializer`
+                           derived from `action_space` and `observation_space`
+        """
+        if serializer is None:
+            serializer = SpaceSerializer(action_space, observation_space)
         super().__init__(
             serializer, action_space, observation_space, port
         )
-        self.socket = None
 
     def bind(self):
         context = zmq.Context()
@@ -37,43 +45,55 @@ class JudgeEnv(JudgeEnvBase, metaclass=abc.ABCMeta):
 
     def start(self):
         logging.info(f"[JudgeEnv] starting at {self.port}")
-        while True:
-            message = self.socket.recv_string()
-            req = json.loads(message)
-            method = req["method"]
-            if method == "step":
-                action = self.serializer.json_to_action(req["action"])
-                obs, reward, terminated, truncated, info = self.step(action)
-                resp = {
-                    "observation": self.serializer.observation_to_json(obs),
-                    "reward": reward,
-                    "terminated": terminated,
-                    "truncated": truncated,
-                    "info": self.serializer.info_to_json(info),
-                }
-                self.socket.send_string(json.dumps(resp))
-            elif method == "reset":
-                obs, info = self.reset(seed=req.get("seed", None))
-                self.socket.send_string(
-                    json.dumps(
-                        {
-                            "accepted": True,
-                            "observation": self.serializer.observation_to_json(obs),
-                        }
-                    )
-                )
-            elif method == "render":
-                resp = self.render()
-                self.socket.send_string(json.dumps({"resp": resp}))
-            elif method == "close":
-                self.close()
-                self.socket.send_string("ACK")
-                break  # TODO: validation of close request to avoid malicious close()
-            else:
-                logging.warning(
-                    f"[JudgeEnv] unsupported method {method} from [uid: {req['uid']}]"
-                )
-                pass
-            logging.debug(
-                f"[JudgeEnv] request from {req['uid']}: {json.loads(message)}"
+        tracer = get_tracer()
+        try:
+            while True:
+                frames = self.socket.recv_multipart(copy=False)
+                trace_start = tracer.sample()
+                if trace_start is not None:
+                    n_bytes = frames_size(frames)
+                codec = get_codec_for(frames)  # answer in the codec of the request
+                req = codec.decode(frames)
+                resp = self.handle_request(req)
+                if "hello" in req and isinstance(resp, dict):
+                    resp = {**resp, "hello": self.accept_hello(req["hello"])}
+                frames = codec.encode(resp)
+                self.socket.send_multipart(frames, copy=False)
+                if trace_start is not None:
+                    tracer.record(req.get("uid"), req["method"], trace_start, n_bytes + frames_size(frames))
+                # the request is only formatted if debug messages are logged
+                logging.debug("[JudgeEnv] request from %s: %s", req.get("uid"), req)
+                if req["method"] == "close":
+                    break  # TODO: validation of close request to avoid malicious close()
+        finally:
+            self.close_transport()
+
+    def handle_request(self, req: dict):
+        """Serve one decoded request of an `AgentEnv` and return the response to send back."""
+        method = req["method"]
+        if method == "step":
+            action = self.serializer.json_to_action(req["action"])
+            obs, reward, terminated, truncated, info = self.step(action)
+            return {
+                "observation": self.serializer.observation_to_json(obs),
+                "reward": reward,
+                "terminated": terminated,
+                "truncated": truncated,
+                "info": self.serializer.info_to_json(info),
+            }
+        elif method == "reset":
+            obs, info = self.reset(seed=req.get("seed", None))
+            return {
+                "accepted": True,
+                "observation": self.serializer.observation_to_json(obs),
+            }
+        elif method == "render":
+            return {"resp": self.render()}
+        elif method == "close":
+            self.close()
+            return "ACK"
+        else:
+            logging.warning(
+                f"[JudgeEnv] unsupported method {method} from [uid: {req.get('uid')}]"
             )
+            return {"status": "failed", "reason": f"unsupported method {method}"}
@@ -1,14 +1,21 @@
 import abc
+import logging
+import os
 
 import gymnasium as gym
+import zmq
 
+from .codec import choose_codec
 from .env_serializer import EnvSerializer
+from .transport import ipc_endpoint
 
 
 class JudgeEnvBase(gym.Env):
     # Set this in SOME subclasses
     metadata = {"render.modes": []}
     spec = None
+    # local transports agents may switch to, see `transport`
+    transports = ("ipc",)
 
     def __init__(
             self,
@@ -23,6 +30,48 @@ class JudgeEnvBase(gym.Env):
         self.serializer = serializer
         self.action_space = action_space
         self.observation_space = observation_space
+        self.socket = None
+        self.ipc_endpoint = None
+
+    def accept_hello(self, hello: dict) -> dict:
+        """
+        Choose the codec and the transport of an agent, offered in the `hello` field of its first request.
+
+        :return: `hello` field of the response
+        """
+        return {"codec": choose_codec(hello.get("codecs", [])), **self.accept_transport(hello.get("transports", []))}
+
+    def accept_transport(self, offered) -> dict:
+        """
+        Choose the transport of an agent among the ones it offered in its `hello`.
+
+        :return: fields of the `hello` response describing the transport, empty to stay on TCP
+        """
+        for name in offered:
+            if name not in self.transports:
+                continue
+            try:
+                if self.ipc_endpoint is None:
+                    endpoint = ipc_endpoint(self.port)
+                    self.socket.bind(endpoint)
+                    self.ipc_endpoint = endpoint
+            except (zmq.ZMQError, OSError) as e:
+                logging.warning(f"[JudgeEnv] transport {name} not available: {e}")
+                continue
+            return {"transport": name, "endpoint": self.ipc_endpoint}
+        return {}
+
+    def close_transport(self):
+        if self.ipc_endpoint is not None:
+            try:
+                self.socket.unbind(self.ipc_endpoint)
+            except zmq.ZMQError:
+                pass
+            try:
+                os.unlink(self.ipc_endpoint[len("ipc://"):])  # may be left behind by ZMQ
+            except OSError:
+                pass
+            self.ipc_endpoint = None
 
     @abc.abstractmethod
     def bind(self):
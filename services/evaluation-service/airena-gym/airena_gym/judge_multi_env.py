@@ -1,10 +1,10 @@
 import abc
-import json
 import logging
 from enum import Enum
 
 import zmq
 
+from .codec import get_codec_for
 from .env_serializer import EnvSerializer
 from .exceptions import *
 from .judge_env_base import JudgeEnvBase
@@ -41,7 +41,6 @@ class JudgeMultiEnv(JudgeEnvBase, metaclass=abc.ABCMeta):
         super().__init__(
             serializer, action_space, observation_space, port
         )
-        self.socket = None
         assert isinstance(n_agents, int)
         assert n_agents >= 2  # use normal JudgeEnv for single-agent task
         self.n_agents = n_agents
@@ -59,131 +58,138 @@ class JudgeMultiEnv(JudgeEnvBase, metaclass=abc.ABCMeta):
             self.port = self.socket.bind_to_random_port("tcp://*")
         return self.port
 
+    def _send(self, frames):
+        # large arrays are sent without copy, see `codec.BinaryCodec`
+        self.socket.send_multipart(frames, copy=False)
+
+    def _respond(self, idx: int, rid, resp, shared=None):
+        """Send `resp` to agent `idx` in its codec, with the `hello` answer to its first request if pending."""
+        hello = self._hello_n[idx]
+        if hello is not None:
+            self._hello_n[idx] = None
+            if isinstance(resp, dict):
+                resp = {**resp, "hello": hello}
+        codec = self._codec_n[idx]
+        frames = codec.encode(resp) if shared is None else codec.encode_with(resp, shared[codec])
+        self._send([rid, self._delim, *frames])
+
     def start(self):
         logging.info(f"[JudgeEnv] starting at {self.port}")
         # episode can be started only after all agents have called "reset"
         # all agents can call reset once at the beginning of each episode
         # episode is started by the first "reset" received by any one of the agents
-        init_obs_n = None
-        has_reset = [False for _ in range(self.n_agents)]
-        reset_idx_to_rid = {}  # map from agent index to router ID
         # step is started by the first "step" received by any one of the agents
         # step is responded after all agents have stepped
-        action_n = [None for _ in range(self.n_agents)]
-        has_stepped = [False for _ in range(self.n_agents)]
-        step_idx_to_rid = {}  # map from agent index to router ID
-
-        while True:
-            rid, delim, message = self.socket.recv_multipart()
-            req = json.loads(message)
-            method = req["method"]
-            idx = self.uid_to_idx[req["uid"]]
-            if method == "step":
-                if self.state == _State.WAIT_ACTION:
-                    if has_stepped[idx]:
-                        raise Exception(
-                            "this should not happen as agent socket is synchrounous..."
-                        )  # TODO
-                    has_stepped[idx] = True
-                    step_idx_to_rid[idx] = rid
-                    action_n[idx] = self.serializer.json_to_action(req["action"])
-                    if not (
-                            False in has_stepped
-                    ):  # when all agents have taken an action, step in the underlying env
-                        self.state = _State.STEP
-                        obs_n, reward_n, done_n, info = self.step(action_n)
-                        for i in range(self.n_agents):
-                            resp = {
-                                "observation": self.serializer.observation_to_json(
-                                    obs_n[i]
-                                ),
-                                "reward": reward_n[i],
-                                "done": done_n[i],
-                                "info": self.serializer.info_to_json(info),
-                            }
-                            self.socket.send_multipart(
-                                [
-                                    step_idx_to_rid[i],
-                                    delim,
-                                    json.dumps(resp).encode("utf-8"),
-                                ]
-                            )
-                        if not (False in done_n):
-                            self.state = _State.INITIAL
-                        else:
-                            self.state = _State.WAIT_ACTION
-                        action_n = [None for _ in range(self.n_agents)]
-                        has_stepped = [False for _ in range(self.n_agents)]
-                        step_idx_to_rid = {}
+        n = self.n_agents
+        # barrier state, allocated once: agent `i` has arrived at the current reset (or step) iff
+        # `reset_epoch_n[i]` (or `step_epoch_n[i]`) is the current epoch, so nothing is cleared between
+        # steps and each arrival is O(1)
+        self._reset_epoch, self._step_epoch = 1, 1
+        self._reset_epoch_n, self._step_epoch_n = [0] * n, [0] * n
+        self._n_reset, self._n_stepped = 0, 0
+        self._reset_rid_n, self._step_rid_n = [None] * n, [None] * n  # router IDs to respond to
+        self._action_n = [None] * n
+        self._codec_n = [None] * n  # agents may use different codecs
+        self._hello_n = [None] * n  # `hello` answers of the first requests, sent with their responses
+        self._init_obs_n = None
+        try:
+            while True:
+                rid, delim, *frames = self.socket.recv_multipart(copy=False)
+                self._delim = delim
+                codec = get_codec_for(frames)
+                req = codec.decode(frames)
+                method = req["method"]
+                idx = self.uid_to_idx[req["uid"]]
+                self._codec_n[idx] = codec
+                if "hello" in req:
+                    self._hello_n[idx] = self.accept_hello(req["hello"])
+                if method == "step":
+                    self._on_step(idx, rid, req)
+                elif method == "reset":
+                    self._on_reset(idx, rid)
+                elif method == "render":
+                    logging.warning("render method is not supported in multi-agent judge")
+                    self._respond(
+                        idx, rid, {"status": "failed", "reason": "render not supported for multi-agent judge"}
+                    )
+                elif method == "seed":
+                    logging.warning("seed method is not supported in multi-agent judge")
+                    self._respond(idx, rid, "ACK")
+                elif method == "close":
+                    self._respond(idx, rid, "ACK")
                 else:
-                    raise UnexpectedStateError("step", str(self.state))
-            elif method == "reset":
-                if self.state == _State.INITIAL:
-                    self.state = _State.WAIT_RESET
-                    init_obs_n = self.reset()
-                    has_reset[idx] = True
-                    reset_idx_to_rid[idx] = rid
-                elif self.state == _State.WAIT_RESET:
-                    if has_reset[idx]:  # immediately reject invalid request
-                        self.socket.send_multipart(
-                            [
-                                rid,
-                                delim,
-                                json.dumps({"accepted": False}).encode("utf-8"),
-                            ]
-                        )
-                    else:
-                        has_reset[idx] = True
-                        reset_idx_to_rid[idx] = rid
-                        if not (False in has_reset):
-                            # when all agents have called "reset", the episode is started
-                            self.state = _State.WAIT_ACTION
-                            # send initial observation to each agent at the same time
-                            for i in range(self.n_agents):
-                                self.socket.send_multipart(
-                                    [
-                                        reset_idx_to_rid[i],
-                                        delim,
-                                        json.dumps(
-                                            {
-                                                "accepted": True,
-                                                "observation": self.serializer.observation_to_json(
-                                                    init_obs_n[idx]
-                                                ),
-                                            }
-                                        ).encode("utf-8"),
-                                    ]
-                                )
-                            # cleanup
-                            init_obs_n = None
-                            has_reset = [False for _ in range(self.n_agents)]
-                            reset_idx_to_rid = {}
-                else:
-                    raise UnexpectedStateError("reset", str(self.state))
-            elif method == "render":
-                logging.warning("render method is not supported in multi-agent judge")
-                self.socket.send_multipart(
-                    [
-                        rid,
-                        delim,
-                        json.dumps(
-                            {
-                                "status": "failed",
-                                "reason": "render not supported for multi-agent judge",
-                            }
-                        ),
-                    ]
-                )
-                pass
-            elif method == "seed":
-                logging.warning("seed method is not supported in multi-agent judge")
-                self.socket.send_multipart([rid, delim, b"ACK"])
-                pass
-            elif method == "close":
-                self.socket.send_multipart([rid, delim, b"ACK"])
-                pass
-            else:
-                raise UnexpectedMethodError(method)
-            logging.debug(
-                f"Received request from {req['uid']}: {json.loads(message)}, current state: {self.state}"
-            )
+                    raise UnexpectedMethodError(method)
+                logging.debug("Received request from %s: %s, current state: %s", req["uid"], req, self.state)
+        finally:
+            self.close_transport()
+
+    def _on_step(self, idx: int, rid, req: dict):
+        if self.state != _State.WAIT_ACTION:
+            raise UnexpectedStateError("step", str(self.state))
+        if self._step_epoch_n[idx] == self._step_epoch:
+            raise Exception(
+                "this should not happen as agent socket is synchrounous..."
+            )  # TODO
+        self._step_epoch_n[idx] = self._step_epoch
+        self._step_rid_n[idx] = rid
+        self._action_n[idx] = self.serializer.json_to_action(req["action"])
+        self._n_stepped += 1
+        if self._n_stepped == self.n_agents:
+            # when all agents have taken an action, step in the underlying env
+            self._joint_step()
+
+    def _joint_step(self):
+        self.state = _State.STEP
+        result = self.step(list(self._action_n))
+        if len(result) == 5:
+            obs_n, reward_n, terminated_n, truncated_n, info = result
+        else:  # (obs_n, reward_n, done_n, info) of environments with the old gym API
+            obs_n, reward_n, terminated_n, info = result
+            truncated_n = [False] * self.n_agents
+        # the info is shared by all agents: serialized once, and encoded once per codec in use
+        info_json = self.serializer.info_to_json(info)
+        shared = {}
+        for i in range(self.n_agents):
+            codec = self._codec_n[i]
+            if codec not in shared:
+                shared[codec] = {"info": codec.pre_encode(info_json)}
+            resp = {
+                "observation": self.serializer.observation_to_json(obs_n[i]),
+                "reward": reward_n[i],
+                "terminated": terminated_n[i],
+                "truncated": truncated_n[i],
+            }
+            self._respond(i, self._step_rid_n[i], resp, shared)
+        if all(terminated or truncated for terminated, truncated in zip(terminated_n, truncated_n)):
+            self.state = _State.INITIAL
+        else:
+            self.state = _State.WAIT_ACTION
+        self._step_epoch += 1
+        self._n_stepped = 0
+
+    def _on_reset(self, idx: int, rid):
+        if self.state == _State.INITIAL:
+            self.state = _State.WAIT_RESET
+            self._init_obs_n = self.reset()
+        elif self.state != _State.WAIT_RESET:
+            raise UnexpectedStateError("reset", str(self.state))
+        elif self._reset_epoch_n[idx] == self._reset_epoch:  # immediately reject invalid request
+            self._respond(idx, rid, {"accepted": False})
+            return
+        self._reset_epoch_n[idx] = self._reset_epoch
+        self._reset_rid_n[idx] = rid
+        self._n_reset += 1
+        if self._n_reset == self.n_agents:
+            # when all agents have called "reset", the episode is started
+            self.state = _State.WAIT_ACTION
+            # send initial observation to each agent at the same time
+            for i in range(self.n_agents):
+                resp = {
+                    "accepted": True,
+                    "observation": self.serializer.observation_to_json(self._init_obs_n[i]),
+                }
+                self._respond(i, self._reset_rid_n[i], resp)
+            # cleanup
+            self._init_obs_n = None
+            self._reset_epoch += 1
+            self._n_reset = 0
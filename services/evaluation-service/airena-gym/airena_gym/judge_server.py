@@ -0,0 +1,251 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+import zmq
+
+from .codec import JSON_CODEC, choose_codec, get_codec_for
+from .judge_env_base import JudgeEnvBase
+from .transport import ipc_endpoint
+
+# longest time between two checks of the idle sessions
+EXPIRY_CHECK_INTERVAL_MS = 1000
+
+
+class Session:
+    """Environment and state of one agent served by a `JudgeServer`."""
+
+    def __init__(self, uid, judge: JudgeEnvBase):
+        self.uid = uid
+        self.judge = judge
+        self.created_at = time.monotonic()
+        self.last_active = self.created_at
+        self.n_requests = 0
+        self.busy = False  # a request of the session is being served
+
+    def close(self, close_judge: bool = True):
+        if close_judge:
+            self.judge.close()
+
+
+class JudgeServer:
+    """
+    Judge serving many agents at the same time, each in its own session with its own environment,
+    instead of one `JudgeEnv` process per agent.
+
+    Agents connect with `AgentEnv` as to a `JudgeEnv`; sessions are keyed by the `uid` of the
+    agents, which must be unique. A session is created by the first request of an agent, with a
+    judge (e.g. a `JudgeEnv` subclass, never bound) returned by `create_judge`, and ends when the
+    agent closes its environment or after `idle_timeout` seconds without requests.
+
+    With `n_workers` > 0 the requests of different sessions are served by a thread pool, which helps
+    when the environments release the GIL (e.g. physics engines written in C, rendering, sleeps);
+    the requests of a session are always served one after another.
+    """
+
+    transports = ("ipc",)
+
+    def __init__(
+            self,
+            create_judge: Callable[[], JudgeEnvBase],
+            port: Optional[int] = None,
+            n_workers: int = 0,
+            idle_timeout: float = 300.0,
+            max_sessions: int = 64,
+    ):
+        """
+        :param create_judge: returns the judge of a new session
+        :param port: TCP port, default as a random port
+        :param n_workers: number of threads serving the requests, 0 to serve them in the server thread
+        :param idle_timeout: seconds without requests after which a session is closed
+        :param max_sessions: maximum number of live sessions, requests of new agents are refused above
+        """
+        self.create_judge = create_judge
+        self.port = port
+        self.n_workers = n_workers
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.sessions: Dict[object, Session] = {}
+        self.socket = None
+        self.ipc_endpoint = None
+        self._context = None
+        self._results = None  # replies of the workers
+        self._results_endpoint = f"inproc://judge-server-{id(self)}"
+        self._worker_sockets = threading.local()
+        self._in_flight = {}  # routing ID -> (session, method) of the requests served by the workers
+        self._running = False
+
+    def bind(self) -> int:
+        self._context = zmq.Context()
+        self.socket = self._context.socket(zmq.ROUTER)
+        if self.port is not None and self.port != 0:
+            self.socket.bind(f"tcp://*:{self.port}")
+        else:
+            self.port = self.socket.bind_to_random_port("tcp://*")
+        return self.port
+
+    def start(self):
+        """Serve requests until `stop` is called."""
+        logging.info(f"[JudgeServer] starting at {self.port}")
+        poller = zmq.Poller()
+        poller.register(self.socket, zmq.POLLIN)
+        pool = None
+        if self.n_workers > 0:
+            pool = ThreadPoolExecutor(max_workers=self.n_workers, thread_name_prefix="judge-server")
+            self._results = self._context.socket(zmq.PULL)
+            self._results.bind(self._results_endpoint)
+            poller.register(self._results, zmq.POLLIN)
+        poll_timeout = min(EXPIRY_CHECK_INTERVAL_MS, int(self.idle_timeout * 1000))
+        self._running = True
+        try:
+            while self._running:
+                events = dict(poller.poll(poll_timeout))
+                if self.socket in events:
+                    self._receive_all(pool)
+                if self._results is not None and self._results in events:
+                    self._forward_results()
+                self._expire_sessions()
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True)
+            for uid in list(self.sessions):
+                self._close_session(uid)
+            self._close_transport()
+
+    def stop(self):
+        """Make `start` return, can be called from another thread."""
+        self._running = False
+
+    def _receive_all(self, pool: Optional[ThreadPoolExecutor]):
+        while True:
+            try:
+                rid, delim, *frames = self.socket.recv_multipart(zmq.NOBLOCK, copy=False)
+            except zmq.Again:
+                return
+            codec = JSON_CODEC
+            # a bad request must not stop the server: it gets a failure response and the agent raises
+            try:
+                codec = get_codec_for(frames)  # answer in the codec of the request
+                req = codec.decode(frames)
+                uid, method = req["uid"], req["method"]
+                session = self.sessions.get(uid)
+                if session is None:
+                    session = self._open_session(uid)
+                    if session is None:
+                        self._reply(
+                            rid, delim, codec, {"status": "failed", "accepted": False, "reason": "too many sessions"}
+                        )
+                        continue
+                # the transport is set up by the server thread, which owns the socket
+                hello = self._accept_hello(req["hello"]) if "hello" in req else None
+            except Exception as e:
+                logging.exception("[JudgeServer] request refused")
+                self._reply(rid, delim, codec, {"status": "failed", "reason": repr(e)})
+                continue
+            session.last_active = time.monotonic()
+            session.n_requests += 1
+            if pool is None:
+                self.socket.send_multipart([rid, delim, *self._serve(session, req, codec, hello)], copy=False)
+                self._after_request(session, method)
+            else:
+                session.busy = True
+                self._in_flight[rid.bytes] = (session, method)
+                pool.submit(self._serve_in_worker, session, req, codec, hello, rid, delim)
+
+    def _reply(self, rid, delim, codec, resp):
+        """Send `resp` to a request that is not served by a session, through the socket."""
+        self.socket.send_multipart([rid, delim, *codec.encode(resp)], copy=False)
+
+    def _serve(self, session: Session, req: dict, codec, hello: Optional[dict]) -> list:
+        """:return: frames of the response of `session` to `req`, with the `hello` answer if not None"""
+        try:
+            resp = session.judge.handle_request(req)
+        except Exception as e:
+            logging.exception(f"[JudgeServer] session {session.uid}: {req['method']} failed")
+            resp = {"status": "failed", "reason": repr(e)}
+        if hello is not None and isinstance(resp, dict):
+            resp = {**resp, "hello": hello}
+        return codec.encode(resp)
+
+    def _serve_in_worker(self, session: Session, req: dict, codec, hello: Optional[dict], rid, delim):
+        # ZMQ sockets cannot be shared by threads: each worker sends its replies through its own socket
+        results = getattr(self._worker_sockets, "socket", None)
+        if results is None:
+            results = self._worker_sockets.socket = self._context.socket(zmq.PUSH)
+            results.connect(self._results_endpoint)
+        results.send_multipart([rid, delim, *self._serve(session, req, codec, hello)], copy=False)
+
+    def _forward_results(self):
+        while True:
+            try:
+                frames = self._results.recv_multipart(zmq.NOBLOCK, copy=False)
+            except zmq.Again:
+                return
+            session, method = self._in_flight.pop(frames[0].bytes)
+            self.socket.send_multipart(frames, copy=False)
+            session.busy = False
+            self._after_request(session, method)
+
+    def _after_request(self, session: Session, method: str):
+        if method == "close":
+            # the judge is closed by the request itself
+            self._close_session(session.uid, close_judge=False)
+
+    def _open_session(self, uid) -> Optional[Session]:
+        if len(self.sessions) >= self.max_sessions:
+            self._expire_sessions()
+            if len(self.sessions) >= self.max_sessions:
+                logging.warning(f"[JudgeServer] session of {uid} refused: {len(self.sessions)} live sessions")
+                return None
+        session = self.sessions[uid] = Session(uid, self.create_judge())
+        logging.info(f"[JudgeServer] session of {uid} opened ({len(self.sessions)} live sessions)")
+        return session
+
+    def _close_session(self, uid, close_judge: bool = True):
+        session = self.sessions.pop(uid)
+        try:
+            session.close(close_judge)
+        except Exception:
+            logging.exception(f"[JudgeServer] session of {uid}: close failed")
+        logging.info(
+            f"[JudgeServer] session of {uid} closed after {session.n_requests} requests "
+            f"({len(self.sessions)} live sessions)"
+        )
+
+    def _expire_sessions(self):
+        deadline = time.monotonic() - self.idle_timeout
+        for uid, session in list(self.sessions.items()):
+            if not session.busy and session.last_active < deadline:
+                logging.info(f"[JudgeServer] session of {uid} idle for {self.idle_timeout}s")
+                self._close_session(uid)
+
+    def _accept_hello(self, hello: dict) -> dict:
+        """:return: `hello` field of the response, see `JudgeEnvBase.accept_hello`"""
+        return {"codec": choose_codec(hello.get("codecs", [])), **self._accept_transport(hello.get("transports", []))}
+
+    def _accept_transport(self, offered) -> dict:
+        """:return: fields of the `hello` response describing the transport, see `JudgeEnvBase.accept_transport`"""
+        for name in offered:
+            if name not in self.transports:
+                continue
+            try:
+                if self.ipc_endpoint is None:
+                    endpoint = ipc_endpoint(self.port)
+                    self.socket.bind(endpoint)
+                    self.ipc_endpoint = endpoint
+            except (zmq.ZMQError, OSError) as e:
+                logging.warning(f"[JudgeServer] transport {name} not available: {e}")
+                continue
+            return {"transport": name, "endpoint": self.ipc_endpoint}
+        return {}
+
+    def _close_transport(self):
+        if self.ipc_endpoint is not None:
+            try:
+                os.unlink(self.ipc_endpoint[len("ipc://"):])
+            except OSError:
+                pass
+            self.ipc_endpoint = None
@@ -0,0 +1,93 @@
+import logging
+import multiprocessing
+import time
+from typing import Callable, Optional
+
+from .exceptions import JudgeLaunchError
+
+# how long `launch_judge` waits for the judge to bind its socket
+LAUNCH_TIMEOUT = 10.0
+
+
+class JudgeProcess:
+    """Judge started by `launch_judge`, terminated when leaving a `with` block."""
+
+    def __init__(self, process: multiprocessing.Process, port: int):
+        self.process = process
+        self.port = port
+
+    def terminate(self, timeout: float = 5.0):
+        """Terminate the judge, kill it if it is still alive after `timeout` seconds."""
+        if not self.process.is_alive():
+            return
+        self.process.terminate()
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+
+    def __enter__(self) -> "JudgeProcess":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.terminate()
+
+
+def _run_judge(create_judge, conn):
+    try:
+        judge = create_judge()
+        port = judge.bind()
+    except BaseException as e:
+        conn.send(("error", repr(e)))
+        conn.close()
+        raise
+    conn.send(("ready", port))
+    conn.close()
+    judge.start()
+
+
+def launch_judge(
+        create_judge: Callable,
+        timeout: float = LAUNCH_TIMEOUT,
+        daemon: bool = True,
+        context: Optional[multiprocessing.context.BaseContext] = None,
+) -> JudgeProcess:
+    """
+    Start a judge in a new process and return as soon as its socket is bound.
+
+    The port is sent back through a pipe, so there is no polling: a judge that fails to start is
+    reported as soon as it fails, and a judge that does not bind in time is terminated.
+
+    :param create_judge: returns the judge (a `JudgeEnv`, `JudgeMultiEnv`, `JudgeServer`, ...), called
+                         in the new process
+    :param timeout: seconds to wait for the judge to bind its socket
+    :param daemon: if True, the judge is terminated when the current process exits
+                   (it cannot start processes itself)
+    :param context: multiprocessing context, default as the default context
+    :return: the judge process, with the port of the judge
+    """
+    context = context or multiprocessing.get_context()
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(target=_run_judge, args=(create_judge, child_conn), daemon=daemon)
+    start_time = time.monotonic()
+    process.start()
+    child_conn.close()  # so that `recv` fails as soon as the judge exits
+    judge = JudgeProcess(process, port=None)
+    try:
+        if not parent_conn.poll(timeout):
+            raise JudgeLaunchError(f"judge not ready after {timeout}s")
+        try:
+            status, value = parent_conn.recv()
+        except EOFError:
+            process.join(1)
+            raise JudgeLaunchError(f"judge exited before binding its socket (exit code {process.exitcode})")
+        if status != "ready":
+            raise JudgeLaunchError(f"judge failed to start: {value}")
+    except BaseException:
+        judge.terminate()
+        raise
+    finally:
+        parent_conn.close()
+    judge.port = value
+    logging.info(f"[launch_judge] judge ready at {value} after {time.monotonic() - start_time:.3f}s")
+    return judge
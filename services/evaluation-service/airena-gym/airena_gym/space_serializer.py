@@ -0,0 +1,142 @@
+"""Serializer derived from the action and observation spaces of an environment.
+
+`SpaceSerializer` compiles an encoder and a decoder for each space once, when it is created:
+
+- `Discrete`: a Python int.
+- `Box`, `MultiDiscrete`, `MultiBinary`: a C-contiguous NumPy array of the dtype of the space, sent
+  as raw bytes by the binary codec (see `codec.BinaryCodec`).
+- `Dict` and `Tuple` whose leaves are all of the spaces above: every leaf is packed into one
+  contiguous uint8 buffer with a fixed layout, decoded as views on the received buffer.
+- other `Dict` and `Tuple`: a dict or list of their encoded subspaces.
+- any other space: `Space.to_jsonable` / `Space.from_jsonable`.
+
+Decoded arrays may be read-only views on the received message, as with `codec.BinaryCodec`.
+"""
+from typing import Any, Callable, List, Tuple
+
+import numpy as np
+from gymnasium import spaces
+
+from .env_serializer import EnvSerializer
+
+_Encoder = Callable[[Any], Any]
+_Decoder = Callable[[Any], Any]
+
+
+def _is_fixed_leaf(space: spaces.Space) -> bool:
+    return isinstance(space, (spaces.Box, spaces.Discrete, spaces.MultiDiscrete, spaces.MultiBinary))
+
+
+def _leaves(space: spaces.Space, path: tuple = ()) -> List[Tuple[tuple, spaces.Space]]:
+    """:return: (path, space) of the leaves of a `Dict` / `Tuple` space, depth first"""
+    if isinstance(space, spaces.Dict):
+        return [leaf for key, subspace in space.spaces.items() for leaf in _leaves(subspace, path + (key,))]
+    if isinstance(space, spaces.Tuple):
+        return [leaf for i, subspace in enumerate(space.spaces) for leaf in _leaves(subspace, path + (i,))]
+    return [(path, space)]
+
+
+def _compile_packed(space: spaces.Space) -> Tuple[_Encoder, _Decoder]:
+    """Encoder and decoder of a `Dict` / `Tuple` space with fixed-layout leaves, as one buffer."""
+    layout = []  # (path, dtype, shape, offset, is_discrete)
+    offset = 0
+    for path, leaf in _leaves(space):
+        is_discrete = isinstance(leaf, spaces.Discrete)
+        dtype = np.dtype(np.int64) if is_discrete else leaf.dtype
+        shape = () if is_discrete else leaf.shape
+        offset = -(-offset // dtype.itemsize) * dtype.itemsize  # aligned on the item size
+        layout.append((path, dtype, shape, offset, is_discrete))
+        offset += dtype.itemsize * int(np.prod(shape, dtype=np.int64))
+    size = offset
+
+    def get(value, path):
+        for key in path:
+            value = value[key]
+        return value
+
+    def encode(value):
+        buf = np.zeros(size, dtype=np.uint8)
+        for path, dtype, shape, offset, _ in layout:
+            count = int(np.prod(shape, dtype=np.int64))
+            buf[offset:offset + dtype.itemsize * count].view(dtype)[:] = np.ravel(get(value, path))
+        return buf
+
+    def build(space, items, path):
+        if isinstance(space, spaces.Dict):
+            return {key: build(subspace, items, path + (key,)) for key, subspace in space.spaces.items()}
+        if isinstance(space, spaces.Tuple):
+            return tuple(build(subspace, items, path + (i,)) for i, subspace in enumerate(space.spaces))
+        return items[path]
+
+    def decode(value):
+        buf = value if isinstance(value, np.ndarray) else np.asarray(value, dtype=np.uint8)  # JSON: list of bytes
+        items = {}
+        for path, dtype, shape, offset, is_discrete in layout:
+            count = int(np.prod(shape, dtype=np.int64))
+            item = np.frombuffer(buf, dtype=dtype, count=count, offset=offset).reshape(shape)
+            items[path] = int(item) if is_discrete else item
+        return build(space, items, ())
+
+    return encode, decode
+
+
+def compile_space(space: spaces.Space) -> Tuple[_Encoder, _Decoder]:
+    """:return: (encoder, decoder) of the values of `space`"""
+    if isinstance(space, spaces.Discrete):
+        return int, int
+    if isinstance(space, (spaces.Box, spaces.MultiDiscrete, spaces.MultiBinary)):
+        dtype, shape = space.dtype, space.shape
+        return (
+            lambda value: np.ascontiguousarray(value, dtype=dtype),
+            lambda value: np.asarray(value, dtype=dtype).reshape(shape),
+        )
+    if isinstance(space, (spaces.Dict, spaces.Tuple)):
+        if all(_is_fixed_leaf(leaf) for _, leaf in _leaves(space)):
+            return _compile_packed(space)
+        if isinstance(space, spaces.Dict):
+            coders = {key: compile_space(subspace) for key, subspace in space.spaces.items()}
+            return (
+                lambda value: {key: coder[0](value[key]) for key, coder in coders.items()},
+                lambda value: {key: coder[1](value[key]) for key, coder in coders.items()},
+            )
+        coders = [compile_space(subspace) for subspace in space.spaces]
+        return (
+            lambda value: [coder[0](item) for coder, item in zip(coders, value)],
+            lambda value: tuple(coder[1](item) for coder, item in zip(coders, value)),
+        )
+    return (
+        lambda value: space.to_jsonable([value])[0],
+        lambda value: space.from_jsonable([value])[0],
+    )
+
+
+class SpaceSerializer(EnvSerializer):
+    """
+    Serializer of the actions and observations of `action_space` and `observation_space`, used by
+    `AgentEnv` and `JudgeEnv` when they are given no serializer. Infos are sent as they are, see
+    `codec` for the values that can be sent.
+    """
+
+    def __init__(self, action_space: spaces.Space, observation_space: spaces.Space):
+        self.action_space = action_space
+        self.observation_space = observation_space
+        self._encode_action, self._decode_action = compile_space(action_space)
+        self._encode_observation, self._decode_observation = compile_space(observation_space)
+
+    def action_to_json(self, action):
+        return self._encode_action(action)
+
+    def json_to_action(self, action_json):
+        return self._decode_action(action_json)
+
+    def observation_to_json(self, obs):
+        return self._encode_observation(obs)
+
+    def json_to_observation(self, obs_json):
+        return self._decode_observation(obs_json)
+
+    def info_to_json(self, info):
+        return info
+
+    def json_to_info(self, info_json):
+        return info_json
@@ -0,0 +1,128 @@
+import atexit
+import logging
+import os
+import struct
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+# sample one request every N, 0 to disable the traces
+TRACE_SAMPLE_ENV = "AIRENA_GYM_TRACE_SAMPLE"
+# path of the binary trace file, "{pid}" is replaced by the process ID
+TRACE_FILE_ENV = "AIRENA_GYM_TRACE_FILE"
+
+METHODS = ("step", "reset", "render", "close")
+_METHOD_CODES = {method: code for code, method in enumerate(METHODS)}
+_UNKNOWN_METHOD = 255
+
+# uid, method code, wall time at the start of the request (s), latency (s), bytes sent and received
+_RECORD = struct.Struct("<qBddQ")
+TRACE_DTYPE = np.dtype(
+    [("uid", "<i8"), ("method", "u1"), ("t", "<f8"), ("latency", "<f8"), ("bytes", "<u8")]
+)
+assert TRACE_DTYPE.itemsize == _RECORD.size
+
+
+def frames_size(frames) -> int:
+    """:return: number of bytes in `frames` (bytes, memoryviews or `zmq.Frame`)"""
+    return sum(memoryview(frame).nbytes for frame in frames)
+
+
+class Tracer:
+    """
+    Sampled traces of the requests between agents and judges: one request every `sample_every` is
+    timed and logged at debug level, and appended to the binary trace file at `path` if set.
+    Requests that are not sampled cost one counter decrement.
+
+    The trace file is a sequence of fixed-size records, read by `read_trace`.
+    """
+
+    def __init__(self, sample_every: int = 0, path: Optional[str] = None):
+        self.sample_every = sample_every
+        self.path = path
+        self._countdown = sample_every
+        self._file = None
+        self._file_pid = None
+        self._lock = threading.Lock()  # agents and judges of a process can trace from several threads
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        """:return: tracer configured by the `AIRENA_GYM_TRACE_SAMPLE` and `AIRENA_GYM_TRACE_FILE` variables"""
+        try:
+            sample_every = max(int(os.environ.get(TRACE_SAMPLE_ENV, 0)), 0)
+        except ValueError:
+            logging.warning(f"[Tracer] invalid {TRACE_SAMPLE_ENV}, traces disabled")
+            sample_every = 0
+        path = os.environ.get(TRACE_FILE_ENV) or None
+        if path is not None and sample_every == 0:
+            sample_every = 1
+        return cls(sample_every, path)
+
+    def sample(self) -> Optional[float]:
+        """:return: start time of the request if it is sampled, None otherwise"""
+        if not self.sample_every:
+            return None
+        self._countdown -= 1
+        if self._countdown > 0:
+            return None
+        self._countdown = self.sample_every
+        return time.perf_counter()
+
+    def record(self, uid, method: str, start: float, n_bytes: int):
+        """
+        Trace a sampled request.
+
+        :param start: value returned by `sample` for this request
+        :param n_bytes: bytes sent and received for this request
+        """
+        latency = time.perf_counter() - start
+        logging.debug("[trace] uid: %s, method: %s, latency: %.6fs, bytes: %d", uid, method, latency, n_bytes)
+        if self.path is None:
+            return
+        record = _RECORD.pack(
+            uid if isinstance(uid, int) else -1,
+            _METHOD_CODES.get(method, _UNKNOWN_METHOD),
+            time.time() - latency,
+            latency,
+            n_bytes,
+        )
+        with self._lock:
+            if self._file_pid != os.getpid():  # first record, or first record after a fork
+                # unbuffered: processes started by `multiprocessing` exit without running `atexit`
+                self._file = open(self.path.format(pid=os.getpid()), "ab", buffering=0)
+                self._file_pid = os.getpid()
+                atexit.register(self.close)
+            self._file.write(record)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None and self._file_pid == os.getpid():
+                self._file.close()
+            self._file = None
+            self._file_pid = None
+
+
+def read_trace(path: str) -> np.ndarray:
+    """:return: records of a trace file, as a structured array of `TRACE_DTYPE`"""
+    return np.fromfile(path, dtype=TRACE_DTYPE)
+
+
+_tracer = None
+
+
+def get_tracer() -> Tracer:
+    """:return: tracer of the process, configured from the environment on first use"""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer.from_env()
+    return _tracer
+
+
+def set_tracer(tracer: Tracer):
+    """Replace the tracer of the process, e.g. to enable traces without environment variables."""
+    global _tracer
+    if _tracer is not None and _tracer is not tracer:
+        _tracer.close()
+    _tracer = tracer
@@ -0,0 +1,17 @@
+"""Transports of the agent/judge protocol.
+
+Agents always connect to the judge over TCP first. Since the judge and the agents run on the same
+host, the `hello` field of their first request also offers a faster local transport (see `AgentEnv`):
+
+- "ipc": the judge binds its socket to a Unix domain socket as well, and the agent reconnects to it.
+"""
+import os
+import tempfile
+
+# transports offered by local agents, most preferred first
+PREFERRED_TRANSPORTS = ("ipc",)
+
+
+def ipc_endpoint(port: int) -> str:
+    """:return: Unix domain socket endpoint of the judge listening on TCP `port`"""
+    return f"ipc://{tempfile.gettempdir()}/airena-gym-{os.getpid()}-{port}.ipc"
@@ -0,0 +1,104 @@
+import logging
+from typing import Optional
+
+import gymnasium as gym
+import numpy as np
+import zmq
+from gymnasium.vector.utils import batch_space, concatenate, create_empty_array, iterate
+
+from .agent_env import AgentEnv, NotAllowedToReset
+from .env_serializer import EnvSerializer
+from .exceptions import RequestFailedError
+
+# how long `close` waits for the judge, so that closing a vector env of a dead judge does not hang
+CLOSE_TIMEOUT_MS = 5000
+
+
+class VectorAgentEnv(gym.vector.VectorEnv):
+    """
+    Agent side of a `VectorJudgeEnv`: `num_envs` copies of an environment stepped with one round
+    trip per step, with the `gymnasium.vector.VectorEnv` API and `NEXT_STEP` autoreset (after a copy
+    terminates or is truncated, its next step resets it and ignores its action). Copies can also be
+    reset on their own with `reset(options={"reset_mask": mask})`.
+    """
+
+    metadata = {"autoreset_mode": gym.vector.AutoresetMode.NEXT_STEP}
+
+    def __init__(
+        self,
+        serializer: Optional[EnvSerializer],
+        single_action_space,
+        single_observation_space,
+        num_envs: int,
+        uid,
+        port,
+        codec: Optional[str] = None,
+        transport: Optional[str] = None,
+    ):
+        """
+        :param serializer: serializer of the observations and actions of a single copy, default as a
+                           `SpaceSerializer` derived from the single spaces
+        :param num_envs: number of copies, must be the number of copies of the judge
+        Other params please refer to `AgentEnv`.
+        """
+        self.num_envs = num_envs
+        self.single_action_space = single_action_space
+        self.single_observation_space = single_observation_space
+        self.action_space = batch_space(single_action_space, num_envs)
+        self.observation_space = batch_space(single_observation_space, num_envs)
+        self.uid = uid
+        # the connection, codec and transport are handled as for a single environment
+        self._agent_env = AgentEnv(
+            serializer, single_action_space, single_observation_space, uid, port, codec=codec, transport=transport
+        )
+        self.serializer = self._agent_env.serializer
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def step_async(self, actions) -> None:
+        """Send `actions` to the judge without waiting for the result, see `AgentEnv.step_async`."""
+        self._agent_env._send(
+            {
+                "uid": self.uid,
+                "method": "step",
+                "actions": [
+                    self.serializer.action_to_json(action) for action in iterate(self.action_space, actions)
+                ],
+            }
+        )
+
+    def step_wait(self, timeout_ms: Optional[int] = None):
+        """:return: result of the step started by `step_async`, see `AgentEnv.step_wait`"""
+        if self._agent_env._pending != "step":
+            raise gym.error.NoAsyncCallError("`step_wait` called without `step_async`", "step")
+        resp = self._agent_env._recv(timeout_ms)
+        return (
+            self._json_to_observations(resp["observations"]),
+            np.asarray(resp["rewards"], dtype=np.float64),
+            np.asarray(resp["terminations"], dtype=np.bool_),
+            np.asarray(resp["truncations"], dtype=np.bool_),
+            resp["infos"],
+        )
+
+    def reset(self, *, seed=None, options=None):
+        if options is not None and "reset_mask" in options:
+            options = {**options, "reset_mask": np.asarray(options["reset_mask"], dtype=np.bool_)}
+        resp = self._agent_env._request({"uid": self.uid, "method": "reset", "seed": seed, "options": options})
+        if not resp["accepted"]:
+            raise NotAllowedToReset
+        return self._json_to_observations(resp["observations"]), resp["infos"]
+
+    def close_extras(self, **kwargs):
+        try:
+            self._agent_env._request({"uid": self.uid, "method": "close"}, timeout_ms=CLOSE_TIMEOUT_MS)
+        except (TimeoutError, zmq.ZMQError, RequestFailedError) as e:
+            logging.warning(f"[VectorAgentEnv {self.uid}| close] judge not closed: {e}")
+
+    def _json_to_observations(self, obs_json):
+        return concatenate(
+            self.single_observation_space,
+            [self.serializer.json_to_observation(single_obs) for single_obs in obs_json],
+            create_empty_array(self.single_observation_space, self.num_envs),
+        )
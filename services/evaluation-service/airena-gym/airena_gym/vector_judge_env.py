@@ -0,0 +1,80 @@
+from typing import Callable, Optional, Sequence
+
+import gymnasium as gym
+import numpy as np
+from gymnasium.vector.utils import concatenate, create_empty_array, iterate
+
+from .env_serializer import EnvSerializer
+from .judge_env import JudgeEnv
+
+
+class VectorJudgeEnv(JudgeEnv):
+    """
+    Judge hosting `len(env_fns)` independent copies of an environment, stepped together by a
+    `VectorAgentEnv`: every request carries one action per copy, so a single round trip steps all of
+    them. The copies run in a `gymnasium.vector.SyncVectorEnv` with `NEXT_STEP` autoreset.
+
+    `serializer` works on the observations and actions of a single copy (default as a
+    `SpaceSerializer` of the single spaces); infos are sent as returned by the vector environment.
+    """
+
+    def __init__(
+            self,
+            serializer: Optional[EnvSerializer],
+            env_fns: Sequence[Callable[[], gym.Env]],
+            port=None,
+    ):
+        self.env = gym.vector.SyncVectorEnv(env_fns, autoreset_mode=gym.vector.AutoresetMode.NEXT_STEP)
+        self.num_envs = self.env.num_envs
+        super().__init__(
+            serializer,
+            self.env.single_action_space,
+            self.env.single_observation_space,
+            port=port,
+        )
+
+    def step(self, actions):
+        return self.env.step(actions)
+
+    def reset(self, seed=None, options=None):
+        return self.env.reset(seed=seed, options=options)
+
+    def render(self):
+        return None
+
+    def close(self):
+        self.env.close()
+
+    def handle_request(self, req: dict):
+        method = req["method"]
+        if method == "step":
+            actions = concatenate(
+                self.action_space,
+                [self.serializer.json_to_action(action) for action in req["actions"]],
+                create_empty_array(self.action_space, self.num_envs),
+            )
+            obs, rewards, terminations, truncations, infos = self.step(actions)
+            return {
+                "observations": self._observations_to_json(obs),
+                "rewards": rewards,
+                "terminations": terminations,
+                "truncations": truncations,
+                "infos": infos,
+            }
+        elif method == "reset":
+            options = req.get("options")
+            if options is not None and "reset_mask" in options:
+                options = {**options, "reset_mask": np.asarray(options["reset_mask"], dtype=np.bool_)}
+            obs, infos = self.reset(seed=req.get("seed"), options=options)
+            return {
+                "accepted": True,
+                "observations": self._observations_to_json(obs),
+                "infos": infos,
+            }
+        return super().handle_request(req)
+
+    def _observations_to_json(self, obs):
+        return [
+            self.serializer.observation_to_json(single_obs)
+            for single_obs in iterate(self.env.observation_space, obs)
+        ]
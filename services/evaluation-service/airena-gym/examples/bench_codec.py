@@ -0,0 +1,125 @@
+"""
+Steps per second of an agent/judge pair with the JSON and the binary codec, over TCP and ipc.
+
+    python bench_codec.py [--steps 5000]
+"""
+import argparse
+import time
+from functools import partial
+
+import gymnasium as gym
+import numpy as np
+
+from airena_gym import AgentEnv, EnvSerializer, JudgeEnv, launch_judge
+
+
+class JsonSerializer(EnvSerializer):
+    """Serializer of the JSON codec: arrays go through lists."""
+
+    def action_to_json(self, action):
+        return int(action)
+
+    def json_to_action(self, action_json):
+        return action_json
+
+    def observation_to_json(self, obs):
+        return obs.tolist()
+
+    def json_to_observation(self, obs_json):
+        return np.array(obs_json)
+
+    def info_to_json(self, info):
+        return info
+
+    def json_to_info(self, info_json):
+        return info_json
+
+
+class BinarySerializer(JsonSerializer):
+    """Serializer of the binary codec: arrays are sent as they are."""
+
+    def observation_to_json(self, obs):
+        return obs
+
+    def json_to_observation(self, obs_json):
+        return obs_json
+
+
+class ImageEnv(gym.Env):
+    """Returns random 84x84 RGB frames, like an Atari env after preprocessing."""
+
+    def __init__(self):
+        self.observation_space = gym.spaces.Box(0, 255, (84, 84, 3), dtype=np.uint8)
+        self.action_space = gym.spaces.Discrete(4)
+        self._frames = np.random.default_rng(0).integers(0, 256, (16, 84, 84, 3), dtype=np.uint8)
+        self._t = 0
+
+    def reset(self, seed=None, options=None):
+        self._t = 0
+        return self._frames[0], {}
+
+    def step(self, action):
+        self._t += 1
+        return self._frames[self._t % len(self._frames)], 1.0, False, self._t >= 1000, {}
+
+
+ENVS = {
+    "CartPole-v1": lambda: gym.make("CartPole-v1"),
+    "image 84x84x3": ImageEnv,
+}
+
+
+class BenchJudgeEnv(JudgeEnv):
+    def __init__(self, env, serializer):
+        self.env = env
+        super().__init__(serializer, env.action_space, env.observation_space)
+
+    def step(self, action):
+        return self.env.step(action)
+
+    def reset(self, seed=None):
+        return self.env.reset(seed=seed)
+
+    def render(self):
+        return None
+
+    def close(self):
+        self.env.close()
+
+
+def create_judge(env_name, codec):
+    serializer = BinarySerializer() if codec == "binary" else JsonSerializer()
+    return BenchJudgeEnv(ENVS[env_name](), serializer)
+
+
+def bench(env_name, codec, transport, n_steps):
+    judge = launch_judge(partial(create_judge, env_name, codec))
+    port = judge.port
+    env = ENVS[env_name]()
+    serializer = BinarySerializer() if codec == "binary" else JsonSerializer()
+    agent = AgentEnv(serializer, env.action_space, env.observation_space, uid=0, port=port, codec=codec,
+                     transport=transport)
+    agent.reset()
+    start_time = time.perf_counter()
+    for _ in range(n_steps):
+        _, _, terminated, truncated, _ = agent.step(agent.action_space.sample())
+        if terminated or truncated:
+            agent.reset()
+    elapsed = time.perf_counter() - start_time
+    agent.close()
+    judge.process.join()
+    return n_steps / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=5000)
+    args = parser.parse_args()
+    for env_name in ENVS:
+        for codec, transport in (("json", "tcp"), ("binary", "tcp"), ("binary", "ipc")):
+            steps_per_sec = bench(env_name, codec, transport, args.steps)
+            print(f"{env_name:<16} {codec:<8} {transport:<4} {steps_per_sec:10.0f} steps/s")
+
+
+if __name__ == "__main__":
+    main()
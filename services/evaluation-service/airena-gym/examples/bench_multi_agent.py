@@ -0,0 +1,111 @@
+"""
+Joint steps per second of a `JudgeMultiEnv` with 2 to 64 agents, each agent in its own process.
+
+    python bench_multi_agent.py [--steps 2000] [--info-size 64]
+"""
+import argparse
+import time
+from functools import partial
+from multiprocessing import Barrier, Process, Queue
+
+import gymnasium as gym
+import numpy as np
+
+from airena_gym import AgentEnv, EnvSerializer, JudgeMultiEnv, launch_judge
+
+N_AGENTS = (2, 4, 8, 16, 32, 64)
+
+
+class BenchSerializer(EnvSerializer):
+    def action_to_json(self, action):
+        return int(action)
+
+    def json_to_action(self, action_json):
+        return action_json
+
+    def observation_to_json(self, obs):
+        return obs
+
+    def json_to_observation(self, obs_json):
+        return obs_json
+
+    def info_to_json(self, info):
+        return info
+
+    def json_to_info(self, info_json):
+        return info_json
+
+
+class BenchJudgeEnv(JudgeMultiEnv):
+    """Each agent observes a small vector; the info shared by all agents has `info_size` entries."""
+
+    def __init__(self, n_agents, info_size):
+        self.observation_space = gym.spaces.Box(-1, 1, (8,), dtype=np.float32)
+        super().__init__(
+            BenchSerializer(),
+            gym.spaces.Discrete(4),
+            self.observation_space,
+            n_agents,
+            {uid: uid for uid in range(n_agents)},
+        )
+        self._obs_n = [np.full(8, i, dtype=np.float32) for i in range(n_agents)]
+        self._info = {f"agent_{i}": {"score": float(i), "alive": True} for i in range(info_size)}
+
+    def step(self, action_n):
+        return self._obs_n, [1.0] * self.n_agents, [False] * self.n_agents, [False] * self.n_agents, self._info
+
+    def reset(self, seed=None):
+        return self._obs_n
+
+    def render(self):
+        return None
+
+    def close(self):
+        pass
+
+
+def run_agent(uid, port, codec, n_steps, barrier, results):
+    env = AgentEnv(
+        BenchSerializer(), gym.spaces.Discrete(4), gym.spaces.Box(-1, 1, (8,), dtype=np.float32),
+        uid=uid, port=port, codec=codec,
+    )
+    env.reset()
+    barrier.wait()
+    start_time = time.perf_counter()
+    for _ in range(n_steps):
+        env.step(0)
+    results.put(time.perf_counter() - start_time)
+
+
+def bench(n_agents, codec, n_steps, info_size):
+    with launch_judge(partial(BenchJudgeEnv, n_agents, info_size)) as judge:
+        barrier = Barrier(n_agents)
+        results = Queue()
+        agents = [
+            Process(target=run_agent, args=(uid, judge.port, codec, n_steps, barrier, results))
+            for uid in range(n_agents)
+        ]
+        for agent in agents:
+            agent.start()
+        elapsed = max(results.get() for _ in agents)
+        for agent in agents:
+            agent.join()
+    return n_steps / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--info-size", type=int, default=64)
+    args = parser.parse_args()
+    for codec in ("json", "binary"):
+        for n_agents in N_AGENTS:
+            steps_per_sec = bench(n_agents, codec, args.steps, args.info_size)
+            print(
+                f"{n_agents:3d} agents {codec:<8} {steps_per_sec:8.0f} joint steps/s "
+                f"{steps_per_sec * n_agents:10.0f} agent steps/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
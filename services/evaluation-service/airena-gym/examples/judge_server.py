@@ -0,0 +1,16 @@
+import logging
+
+from airena_gym import JudgeServer
+from judge import CartPoleJudgeEnv
+
+
+def main():
+    # one CartPole environment per agent, agents must use distinct uids
+    server = JudgeServer(CartPoleJudgeEnv, port=5555, n_workers=4, idle_timeout=60, max_sessions=32)
+    server.bind()
+    server.start()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -1,4 +1,9 @@
+from typing import Sequence
+
+import numpy as np
+
 from .abc.evaluator import Evaluator, EvaluationResult
+from .stats import MinMax, P2Quantile, RecordBuffer, RunningSum, Welford
 
 
 class RewardEvaluator(Evaluator):
@@ -6,20 +11,22 @@ class RewardEvaluator(Evaluator):
 
     def __init__(self):
         super().__init__()
-        self.episodes = []
+        self.episodes = []  # total reward of each episode, one `RunningSum` per episode
 
     def reset(self) -> None:
-        self.episodes.append([])
+        self.episodes.append(RunningSum())
 
     def step(self, full_state) -> None:
-        self.episodes[-1].append(full_state["reward"])
+        self.episodes[-1].add(full_state["reward"])
 
     def get_result(self) -> EvaluationResult:
-        total_reward_per_episode = [sum(r) for r in self.episodes]
-        total_reward = sum(total_reward_per_episode)
+        total_reward_per_episode = [r.value for r in self.episodes]
+        total_reward = RunningSum()
+        for r in total_reward_per_episode:
+            total_reward.add(r)
         return EvaluationResult(
             name="reward evaluation",
-            value=total_reward / len(self.episodes),
+            value=total_reward.value / len(self.episodes) if self.episodes else 0,
             results=total_reward_per_episode,
             error=self.error,
         )
@@ -42,10 +49,86 @@ class StepCountEvaluator(Evaluator):
     def get_result(self) -> EvaluationResult:
         return EvaluationResult(
             name="step count evaluation (average survival steps)",
-            value=self.total_steps / self.total_episodes,
+            value=self.total_steps / self.total_episodes if self.total_episodes else 0,
             results={
                 "total_episodes": self.total_episodes,
                 "total_steps": self.total_steps,
             },
             error=self.error,
         )
+
+
+class RewardStatsEvaluator(Evaluator):
+    """Evaluates average reward across episodes, with statistics of the episode rewards and of the
+    step rewards.
+
+    Memory is O(1) per step: the rewards of the steps are aggregated as they come (mean, standard
+    deviation, min, max, and estimates of `step_quantiles`), only the total reward of each episode
+    is kept. Set `record_steps` to also keep every step reward in `records` (a `RecordBuffer`).
+    """
+
+    def __init__(
+        self,
+        quantiles: Sequence[float] = (0.05, 0.5, 0.95),
+        step_quantiles: Sequence[float] = (),
+        record_steps: bool = False,
+    ):
+        """
+        :param quantiles: quantiles of the episode rewards to report (exact)
+        :param step_quantiles: quantiles of the step rewards to report (P² estimates)
+        :param record_steps: whether to keep every step reward
+        """
+        super().__init__()
+        self.quantiles = tuple(quantiles)
+        self.episodes = []  # total reward of each episode, one `RunningSum` per episode
+        self.step_stats = Welford()
+        self.step_range = MinMax()
+        self.step_quantiles = [P2Quantile(q) for q in step_quantiles]
+        self.records = RecordBuffer() if record_steps else None
+
+    def reset(self) -> None:
+        self.episodes.append(RunningSum())
+        if self.records is not None:
+            self.records.reset()
+
+    def step(self, full_state) -> None:
+        reward = float(full_state["reward"])
+        self.episodes[-1].add(reward)
+        self.step_stats.add(reward)
+        self.step_range.add(reward)
+        for quantile in self.step_quantiles:
+            quantile.add(reward)
+        if self.records is not None:
+            self.records.add(reward)
+
+    def get_result(self) -> EvaluationResult:
+        episode_rewards = np.array([r.value for r in self.episodes], dtype=np.float64)
+        if len(episode_rewards):
+            episodes = {
+                "mean": float(np.mean(episode_rewards)),
+                "std": float(np.std(episode_rewards)),
+                "min": float(np.min(episode_rewards)),
+                "max": float(np.max(episode_rewards)),
+                "quantiles": {str(q): float(np.quantile(episode_rewards, q)) for q in self.quantiles},
+            }
+        else:
+            episodes = {}
+        steps = {"count": self.step_stats.count}
+        if self.step_stats.count:
+            steps.update(
+                mean=self.step_stats.mean,
+                std=self.step_stats.std,
+                min=self.step_range.min,
+                max=self.step_range.max,
+                quantiles={str(quantile.q): quantile.value for quantile in self.step_quantiles},
+            )
+        return EvaluationResult(
+            name="reward statistics evaluation",
+            value=episodes.get("mean", 0),
+            results={
+                "total_episodes": len(episode_rewards),
+                "episode_rewards": episodes,
+                "step_rewards": steps,
+            },
+            error=self.error,
+        )
@@ -1,11 +1,10 @@
 import json
 import logging
 
-import requests
-
 from .errors import QueueInfoNotFound, StopConsumingError, ResumeConsumingError
 from .models import QueueInfo, Submission, ExecutionOutput, Job
-from .settings import SCHEDULER_BASE_URL, FILE_SERVICE_BASE_URL, RESULT_SERVICE_BASE_URL, ACCESS_TOKEN, WORKER_NAME, FULL_WORKER_NAME
+from .session import request
+from .settings import SCHEDULER_BASE_URL, FILE_SERVICE_BASE_URL, RESULT_SERVICE_BASE_URL, WORKER_NAME, FULL_WORKER_NAME
 
 logger = logging.getLogger("root")
 
@@ -20,12 +19,12 @@ def get_submission_url(submission_id: int):
 
 def start_job(job_id, celery_task_id) -> Job:
     worker_name = WORKER_NAME
-    resp = requests.get(SCHEDULER_BASE_URL + f"/api/training_jobs/{job_id}/start/",
-                        headers={"Authorization": f"Token {ACCESS_TOKEN}"},
-                        data={
-                            "worker_name": worker_name,
-                            "task_id": celery_task_id
-                        })
+    # starting an already running job only sets its status again, so retrying is safe
+    resp = request("GET", SCHEDULER_BASE_URL + f"/api/training_jobs/{job_id}/start/", endpoint="start_job", idempotent=True,
+                   data={
+                       "worker_name": worker_name,
+                       "task_id": celery_task_id
+                   })
     if resp.status_code != 200:
         raise Exception(resp.content)
     obj = json.loads(resp.content)
@@ -37,12 +36,12 @@ def start_job(job_id, celery_task_id) -> Job:
 
 
 def submit_job(job_id, celery_task_id, output: ExecutionOutput):
-    resp = requests.get(SCHEDULER_BASE_URL + f"/api/training_jobs/{job_id}/complete/",
-                        headers={"Authorization": f"Token {ACCESS_TOKEN}"},
-                        data={
-                            "task_id": celery_task_id,
-                            "ok": output.ok,
-                        })
+    # not retried: completing a job twice is rejected by the scheduler
+    resp = request("GET", SCHEDULER_BASE_URL + f"/api/training_jobs/{job_id}/complete/", endpoint="complete_job",
+                   data={
+                       "task_id": celery_task_id,
+                       "ok": output.ok,
+                   })
 
     print(output)
 
@@ -55,11 +54,9 @@ def submit_job(job_id, celery_task_id, output: ExecutionOutput):
             "error": output.error,
             "outputUri": str(output.result.get("file_id")) if output.result else None,
         }
-        result_resp = requests.post(
-            RESULT_SERVICE_BASE_URL + "/training-results/",
-            headers={"Authorization": f"Token {ACCESS_TOKEN}", "Content-Type": "application/json"},
-            json=result_payload
-        )
+        # results are upserted by training job ID, so retrying is safe
+        result_resp = request("POST", RESULT_SERVICE_BASE_URL + "/training-results/", endpoint="submit_result",
+                              idempotent=True, json=result_payload)
         if result_resp.status_code not in [200, 201]:
             logger.error(f"Result service error: {result_resp.status_code} {result_resp.content}")
         else:
@@ -71,18 +68,18 @@ def submit_job(job_id, celery_task_id, output: ExecutionOutput):
 
 
 def update_job_error(job_id: int, task_id: str, error: str):
-    resp = requests.get(SCHEDULER_BASE_URL + f"/api/training_jobs/{job_id}/update_job_error/",
-                        headers={"Authorization": f"Token {ACCESS_TOKEN}"},
-                        json={
-                            "task_id": task_id,
-                            "error": error
-                        })
+    resp = request("GET", SCHEDULER_BASE_URL + f"/api/training_jobs/{job_id}/update_job_error/", endpoint="update_job_error",
+                   idempotent=True,
+                   json={
+                       "task_id": task_id,
+                       "error": error
+                   })
     return resp
 
 
 def get_queue_info(queue_name: str) -> QueueInfo:
-    resp = requests.get(SCHEDULER_BASE_URL + f"/api/queues/", params={"name": queue_name},
-                        headers={"Authorization": f"Token {ACCESS_TOKEN}"})
+    resp = request("GET", SCHEDULER_BASE_URL + f"/api/queues/", endpoint="get_queue_info", idempotent=True,
+                   params={"name": queue_name})
     results = resp.json()
     if len(results) == 0:
         raise QueueInfoNotFound()
@@ -92,15 +89,15 @@ def get_queue_info(queue_name: str) -> QueueInfo:
 
 
 def stop_consuming(queue: QueueInfo):
-    resp = requests.get(SCHEDULER_BASE_URL + f"/api/queues/{queue.pk}/stop_consuming/", params={"worker": FULL_WORKER_NAME},
-                        headers={"Authorization": f"Token {ACCESS_TOKEN}"})
+    resp = request("GET", SCHEDULER_BASE_URL + f"/api/queues/{queue.pk}/stop_consuming/", endpoint="stop_consuming",
+                   idempotent=True, params={"worker": FULL_WORKER_NAME})
     if resp.status_code != 200:
         raise StopConsumingError(f"stop consuming failed [{resp.status_code}]: {resp.content}")
 
 
 def resume_consuming(queue: QueueInfo):
-    resp = requests.get(SCHEDULER_BASE_URL + f"/api/queues/{queue.pk}/resume_consuming/", params={"worker": FULL_WORKER_NAME},
-                        headers={"Authorization": f"Token {ACCESS_TOKEN}"})
+    resp = request("GET", SCHEDULER_BASE_URL + f"/api/queues/{queue.pk}/resume_consuming/", endpoint="resume_consuming",
+                   idempotent=True, params={"worker": FULL_WORKER_NAME})
     if resp.status_code != 200:
         raise ResumeConsumingError(f"resume consuming failed [{resp.status_code}]: {resp.content}")
 
@@ -108,7 +105,7 @@ def resume_consuming(queue: QueueInfo):
 def upload_model(file_path: str, task_id: str) -> int:
     with open(file_path, "rb") as f:
         files = {"file": f}
-        resp = requests.post(FILE_SERVICE_BASE_URL + f"/trainingOutput/{task_id}/", headers={"Authorization": f"Token {ACCESS_TOKEN}"}, files=files)
+        resp = request("POST", FILE_SERVICE_BASE_URL + f"/trainingOutput/{task_id}/", endpoint="upload_model", files=files)
         if resp.status_code != 201:
             raise Exception(f"Model upload failed [{resp.status_code}]: {resp.content}")
         result = resp.json()
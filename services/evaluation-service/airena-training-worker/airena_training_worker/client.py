@@ -3,12 +3,11 @@ import shutil
 import zipfile
 import json
 
-import requests
-
 from .models import Submission, ExecutionOutput, Job
 from .sandbox import create_venv, run_with_venv
-from .settings import LOCAL_FILE, TEMP_GRADING_FOLDER, OUTPUT_NAME
-from .util import LocalFileAdapter, download_and_save
+from .session import get_session
+from .settings import TEMP_GRADING_FOLDER, OUTPUT_NAME
+from .util import download_and_save
 from .constants import ERROR_MEMORY_LIMIT_EXCEEDED, ERROR_TIME_LIMIT_EXCEEDED, ERROR_VRAM_LIMIT_EXCEEDED, ERROR_RUNTIME_ERROR
 from .apis import upload_model
 
@@ -17,9 +16,7 @@ def _download_submission(s: Submission) -> str:
     temp_grading_folder = os.path.join(TEMP_GRADING_FOLDER, str(s.sid))
     if not os.path.exists(temp_grading_folder):
         os.mkdir(temp_grading_folder)
-    session = requests.Session()
-    if LOCAL_FILE:
-        session.mount("file://", LocalFileAdapter())
+    session = get_session()
     task_zip_path = os.path.join(temp_grading_folder, "task.zip")
     download_and_save(session, s.task_url, task_zip_path)
     with zipfile.ZipFile(task_zip_path, "r") as zip_ref:
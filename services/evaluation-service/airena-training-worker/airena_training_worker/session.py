@@ -0,0 +1,155 @@
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .settings import ACCESS_TOKEN, LOCAL_FILE, HTTP_POOL_SIZE, HTTP_RETRIES, HTTP_BACKOFF, HTTP_CONNECT_TIMEOUT, \
+    HTTP_READ_TIMEOUT, HTTP_LATENCY_LOG_INTERVAL
+from .util import LocalFileAdapter
+
+logger = logging.getLogger("root")
+
+# upper bounds (seconds) of the latency histogram buckets, the last bucket holds everything slower
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# read timeouts (seconds) of the endpoints that are slower than `HTTP_READ_TIMEOUT` on purpose
+ENDPOINT_READ_TIMEOUTS = {
+    "submit_result": 60.0,
+    "upload_model": 300.0,
+}
+
+RETRY_STATUS_CODES = (502, 503, 504)
+
+
+class LatencyHistogram:
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.errors = 0
+
+    def observe(self, seconds: float, error: bool = False):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.total += seconds
+        if error:
+            self.errors += 1
+
+    def get_json(self) -> dict:
+        count = sum(self.counts)
+        return {
+            "buckets": [str(b) for b in self.buckets] + ["+Inf"],
+            "counts": list(self.counts),
+            "count": count,
+            "errors": self.errors,
+            "mean": self.total / count if count else 0.0,
+        }
+
+
+_lock = threading.Lock()
+_sessions: Dict[int, requests.Session] = {}
+_histograms: Dict[str, LatencyHistogram] = {}
+_last_log_time = 0.0
+
+
+def _create_session() -> requests.Session:
+    session = requests.Session()
+    # retries are done by `request` so that only idempotent calls are retried
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if LOCAL_FILE:
+        session.mount("file://", LocalFileAdapter())
+    session.headers["Authorization"] = f"Token {ACCESS_TOKEN}"
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    :return: keep-alive session shared by the current process (pooled connections are not shared
+             across `fork`, so each process gets its own)
+    """
+    pid = os.getpid()
+    with _lock:
+        session = _sessions.get(pid)
+        if session is None:
+            # drop sessions inherited from the parent process
+            _sessions.clear()
+            _histograms.clear()
+            session = _sessions[pid] = _create_session()
+        return session
+
+
+def get_timeout(endpoint: str) -> Tuple[float, float]:
+    """:return: (connect timeout, read timeout) of `endpoint`"""
+    return HTTP_CONNECT_TIMEOUT, ENDPOINT_READ_TIMEOUTS.get(endpoint, HTTP_READ_TIMEOUT)
+
+
+def _observe(endpoint: str, seconds: float, error: bool):
+    with _lock:
+        histogram = _histograms.get(endpoint)
+        if histogram is None:
+            histogram = _histograms[endpoint] = LatencyHistogram()
+        histogram.observe(seconds, error)
+
+
+def request(method: str, url: str, endpoint: str, idempotent: bool = False, retries: int = HTTP_RETRIES,
+            timeout: Optional[Tuple[float, float]] = None, **kwargs) -> requests.Response:
+    """
+    Send a request with the pooled session of the current process.
+
+    :param method: HTTP method
+    :param url: URL
+    :param endpoint: endpoint name, used for the timeouts and the latency histograms
+    :param idempotent: if True, connection errors, timeouts and 502/503/504 responses are retried with
+                       exponential backoff; otherwise the request is sent exactly once
+    :param retries: number of retries of idempotent requests
+    :param timeout: (connect timeout, read timeout), default as `get_timeout(endpoint)`
+    :param kwargs: passed to `requests.Session.request`
+    :return: response (the response of the last attempt for idempotent requests)
+    """
+    session = get_session()
+    timeout = timeout or get_timeout(endpoint)
+    attempts = retries + 1 if idempotent else 1
+    for attempt in range(attempts):
+        start_time = time.monotonic()
+        try:
+            resp = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            _observe(endpoint, time.monotonic() - start_time, error=True)
+            if attempt + 1 == attempts:
+                raise
+            logger.warning(f"[HTTP | {endpoint}] attempt {attempt + 1}/{attempts} failed: {e}")
+        else:
+            retry = resp.status_code in RETRY_STATUS_CODES and attempt + 1 < attempts
+            _observe(endpoint, time.monotonic() - start_time, error=resp.status_code >= 500)
+            if not retry:
+                return resp
+            logger.warning(f"[HTTP | {endpoint}] attempt {attempt + 1}/{attempts} failed: {resp.status_code}")
+            resp.close()
+        time.sleep(HTTP_BACKOFF * (2 ** attempt))
+
+
+def get_latency_histograms() -> Dict[str, dict]:
+    """:return: latency histogram of every endpoint called by the current process"""
+    with _lock:
+        return {endpoint: histogram.get_json() for endpoint, histogram in _histograms.items()}
+
+
+
+def log_latency_histograms(interval: float = HTTP_LATENCY_LOG_INTERVAL):
+    """Log the latency histograms of the current process, at most once every `interval` seconds."""
+    global _last_log_time
+    now = time.monotonic()
+    with _lock:
+        if now - _last_log_time < interval:
+            return
+        _last_log_time = now
+    histograms = get_latency_histograms()
+    if histograms:
+        logger.info(f"[HTTP] latency histograms of process {os.getpid()}: {json.dumps(histograms)}")
@@ -45,6 +45,15 @@ CELERY_CONCURRENCY = get_env_variable("CELERY_CONCURRENCY", "1")
 WORKER_NAME = get_env_variable("WORKER_NAME", "celery")
 FULL_WORKER_NAME = f"{WORKER_NAME}@{socket.gethostname()}"
 
+# HTTP config
+HTTP_POOL_SIZE = int(get_env_variable("HTTP_POOL_SIZE", "4"))  # kept-alive connections per host and process
+HTTP_RETRIES = int(get_env_variable("HTTP_RETRIES", "3"))  # retries of idempotent API calls
+HTTP_BACKOFF = float(get_env_variable("HTTP_BACKOFF", "0.5"))  # seconds, doubled after every retry
+HTTP_CONNECT_TIMEOUT = float(get_env_variable("HTTP_CONNECT_TIMEOUT", "5"))  # seconds
+HTTP_READ_TIMEOUT = float(get_env_variable("HTTP_READ_TIMEOUT", "30"))  # seconds
+# seconds between two logs of the API latency histograms of a process, logged after its jobs
+HTTP_LATENCY_LOG_INTERVAL = float(get_env_variable("HTTP_LATENCY_LOG_INTERVAL", "300"))
+
 # Model config
 OUTPUT_NAME = get_env_variable("OUTPUT_NAME", "output.pth")
 
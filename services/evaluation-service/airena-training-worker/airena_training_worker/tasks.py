@@ -5,6 +5,7 @@ from celery.signals import celeryd_after_setup
 
 from .apis import start_job, submit_job
 from .client import run_job
+from .session import log_latency_histograms
 from .settings import CELERY_BROKER_URI, CELERY_RESULT_BACKEND
 
 
@@ -15,9 +16,12 @@ app = Celery("worker", backend=CELERY_RESULT_BACKEND, broker=CELERY_BROKER_URI)
 @app.task(bind=True, name="scheduler.submit_training_task")
 def train(self, job_id):
     celery_task_id = self.request.id
-    job = start_job(job_id, celery_task_id)
-    result = run_job(job=job, celery_task_id=celery_task_id)
-    submit_job(job.id, celery_task_id, result)
+    try:
+        job = start_job(job_id, celery_task_id)
+        result = run_job(job=job, celery_task_id=celery_task_id)
+        submit_job(job.id, celery_task_id, result)
+    finally:
+        log_latency_histograms()
     return {
         "ok": result.ok,
         "raw_log": result.raw,
@@ -5,7 +5,7 @@ from urllib.parse import urlparse
 import requests
 from requests import Session
 
-from .settings import ACCESS_TOKEN
+from .settings import ACCESS_TOKEN, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
 
 if sys.version_info.major < 3:
     from urllib import url2pathname
@@ -70,7 +70,8 @@ def download_and_save(session: Session, url: str, path: str):
     if urlparse(url).scheme == "file":
         r = session.get(url)
     else:
-        r = session.get(url, headers={"Authorization": f"Token {ACCESS_TOKEN}"}, allow_redirects=False)
+        r = session.get(url, headers={"Authorization": f"Token {ACCESS_TOKEN}"}, allow_redirects=False,
+                        timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
         if r.status_code != 200:
             raise Exception(r.status_code)  # TODO
     with open(path, "wb") as f:
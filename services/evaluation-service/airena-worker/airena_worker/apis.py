@@ -1,11 +1,12 @@
 import json
 import logging
 
-import requests
-
-from .errors import QueueInfoNotFound, StopConsumingError, ResumeConsumingError
+from .errors import QueueInfoNotFound, StopConsumingError, ResumeConsumingError, OutboxFlushError
 from .models import QueueInfo, Submission, ExecutionOutput, Job
-from .settings import SCHEDULER_BASE_URL, FILE_SERVICE_BASE_URL, RESULT_SERVICE_BASE_URL, ACCESS_TOKEN, WORKER_NAME, FULL_WORKER_NAME
+from .outbox import outbox
+from .session import request
+from .settings import SCHEDULER_BASE_URL, FILE_SERVICE_BASE_URL, RESULT_SERVICE_BASE_URL, WORKER_NAME, FULL_WORKER_NAME, \
+    OUTBOX_BATCH_SIZE, OUTBOX_MAX_ATTEMPTS
 
 logger = logging.getLogger("root")
 
@@ -20,12 +21,12 @@ def get_submission_url(submission_id: int):
 
 def start_job(job_id, celery_task_id) -> Job:
     worker_name = WORKER_NAME
-    resp = requests.get(SCHEDULER_BASE_URL + f"/api/jobs/{job_id}/start/",
-                        headers={"Authorization": f"Token {ACCESS_TOKEN}"},
-                        data={
-                            "worker_name": worker_name,
-                            "task_id": celery_task_id
-                        })
+    # starting an already running job only sets its status again, so retrying is safe
+    resp = request("GET", SCHEDULER_BASE_URL + f"/api/jobs/{job_id}/start/", endpoint="start_job", idempotent=True,
+                   data={
+                       "worker_name": worker_name,
+                       "task_id": celery_task_id
+                   })
     if resp.status_code != 200:
         raise Exception(resp.content)
     obj = json.loads(resp.content)
@@ -36,57 +37,103 @@ def start_job(job_id, celery_task_id) -> Job:
                ram_limit=obj["ram_limit"], vram_limit=obj["vram_limit"])
 
 
-def submit_job(job_id, celery_task_id, submission: Submission, output: ExecutionOutput):
-    resp = requests.get(SCHEDULER_BASE_URL + f"/api/jobs/{job_id}/complete/",
-                        headers={"Authorization": f"Token {ACCESS_TOKEN}"},
-                        data={
-                            "task_id": celery_task_id,
-                            "ok": output.ok,
-                        })
+def get_job_submission(job_id) -> Submission:
+    """Fetch the submission of a job without starting it (used for pre-warming)."""
+    resp = request("GET", SCHEDULER_BASE_URL + f"/api/jobs/{job_id}/", endpoint="get_job", idempotent=True)
+    if resp.status_code != 200:
+        raise Exception(resp.content)
+    obj = json.loads(resp.content)
+    return Submission(sid=obj["submission_id"], task_url=get_task_url(obj["task_id"]),
+                      submission_url=get_submission_url(obj["submission_id"]), task_id=int(obj["task_id"]),
+                      group_id=obj["group_id"])
 
-    print(output)
 
-    # submit to result service
-    try:
-        result_payload = {
-            "submissionId": submission.sid,
-            "evalRunId": job_id,
-            "groupId": submission.group_id,
-            "taskId": submission.task_id,
-            "status": "PASSED" if output.ok else "ERROR",
-            "score": output.result.get("score", 0) if output.result else 0,
-            "metrics": output.result,
-            "error": output.error,
-            "artifactsUri": None,
-        }
-        result_resp = requests.post(
-            RESULT_SERVICE_BASE_URL + "/results/results/",
-            headers={"Authorization": f"Token {ACCESS_TOKEN}", "Content-Type": "application/json"},
-            json=result_payload
-        )
-        if result_resp.status_code not in [200, 201]:
-            logger.error(f"Result service error: {result_resp.status_code} {result_resp.content}")
+def submit_job(job_id, celery_task_id, submission: Submission, output: ExecutionOutput):
+    """
+    Persist the output of a job in the outbox. The scheduler and the result service are notified
+    in batches by the outbox flusher (see `flush_outbox`), so the Celery slot is freed right away.
+    """
+    print(output)
+    result_payload = {
+        "submissionId": submission.sid,
+        "evalRunId": job_id,
+        "groupId": submission.group_id,
+        "taskId": submission.task_id,
+        "status": "PASSED" if output.ok else "ERROR",
+        "score": output.result.get("score", 0) if output.result else 0,
+        "metrics": output.result,
+        "error": output.error,
+        "artifactsUri": None,
+    }
+    outbox.append([{
+        "job_id": job_id,
+        "celery_task_id": celery_task_id,
+        "ok": output.ok,
+        "result": result_payload,
+    }])
+
+
+def flush_outbox(batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+    """
+    Send the oldest records of the outbox to the scheduler and the result service in one bulk
+    request each, and acknowledge them. Both bulk endpoints are idempotent, so a batch is simply
+    sent again if anything goes wrong.
+
+    :param batch_size: maximum number of records to send
+    :return: number of records sent
+    """
+    records, offset = outbox.read(batch_size)
+    if not records:
+        return 0
+
+    resp = request("POST", SCHEDULER_BASE_URL + "/api/jobs/bulk_complete/", endpoint="bulk_complete_job",
+                   idempotent=True,
+                   json={"jobs": [{
+                       "id": record["job_id"],
+                       "task_id": record["celery_task_id"],
+                       "ok": record["ok"],
+                   } for record in records]})
+    if resp.status_code != 200:
+        raise OutboxFlushError(f"bulk complete failed [{resp.status_code}]: {resp.content}")
+    for item in resp.json()["results"]:
+        if item["status"] != "success":
+            # e.g. the job was restarted in the meantime: nothing to retry
+            logger.error(f"[OUTBOX] job {item['id']} not completed: {item['reason']}")
+
+    resp = request("POST", RESULT_SERVICE_BASE_URL + "/results/results/bulk", endpoint="bulk_submit_result",
+                   idempotent=True, json={"results": [record["result"] for record in records]})
+    if resp.status_code != 200:
+        raise OutboxFlushError(f"bulk result submission failed [{resp.status_code}]: {resp.content}")
+    retry = []
+    for record, item in zip(records, resp.json()["data"]):
+        if item["ok"]:
+            continue
+        record["attempts"] = record.get("attempts", 0) + 1
+        if record["attempts"] < OUTBOX_MAX_ATTEMPTS:
+            retry.append(record)
         else:
-            logger.info(f"Result submitted: {result_resp.json()}")
-    except Exception as e:
-        logger.error(f"Failed to submit result: {e}")
-
-    return resp
+            logger.error(f"[OUTBOX] result of job {record['job_id']} dropped: {item['error']}")
+    if retry:
+        # re-queued at the end of the outbox so that they do not hold back the other records
+        outbox.append(retry)
+    outbox.ack(offset)
+    logger.info(f"[OUTBOX] {len(records) - len(retry)} results submitted, {len(retry)} re-queued")
+    return len(records)
 
 
 def update_job_error(job_id: int, task_id: str, error: str):
-    resp = requests.get(SCHEDULER_BASE_URL + f"/api/jobs/{job_id}/update_job_error/",
-                        headers={"Authorization": f"Token {ACCESS_TOKEN}"},
-                        json={
-                            "task_id": task_id,
-                            "error": error
-                        })
+    resp = request("GET", SCHEDULER_BASE_URL + f"/api/jobs/{job_id}/update_job_error/", endpoint="update_job_error",
+                   idempotent=True,
+                   json={
+                       "task_id": task_id,
+                       "error": error
+                   })
     return resp
 
 
 def get_queue_info(queue_name: str) -> QueueInfo:
-    resp = requests.get(SCHEDULER_BASE_URL + f"/api/queues/", params={"name": queue_name},
-                        headers={"Authorization": f"Token {ACCESS_TOKEN}"})
+    resp = request("GET", SCHEDULER_BASE_URL + f"/api/queues/", endpoint="get_queue_info", idempotent=True,
+                   params={"name": queue_name})
     results = resp.json()
     if len(results) == 0:
         raise QueueInfoNotFound()
@@ -96,14 +143,14 @@ def get_queue_info(queue_name: str) -> QueueInfo:
 
 
 def stop_consuming(queue: QueueInfo):
-    resp = requests.get(SCHEDULER_BASE_URL + f"/api/queues/{queue.pk}/stop_consuming/", params={"worker": FULL_WORKER_NAME},
-                        headers={"Authorization": f"Token {ACCESS_TOKEN}"})
+    resp = request("GET", SCHEDULER_BASE_URL + f"/api/queues/{queue.pk}/stop_consuming/", endpoint="stop_consuming",
+                   idempotent=True, params={"worker": FULL_WORKER_NAME})
     if resp.status_code != 200:
         raise StopConsumingError(f"stop consuming failed [{resp.status_code}]: {resp.content}")
 
 
 def resume_consuming(queue: QueueInfo):
-    resp = requests.get(SCHEDULER_BASE_URL + f"/api/queues/{queue.pk}/resume_consuming/", params={"worker": FULL_WORKER_NAME},
-                        headers={"Authorization": f"Token {ACCESS_TOKEN}"})
+    resp = request("GET", SCHEDULER_BASE_URL + f"/api/queues/{queue.pk}/resume_consuming/", endpoint="resume_consuming",
+                   idempotent=True, params={"worker": FULL_WORKER_NAME})
     if resp.status_code != 200:
         raise ResumeConsumingError(f"resume consuming failed [{resp.status_code}]: {resp.content}")
@@ -0,0 +1,170 @@
+import logging
+import os
+import shutil
+import stat
+import subprocess
+import time
+import zipfile
+from typing import Optional, Tuple
+
+from requests import Session
+
+from .cache import DiskCache
+from .errors import AssetError
+from .settings import TEMP_ASSET_FOLDER, ASSET_CACHE_MAX_SIZE, ASSET_LINK_MODE
+from .util import download_and_save
+
+logger = logging.getLogger("root")
+
+asset_cache = DiskCache(TEMP_ASSET_FOLDER, ASSET_CACHE_MAX_SIZE * 1024 * 1024, name="asset")
+
+
+def _get_extract_path(dst: str, name: str) -> str:
+    # same sanitization as `zipfile.ZipFile._extract_member`
+    arcname = name.replace("/", os.path.sep)
+    if os.path.altsep:
+        arcname = arcname.replace(os.path.altsep, os.path.sep)
+    arcname = os.path.splitdrive(arcname)[1]
+    invalid_path_parts = ("", os.path.curdir, os.path.pardir)
+    arcname = os.path.sep.join(x for x in arcname.split(os.path.sep) if x not in invalid_path_parts)
+    return os.path.join(dst, arcname)
+
+
+def extract_zip(zip_path: str, dst: str):
+    """
+    Extract `zip_path` into `dst`. Existing files are unlinked before being overwritten, so files
+    hardlinked from the asset cache are replaced instead of modified in place.
+    """
+    with zipfile.ZipFile(zip_path, "r") as zip_ref:
+        for member in zip_ref.infolist():
+            target = _get_extract_path(dst, member.filename)
+            if not member.is_dir() and (os.path.isfile(target) or os.path.islink(target)):
+                os.unlink(target)
+            zip_ref.extract(member, dst)
+
+
+def link_tree(src: str, dst: str, mode: str = ASSET_LINK_MODE):
+    """
+    Populate `dst` with the content of `src` without copying data when possible.
+
+    :param src: source directory
+    :param dst: destination directory (created if missing)
+    :param mode: "reflink", "copy" or "hardlink" (shares the cached files, see `ASSET_LINK_MODE`)
+    """
+    if mode == "reflink":
+        os.makedirs(dst, exist_ok=True)
+        subprocess.run(["cp", "-R", "--reflink=auto", os.path.join(src, "."), dst], check=True)
+        _make_writable(dst)
+        return
+    for root, dirs, files in os.walk(src):
+        dst_root = os.path.join(dst, os.path.relpath(root, src))
+        os.makedirs(dst_root, exist_ok=True)
+        for name in files:
+            src_path = os.path.join(root, name)
+            dst_path = os.path.join(dst_root, name)
+            if mode == "hardlink":
+                try:
+                    os.link(src_path, dst_path)
+                    continue
+                except OSError:
+                    pass  # e.g. cache and grading folder on different file systems
+            shutil.copy2(src_path, dst_path)
+            os.chmod(dst_path, os.stat(dst_path).st_mode | stat.S_IWUSR)
+
+
+def _make_writable(path: str):
+    # copies of the read-only cached files belong to the grading folder
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            file_path = os.path.join(root, name)
+            os.chmod(file_path, os.stat(file_path).st_mode | stat.S_IWUSR)
+
+
+def _make_read_only(path: str):
+    # hardlinked grading folders share inodes with the cache: keep the cached files read-only
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            file_path = os.path.join(root, name)
+            os.chmod(file_path, os.stat(file_path).st_mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+
+
+def _fetch_task_bundle(session: Session, task_url: str, cached: Optional[dict]) -> Tuple[str, bool, Optional[str]]:
+    """:return: (cache key, whether the bundle was already cached, ETag of the bundle)"""
+    etag = cached.get("etag") if cached is not None else None
+    tmp_zip_path = os.path.join(TEMP_ASSET_FOLDER, f".download-{os.getpid()}-{time.monotonic_ns()}.zip")
+    try:
+        download = download_and_save(session, task_url, tmp_zip_path, etag=etag)
+        if download.not_modified:
+            key = cached["key"]
+            with asset_cache.lock(key):
+                if asset_cache.lookup(key):
+                    return key, True, etag
+            # evicted since the alias was read: fetch the bundle again
+            download = download_and_save(session, task_url, tmp_zip_path)
+        key = download.checksum
+        with asset_cache.lock(key):
+            hit = asset_cache.lookup(key)
+            if not hit:
+                start_time = time.monotonic()
+                dst_path = asset_cache.path(key)
+                shutil.rmtree(dst_path, ignore_errors=True)
+                extract_zip(tmp_zip_path, dst_path)
+                _make_read_only(dst_path)
+                asset_cache.commit(key, build_seconds=time.monotonic() - start_time)
+        return key, hit, download.etag
+    finally:
+        if os.path.exists(tmp_zip_path):
+            os.remove(tmp_zip_path)
+
+
+def get_task_bundle(session: Session, task_id: int, task_url: str) -> str:
+    """
+    Make sure the grader bundle of `task_id` is in the asset cache, downloading and extracting it
+    only if the file service has a different bundle (checked with ETag/If-None-Match).
+    Cache entries are keyed by the SHA-256 of the bundle, so identical bundles are stored once.
+
+    :param session: requests session
+    :param task_id: aiVLE task ID
+    :param task_url: URL of the grader bundle
+    :return: cache key (SHA-256 of the bundle). The entry may be evicted as soon as this returns:
+    use `link_task_bundle` to populate a grading folder.
+    """
+    alias = f"task-{task_id}"
+    cached = asset_cache.get_alias(alias)
+    key, hit, etag = _fetch_task_bundle(session, task_url, cached)
+    if cached is None or cached["key"] != key or cached.get("etag") != etag:
+        asset_cache.set_alias(alias, key, etag=etag)
+    asset_cache.incr(f"{alias}-{'hits' if hit else 'misses'}")
+    logger.info(f"[ASSET] task {task_id} bundle {key}: {'hit' if hit else 'miss'}")
+    asset_cache.evict(keep=[key])
+    return key
+
+
+def link_task_bundle(session: Session, task_id: int, task_url: str, dst: str) -> str:
+    """
+    Populate grading folder `dst` with the grader bundle of `task_id` (see `get_task_bundle` and
+    `ASSET_LINK_MODE`). The entry is leased from the moment it is found in the cache until it is
+    linked, so that concurrent jobs cannot evict it meanwhile; if it was evicted between
+    `get_task_bundle` and the lease, it is fetched again.
+
+    :return: cache key of the bundle
+    """
+    for _ in range(2):
+        key = get_task_bundle(session, task_id, task_url)
+        with asset_cache.lease(key) as path:
+            if asset_cache.contains(key):
+                link_tree(path, dst)
+                return key
+        logger.warning(f"[ASSET] task {task_id} bundle {key} evicted before being linked, fetching it again")
+    raise AssetError(f"task {task_id} bundle {key} evicted before being linked")
+
+
+def get_task_hit_rate(task_id: int) -> float:
+    """
+    :param task_id: aiVLE task ID
+    :return: fraction of grading folders of `task_id` built from an already cached bundle
+    """
+    stats = asset_cache.stats()
+    hits = stats.get(f"task-{task_id}-hits", 0)
+    total = hits + stats.get(f"task-{task_id}-misses", 0)
+    return hits / total if total else 0.0
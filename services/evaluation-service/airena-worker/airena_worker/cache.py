@@ -0,0 +1,268 @@
+import fcntl
+import json
+import logging
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("root")
+
+INDEX_FILE_NAME = ".index.json"
+INDEX_LOCK_NAME = ".index.lock"
+LOCK_FOLDER_NAME = ".locks"
+
+
+def get_dir_size(path: str) -> int:
+    """
+    :param path: path to a directory
+    :return: total size in bytes of all files under `path` (symlinks are not followed)
+    """
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class DiskCache:
+    """
+    LRU cache of directories under `root`, bounded by `max_bytes` on disk.
+
+    Every entry is a directory named after its key. Bookkeeping (size, creation and last use
+    time of every entry, aliases pointing at entries, and hit/miss/build/eviction counters)
+    lives in a JSON index next to the entries. All processes of a worker share the same cache, so the index and every
+    entry are guarded by `flock`: builders hold an exclusive lock on the entry, users hold a
+    shared lock (see `lease`), and eviction skips any entry it cannot lock exclusively.
+    """
+
+    def __init__(self, root: str, max_bytes: int, name: str = "cache"):
+        """
+        :param root: directory holding the cached entries
+        :param max_bytes: disk budget in bytes (<=0 means no limit)
+        :param name: name used in log messages
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.name = name
+        self._index_path = os.path.join(root, INDEX_FILE_NAME)
+        self._index_lock_path = os.path.join(root, INDEX_LOCK_NAME)
+        self._lock_folder = os.path.join(root, LOCK_FOLDER_NAME)
+        os.makedirs(self._lock_folder, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    @contextmanager
+    def lock(self, key: str, shared: bool = False, blocking: bool = True):
+        """
+        Lock a single entry. Yields True if the lock is held, False if `blocking` is False and
+        the lock is taken by someone else.
+        """
+        with open(os.path.join(self._lock_folder, f"{key}.lock"), "a") as f:
+            flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+            if not blocking:
+                flags |= fcntl.LOCK_NB
+            try:
+                fcntl.flock(f, flags)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    @contextmanager
+    def lease(self, key: str, blocking: bool = True):
+        """
+        Protect entry `key` from eviction while it is being used. Yields the path of the entry, or
+        None if `blocking` is False and the entry is locked by a builder.
+        """
+        with self.lock(key, shared=True, blocking=blocking) as locked:
+            if not locked:
+                yield None
+                return
+            self._update(lambda index: self._touch(index, key))
+            yield self.path(key)
+
+    def lookup(self, key: str, count: bool = True) -> bool:
+        """
+        Check whether a complete entry exists, counting a hit or a miss. Call this while holding
+        `lock(key)` if the entry is about to be built on a miss.
+
+        :param key: entry key
+        :param count: if False, the hit/miss counters are left untouched
+        :return: True if `key` is cached
+        """
+        exists = os.path.isdir(self.path(key))
+
+        def _lookup(index):
+            hit = exists and key in index["entries"]
+            if count:
+                index["stats"]["hits" if hit else "misses"] += 1
+            if hit:
+                self._touch(index, key)
+            return hit
+
+        return self._update(_lookup)
+
+    def contains(self, key: str) -> bool:
+        """Same as `lookup` but without touching the entry or the counters."""
+        return os.path.isdir(self.path(key)) and key in self._read()["entries"]
+
+    def get_entry(self, key: str) -> Optional[dict]:
+        return self._read()["entries"].get(key)
+
+    def commit(self, key: str, build_seconds: float = 0.0, **meta) -> None:
+        """
+        Register a freshly built entry. Call this while holding `lock(key)`.
+
+        :param key: entry key
+        :param build_seconds: time spent building the entry
+        :param meta: extra JSON-serializable fields stored with the entry
+        """
+        size = get_dir_size(self.path(key))
+        now = time.time()
+
+        def _commit(index):
+            entry = {"size": size, "created": now, "last_used": now, "build_seconds": build_seconds}
+            entry.update(meta)
+            index["entries"][key] = entry
+            index["stats"]["builds"] += 1
+            index["stats"]["build_seconds"] += build_seconds
+
+        self._update(_commit)
+
+    def update_entry(self, key: str, **meta) -> None:
+        def _update_entry(index):
+            if key in index["entries"]:
+                index["entries"][key].update(meta)
+
+        self._update(_update_entry)
+
+    def get_alias(self, alias: str) -> Optional[dict]:
+        """
+        :param alias: alias name
+        :return: dict with the aliased `key` and the metadata stored with the alias, or None
+        """
+        return self._read()["aliases"].get(alias)
+
+    def set_alias(self, alias: str, key: str, **meta) -> None:
+        def _set_alias(index):
+            index["aliases"][alias] = dict(meta, key=key)
+
+        self._update(_set_alias)
+
+    def incr(self, counter: str, value: float = 1) -> None:
+        def _incr(index):
+            index["stats"][counter] = index["stats"].get(counter, 0) + value
+
+        self._update(_incr)
+
+    def remove(self, key: str) -> None:
+        """Drop entry `key` from disk and from the index. Call this while holding `lock(key)`."""
+        shutil.rmtree(self.path(key), ignore_errors=True)
+
+        def _remove(index):
+            index["entries"].pop(key, None)
+            for alias in [alias for alias, value in index["aliases"].items() if value["key"] == key]:
+                del index["aliases"][alias]
+
+        self._update(_remove)
+
+    def evict(self, keep: List[str] = None) -> List[str]:
+        """
+        Remove least recently used entries until the cache fits into `max_bytes`.
+        Entries listed in `keep`, currently locked by anyone, or listed in the `depends_on`
+        of another entry are never evicted.
+
+        :return: keys of the evicted entries
+        """
+        if self.max_bytes <= 0:
+            return []
+        keep = keep or []
+        index = self._read()
+        entries = sorted(index["entries"].items(), key=lambda item: item[1]["last_used"])
+        total = sum(entry["size"] for _, entry in entries)
+        evicted = []
+        depended_on = {}
+        for _, entry in entries:
+            for dependency in entry.get("depends_on", []):
+                depended_on[dependency] = depended_on.get(dependency, 0) + 1
+        for key, entry in entries:
+            if total <= self.max_bytes:
+                break
+            if key in keep or depended_on.get(key, 0) > 0:
+                continue
+            with self.lock(key, blocking=False) as locked:
+                if not locked:
+                    continue
+                self.remove(key)
+            total -= entry["size"]
+            evicted.append(key)
+            for dependency in entry.get("depends_on", []):
+                depended_on[dependency] -= 1
+            logger.info(f"[CACHE | {self.name}] evicted {key} ({entry['size']} bytes)")
+        if evicted:
+            self.incr("evictions", len(evicted))
+        return evicted
+
+    def stats(self) -> Dict[str, float]:
+        index = self._read()
+        stats = dict(index["stats"])
+        stats["entries"] = len(index["entries"])
+        stats["size"] = sum(entry["size"] for entry in index["entries"].values())
+        return stats
+
+    @staticmethod
+    def _touch(index, key):
+        if key in index["entries"]:
+            index["entries"][key]["last_used"] = time.time()
+
+    @staticmethod
+    def _empty_index() -> dict:
+        return {
+            "entries": {},
+            "aliases": {},
+            "stats": {"hits": 0, "misses": 0, "builds": 0, "build_seconds": 0.0, "evictions": 0},
+        }
+
+    def _load(self) -> dict:
+        try:
+            with open(self._index_path, "r") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return self._empty_index()
+        empty = self._empty_index()
+        index.setdefault("entries", {})
+        index.setdefault("aliases", {})
+        for counter, value in empty["stats"].items():
+            index.setdefault("stats", {}).setdefault(counter, value)
+        return index
+
+    def _read(self) -> dict:
+        with open(self._index_lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH)
+            try:
+                return self._load()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _update(self, fn):
+        with open(self._index_lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                index = self._load()
+                result = fn(index)
+                tmp_path = f"{self._index_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(index, f)
+                os.replace(tmp_path, self._index_path)
+                return result
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
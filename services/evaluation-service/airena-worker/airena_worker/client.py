@@ -1,47 +1,79 @@
 import os
 import shutil
-import zipfile
 import json
+import logging
+from contextlib import ExitStack
+from typing import Optional, Tuple
 
-import requests
-
+from .assets import link_task_bundle, extract_zip
 from .models import Submission, ExecutionOutput, Job
 from .sandbox import create_venv, run_with_venv
-from .settings import LOCAL_FILE, TEMP_GRADING_FOLDER
-from .util import LocalFileAdapter, download_and_save
+from .session import get_session
+from .settings import TEMP_GRADING_FOLDER
+from .util import download_and_save
+from .errors import VenvBusyError
 from .constants import ERROR_MEMORY_LIMIT_EXCEEDED, ERROR_TIME_LIMIT_EXCEEDED, ERROR_VRAM_LIMIT_EXCEEDED, ERROR_RUNTIME_ERROR
 
+logger = logging.getLogger("root")
+
+
+def _download_submission(s: Submission, folder_name: str = None) -> Tuple[str, Optional[str]]:
+    """
+    Download and extract the grader bundle and the submission into one grading folder.
 
-def _download_submission(s: Submission) -> str:
-    temp_grading_folder = os.path.join(TEMP_GRADING_FOLDER, str(s.sid))
+    :param s: submission
+    :param folder_name: name of the grading folder, default as the submission ID
+    :return: (grading folder, content of the grader's requirements.txt if it ships one)
+    """
+    temp_grading_folder = os.path.join(TEMP_GRADING_FOLDER, folder_name or str(s.sid))
     if not os.path.exists(temp_grading_folder):
         os.mkdir(temp_grading_folder)
-    session = requests.Session()
-    if LOCAL_FILE:
-        session.mount("file://", LocalFileAdapter())
-    task_zip_path = os.path.join(temp_grading_folder, "task.zip")
-    download_and_save(session, s.task_url, task_zip_path)
-    with zipfile.ZipFile(task_zip_path, "r") as zip_ref:
-        zip_ref.extractall(temp_grading_folder)
+    session = get_session()
+    link_task_bundle(session, s.task_id, s.task_url, temp_grading_folder)
+    grader_req_str = None
+    grader_req_path = os.path.join(temp_grading_folder, "requirements.txt")
+    if os.path.isfile(grader_req_path):
+        with open(grader_req_path, "r") as f:
+            grader_req_str = f.read()
     agent_zip_path = os.path.join(temp_grading_folder, "agent.zip")
     download_and_save(session, s.submission_url, agent_zip_path)
-    with zipfile.ZipFile(agent_zip_path, "r") as zip_ref:
-        zip_ref.extractall(temp_grading_folder)
-    return temp_grading_folder
+    extract_zip(agent_zip_path, temp_grading_folder)
+    os.remove(agent_zip_path)
+    return temp_grading_folder, grader_req_str
+
+
+def prewarm_venv(submission: Submission) -> Optional[str]:
+    """
+    Build (or refresh) the venv of `submission` ahead of its job, so that `run_job` finds it ready.
+
+    :return: venv name, None if skipped because another worker is building or rebuilding the venv
+    """
+    temp_grading_folder, grader_req_str = _download_submission(submission, folder_name=f"prewarm-{submission.sid}")
+    try:
+        return create_venv(os.path.join(temp_grading_folder, "requirements.txt"), base_req_str=grader_req_str,
+                           prewarm=True)
+    except VenvBusyError as e:
+        logger.info(f"[CLIENT | prewarm_venv] skipped: {e}")
+        return None
+    finally:
+        shutil.rmtree(temp_grading_folder)
 
 
 def run_job(job: Job, celery_task_id: str, force: bool = False) -> ExecutionOutput:
-    temp_grading_folder = _download_submission(job.submission)
-    env_name = create_venv(os.path.join(temp_grading_folder, "requirements.txt"), force=force)
-    error_type = run_with_venv(env_name=env_name,
-                               command=["bash", "./bootstrap.sh"],
-                               home=temp_grading_folder,
-                               rlimit=job.ram_limit,
-                               vram_limit=job.vram_limit,
-                               time_limit=job.run_time_limit,
-                               task_id=job.submission.task_id,
-                               job_id=job.id,
-                               celery_task_id=celery_task_id)
+    temp_grading_folder, grader_req_str = _download_submission(job.submission)
+    # the venv is leased from its lookup until the job is done, so that no other worker evicts it
+    with ExitStack() as leases:
+        env_name = create_venv(os.path.join(temp_grading_folder, "requirements.txt"), force=force,
+                               base_req_str=grader_req_str, stack=leases)
+        error_type = run_with_venv(env_name=env_name,
+                                   command=["bash", "./bootstrap.sh"],
+                                   home=temp_grading_folder,
+                                   rlimit=job.ram_limit,
+                                   vram_limit=job.vram_limit,
+                                   time_limit=job.run_time_limit,
+                                   task_id=job.submission.task_id,
+                                   job_id=job.id,
+                                   celery_task_id=celery_task_id)
     
     try:
         if error_type == ERROR_RUNTIME_ERROR:
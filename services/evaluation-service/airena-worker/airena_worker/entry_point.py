@@ -1,13 +1,23 @@
+import logging
+import os
+import time
 from multiprocessing import Process
 
-from .apis import get_queue_info
+import requests
+from kombu.common import Broadcast
+
+from .apis import get_queue_info, flush_outbox
 from .client import run_job
 from .constants import SANDBOX_ONLY_TASK_ID
+from .errors import OutboxFlushError
 from .models import Submission, Job
 from .monitor import start_monitor, start_warden
-from .settings import CELERY_QUEUE, CELERY_CONCURRENCY
+from .settings import CELERY_QUEUE, CELERY_CONCURRENCY, WORKER_NAME, PREWARM_ENABLE, PREWARM_CONCURRENCY, \
+    PREWARM_NICENESS, OUTBOX_BATCH_SIZE, OUTBOX_FLUSH_INTERVAL, OUTBOX_MAX_BACKOFF, get_prewarm_queue
 from .tasks import app
 
+logger = logging.getLogger("root")
+
 
 def start_sandbox():
     s = Submission(sid=233,
@@ -29,14 +39,57 @@ def start_worker():
     app.worker_main(argv)
 
 
+def start_prewarm_worker():
+    """
+    Pre-warm venvs in a separate Celery worker with its own (small) pool and lower CPU priority,
+    so that pre-warming never takes a slot from, or starves, the running evaluations.
+    The pre-warm queue is a broadcast queue: every worker subscribed to the task queue gets a copy.
+    """
+    os.nice(PREWARM_NICENESS)
+    prewarm_queue = get_prewarm_queue(CELERY_QUEUE)
+    app.conf.task_queues = (Broadcast(prewarm_queue),)
+    argv = [
+        'worker',
+        '--loglevel=INFO',
+        '-Q',
+        prewarm_queue,
+        f'--concurrency={PREWARM_CONCURRENCY}',
+        '-n',
+        f'prewarm-{WORKER_NAME}@%h',
+    ]
+    app.worker_main(argv)
+
+
+def start_outbox_flusher():
+    """
+    Drain the outbox (see `submit_job`) in batches. While the scheduler or the result service is
+    unavailable, the results stay in the outbox and are retried with exponential backoff.
+    """
+    backoff = OUTBOX_FLUSH_INTERVAL
+    while True:
+        try:
+            sent = flush_outbox()
+        except (requests.RequestException, OutboxFlushError, ValueError, KeyError) as e:
+            logger.warning(f"[OUTBOX] flush failed, retrying in {backoff:.1f}s: {e}")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, OUTBOX_MAX_BACKOFF)
+            continue
+        backoff = OUTBOX_FLUSH_INTERVAL
+        if sent < OUTBOX_BATCH_SIZE:
+            time.sleep(OUTBOX_FLUSH_INTERVAL)
+
+
 def start():
     queue = get_queue_info(CELERY_QUEUE)
-    monitor_process = Process(target=start_monitor, args=(queue,))
-    worker_process = Process(target=start_worker)
-    warden_process = Process(target=start_warden)
-    monitor_process.start()
-    warden_process.start()
-    worker_process.start()
-    monitor_process.join()
-    warden_process.join()
-    worker_process.join()
+    processes = [
+        Process(target=start_monitor, args=(queue,)),
+        Process(target=start_warden),
+        Process(target=start_worker),
+        Process(target=start_outbox_flusher),
+    ]
+    if PREWARM_ENABLE:
+        processes.append(Process(target=start_prewarm_worker))
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
@@ -16,3 +16,27 @@ class StopConsumingError(Exception):
 
 class ResumeConsumingError(Exception):
     pass
+
+
+class DownloadError(Exception):
+    pass
+
+
+class ChecksumMismatchError(DownloadError):
+    pass
+
+
+class AssetError(Exception):
+    pass
+
+
+class VenvError(Exception):
+    pass
+
+
+class VenvBusyError(VenvError):
+    pass
+
+
+class OutboxFlushError(Exception):
+    pass
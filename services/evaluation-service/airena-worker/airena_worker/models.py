@@ -1,4 +1,4 @@
-from typing import Union
+from typing import Optional, Union
 
 
 class QueueInfo:
@@ -61,3 +61,18 @@ class Job:
     @classmethod
     def dummy(cls, submission: Submission, run_time_limit: int = 60, ram_limit: int = 256, vram_limit: int = 256) -> "Job":
         return cls(id=-1, submission=submission, run_time_limit=run_time_limit, ram_limit=ram_limit, vram_limit=vram_limit)
+
+
+class DownloadResult:
+    def __init__(self, checksum: Optional[str], etag: Optional[str], not_modified: bool = False):
+        """
+        :param checksum: SHA-256 hex digest of the downloaded file (None if not modified)
+        :param etag: ETag sent by the server, if any
+        :param not_modified: True if the server answered 304 to a conditional request
+        """
+        self.checksum = checksum
+        self.etag = etag
+        self.not_modified = not_modified
+
+    def __str__(self):
+        return f"Download - sha256: {self.checksum} - ETag: {self.etag} - Not modified: {self.not_modified}"
@@ -0,0 +1,162 @@
+import fcntl
+import json
+import logging
+import os
+from contextlib import contextmanager
+from typing import List, Tuple
+
+from .settings import OUTBOX_FOLDER
+
+logger = logging.getLogger("root")
+
+LOG_FILE_NAME = "outbox.log"
+CURSOR_FILE_NAME = "outbox.cursor"
+LOCK_FILE_NAME = "outbox.lock"
+# acknowledged bytes at the start of the log above which the log is compacted
+COMPACT_MIN_BYTES = 1024 * 1024
+
+
+class Outbox:
+    """
+    Durable, append-only log of records waiting to be sent to other services.
+
+    Records are appended as JSON lines and fsynced before `append` returns, so they survive a crash
+    of the worker. The byte offset of the first record that has not been acknowledged yet is kept in
+    a cursor file next to the log; the log is truncated once every record has been acknowledged, and
+    compacted (rewritten without its acknowledged prefix) once that prefix makes up most of it, so
+    that records re-queued again and again do not make it grow without bound.
+    All processes of a worker share the outbox, appends and acknowledgements are guarded by `flock`.
+    Records may be delivered more than once (e.g. after a crash between sending and `ack`), so the
+    consumers must be idempotent.
+    """
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self._log_path = os.path.join(folder, LOG_FILE_NAME)
+        self._cursor_path = os.path.join(folder, CURSOR_FILE_NAME)
+        self._lock_path = os.path.join(folder, LOCK_FILE_NAME)
+        os.makedirs(folder, exist_ok=True)
+
+    @contextmanager
+    def _locked(self):
+        with open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def append(self, records: List[dict]) -> None:
+        """
+        Append `records` to the log and fsync it.
+
+        :param records: JSON-serializable records
+        """
+        data = "".join(json.dumps(record) + "\n" for record in records).encode()
+        with self._locked():
+            fd = os.open(self._log_path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                size = os.fstat(fd).st_size
+                if size > 0 and os.pread(fd, 1, size - 1) != b"\n":
+                    # the last append was interrupted: terminate the partial record so that it is skipped
+                    data = b"\n" + data
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def read(self, max_records: int) -> Tuple[List[dict], int]:
+        """
+        Read the oldest records that have not been acknowledged yet.
+
+        :param max_records: maximum number of records to read
+        :return: (records, offset to pass to `ack` once the records are delivered)
+        """
+        offset = self._read_cursor()
+        records = []
+        try:
+            f = open(self._log_path, "rb")
+        except FileNotFoundError:
+            return records, offset
+        with f:
+            if offset > os.fstat(f.fileno()).st_size:
+                offset = 0
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # being appended
+                offset += len(line)
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    logger.error(f"[OUTBOX] skipped corrupted record: {line[:200]}")
+                    continue
+                if len(records) >= max_records:
+                    break
+        return records, offset
+
+    def ack(self, offset: int) -> None:
+        """Mark every record before `offset` as delivered."""
+        with self._locked():
+            try:
+                size = os.path.getsize(self._log_path)
+            except FileNotFoundError:
+                size = 0
+            truncate = offset >= size
+            # everything is delivered: start over with an empty log (the cursor is reset first, so a
+            # crash in between re-delivers records instead of losing them)
+            self._write_cursor(0 if truncate else offset)
+            if truncate and size > 0:
+                os.truncate(self._log_path, 0)
+            elif not truncate and offset >= COMPACT_MIN_BYTES and 2 * offset >= size:
+                self._compact(offset)
+
+    def _compact(self, offset: int):
+        """Drop the acknowledged records before `offset` from the log. Call this while holding the lock."""
+        tmp_path = f"{self._log_path}.tmp"
+        with open(self._log_path, "rb") as src, open(tmp_path, "wb") as dst:
+            src.seek(offset)
+            while True:
+                chunk = src.read(1024 * 1024)
+                if not chunk:
+                    break
+                dst.write(chunk)
+            dst.flush()
+            os.fsync(dst.fileno())
+        # as when truncating, the cursor is reset first: a crash before the replace re-delivers the
+        # acknowledged records instead of skipping pending ones
+        self._write_cursor(0)
+        os.replace(tmp_path, self._log_path)
+        dir_fd = os.open(self.folder, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        logger.info(f"[OUTBOX] compacted, dropped {offset} acknowledged bytes")
+
+    def pending_bytes(self) -> int:
+        """:return: size of the records that have not been acknowledged yet"""
+        try:
+            return os.path.getsize(self._log_path) - self._read_cursor()
+        except FileNotFoundError:
+            return 0
+
+    def _write_cursor(self, offset: int):
+        tmp_path = f"{self._cursor_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(str(offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._cursor_path)
+
+    def _read_cursor(self) -> int:
+        try:
+            with open(self._cursor_path, "r") as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+
+outbox = Outbox(OUTBOX_FOLDER)
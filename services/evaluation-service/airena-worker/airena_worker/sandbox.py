@@ -1,47 +1,317 @@
+import fcntl
 import hashlib
 import logging
 import os
+import re
+import shutil
 import subprocess
-from typing import List
+import tempfile
+import time
+from contextlib import ExitStack, contextmanager
+from typing import Callable, List, Optional, Tuple
 
 import zmq
 
+from .cache import DiskCache
 from .constants import SANDBOX_ONLY_TASK_ID, ERROR_TIME_LIMIT_EXCEEDED, ERROR_RUNTIME_ERROR
-from .settings import PROFILE_PATH, TEMP_VENV_FOLDER, CREATE_VENV_PATH, ZMQ_PORT
+from .errors import VenvBusyError, VenvError
+from .settings import PROFILE_PATH, TEMP_VENV_FOLDER, CREATE_VENV_PATH, CREATE_OVERLAY_VENV_PATH, ZMQ_PORT, \
+    TEMP_WHEELHOUSE_FOLDER, VENV_CACHE_MAX_SIZE, WHEELHOUSE_MAX_SIZE
 
 logger = logging.getLogger("root")
 
+venv_cache = DiskCache(TEMP_VENV_FOLDER, VENV_CACHE_MAX_SIZE * 1024 * 1024, name="venv")
+# builds of a venv before giving up when other workers keep evicting it before it is leased
+VENV_LEASE_ATTEMPTS = 2
+# flock guarding the wheelhouse, shared with scripts/create-venv.sh and scripts/create-overlay-venv.sh
+WHEELHOUSE_LOCK_PATH = os.path.join(TEMP_WHEELHOUSE_FOLDER, ".wheelhouse.lock")
 
-def create_venv(req_path: str, force: bool = False) -> str:
+
+_REQ_NAME_PATTERN = re.compile(r"^([A-Za-z0-9][A-Za-z0-9._-]*)(.*)$")
+_DIRECT_REQ_PATTERN = re.compile(r"^([A-Za-z0-9][A-Za-z0-9._-]*(?:\[[^\]]*\])?)\s*@\s*(.+)$")
+_DIRECT_REQ_PREFIXES = ("git+", "hg+", "svn+", "bzr+", "http://", "https://", "file:", "-e", "--editable")
+
+
+def _canonicalize_name(name: str) -> str:
+    # PEP 503 normalized project name
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def normalize_requirements(req_str: str) -> Tuple[List[str], List[str], List[str]]:
     """
-    Create virtual environment (NOTE: this step happens outside of any security sandbox)
+    Normalize a requirements.txt so that files differing only in ordering, comments, whitespace
+    or project name spelling produce the same result.
 
-    :param req_path: path to the requirements.txt file
-    :param force: if True, the cached environment will be overwritten
-    :return: venv name
+    :param req_str: content of requirements.txt
+    :return: (options, index requirements, direct references), each sorted and deduplicated
     """
-    with open(req_path, "r") as f:
-        req_str = f.read()
-        f.close()
-    env_name = hashlib.md5(req_str.encode("ascii")).hexdigest()
-    dst_path = os.path.join(TEMP_VENV_FOLDER, env_name)
-    if os.path.exists(dst_path) and not force:
-        return env_name
-    cmd = ["bash", CREATE_VENV_PATH, dst_path, req_path.strip()]
+    options, index_reqs, direct_reqs = set(), set(), set()
+    for line in req_str.replace("\\\n", "").splitlines():
+        line = re.sub(r"(^|\s)#.*$", "", line).strip()
+        if not line:
+            continue
+        if line.startswith(_DIRECT_REQ_PREFIXES):
+            direct_reqs.add(" ".join(line.split()))
+            continue
+        if line.startswith("-"):
+            options.add(" ".join(line.split()))
+            continue
+        match = _DIRECT_REQ_PATTERN.match(line)
+        if match is not None:
+            name, url = match.groups()
+            direct_reqs.add(f"{_canonicalize_name(name)} @ {url}")
+            continue
+        match = _REQ_NAME_PATTERN.match(line)
+        if match is None:
+            index_reqs.add(line)
+            continue
+        name, rest = match.groups()
+        requirement, _, marker = rest.partition(";")
+        requirement = "".join(requirement.split())
+        marker = " ".join(marker.split())
+        index_reqs.add(_canonicalize_name(name) + requirement + (f"; {marker}" if marker else ""))
+    return sorted(options), sorted(index_reqs), sorted(direct_reqs)
+
+
+def get_venv_name(req_str: str) -> str:
+    """
+    :param req_str: content of requirements.txt
+    :return: content-addressed venv name, stable under `normalize_requirements`
+    """
+    options, index_reqs, direct_reqs = normalize_requirements(req_str)
+    digest = hashlib.sha256()
+    for section in (options, index_reqs, direct_reqs):
+        digest.update("\n".join(section).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _run_script(cmd: List[str]):
     # Reference: https://stackoverflow.com/a/4417735
     popen = subprocess.Popen(cmd, stdout=subprocess.PIPE,
-                             stderr=subprocess.PIPE, universal_newlines=True)
+                             stderr=subprocess.STDOUT, universal_newlines=True)
     for stdout_line in iter(popen.stdout.readline, ""):
         print(stdout_line, end="")
-    for stderr_line in iter(popen.stderr.readline, ""):
-        print(stderr_line, end="")
     popen.stdout.close()
     return_code = popen.wait()
     if return_code:
         raise subprocess.CalledProcessError(return_code, cmd)
+
+
+def _write_requirements(req_dir: str, options: List[str], index_reqs: List[str], direct_reqs: List[str]):
+    index_req_path = os.path.join(req_dir, "index-requirements.txt")
+    direct_req_path = os.path.join(req_dir, "direct-requirements.txt")
+    with open(index_req_path, "w") as f:
+        f.write("\n".join(options + index_reqs) + "\n" if index_reqs else "")
+    with open(direct_req_path, "w") as f:
+        f.write("\n".join(options + direct_reqs) + "\n" if direct_reqs else "")
+    return index_req_path, direct_req_path
+
+
+def _build_full_venv(dst_path: str, req_str: str):
+    options, index_reqs, direct_reqs = normalize_requirements(req_str)
+    with tempfile.TemporaryDirectory(prefix="aivle-req-") as req_dir:
+        index_req_path, direct_req_path = _write_requirements(req_dir, options, index_reqs, direct_reqs)
+        _run_script(["bash", CREATE_VENV_PATH, dst_path, index_req_path, direct_req_path, TEMP_WHEELHOUSE_FOLDER])
+
+
+def _build_overlay_venv(dst_path: str, base_name: str, req_str: str, base_req_str: str):
+    options, index_reqs, direct_reqs = normalize_requirements(req_str)
+    _, base_index_reqs, base_direct_reqs = normalize_requirements(base_req_str)
+    index_delta = [req for req in index_reqs if req not in base_index_reqs]
+    direct_delta = [req for req in direct_reqs if req not in base_direct_reqs]
+    logger.info(f"[SANDBOX | create_venv] overlay on {base_name}, delta: {index_delta + direct_delta}")
+    with tempfile.TemporaryDirectory(prefix="aivle-req-") as req_dir:
+        index_req_path, direct_req_path = _write_requirements(req_dir, options, index_delta, direct_delta)
+        _run_script(["bash", CREATE_OVERLAY_VENV_PATH, dst_path, os.path.join(TEMP_VENV_FOLDER, base_name),
+                     index_req_path, direct_req_path, TEMP_WHEELHOUSE_FOLDER])
+
+
+def evict_wheelhouse() -> List[str]:
+    """
+    Remove the least recently used wheels until the wheelhouse fits into `WHEELHOUSE_MAX_SIZE`.
+    Nothing is removed while a venv build installs from or builds into the wheelhouse.
+
+    :return: file names of the evicted wheels
+    """
+    if WHEELHOUSE_MAX_SIZE <= 0:
+        return []
+    evicted = []
+    with open(WHEELHOUSE_LOCK_PATH, "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return evicted
+        try:
+            wheels = []
+            for entry in os.scandir(TEMP_WHEELHOUSE_FOLDER):
+                if entry.is_file() and entry.name.endswith(".whl"):
+                    stat = entry.stat()
+                    # installs only read wheels, so the access time (if the filesystem keeps it) marks the last use
+                    wheels.append((max(stat.st_atime, stat.st_mtime), stat.st_size, entry.name))
+            wheels.sort()
+            total = sum(size for _, size, _ in wheels)
+            for _, size, name in wheels:
+                if total <= WHEELHOUSE_MAX_SIZE * 1024 * 1024:
+                    break
+                try:
+                    os.remove(os.path.join(TEMP_WHEELHOUSE_FOLDER, name))
+                except OSError:
+                    continue
+                total -= size
+                evicted.append(name)
+                logger.info(f"[SANDBOX | evict_wheelhouse] evicted {name} ({size} bytes)")
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+    return evicted
+
+
+def _build_cached_venv(env_name: str, build: Callable[[str], None], force: bool, prewarm: bool, **meta):
+    dst_path = os.path.join(TEMP_VENV_FOLDER, env_name)
+    # waits for the jobs using the venv only if it must be rebuilt (`force`), pre-warming never waits
+    with venv_cache.lock(env_name, blocking=not prewarm) as locked:
+        if not locked:
+            raise VenvBusyError(f"venv {env_name} is in use, not pre-warmed")
+        if venv_cache.lookup(env_name, count=False) and not force:
+            logger.info(f"[SANDBOX | create_venv] built by another job meanwhile: {env_name}")
+            return
+        logger.info(f"[SANDBOX | create_venv] cache miss: {env_name}, building")
+        if os.path.exists(dst_path):
+            venv_cache.remove(env_name)
+        start_time = time.monotonic()
+        try:
+            build(dst_path)
+        except Exception:
+            shutil.rmtree(dst_path, ignore_errors=True)
+            raise
+        build_seconds = time.monotonic() - start_time
+        venv_cache.commit(env_name, build_seconds=build_seconds, prewarmed=prewarm, **meta)
+        logger.info(f"[SANDBOX | create_venv] built {env_name} in {build_seconds:.1f}s")
+
+
+def _get_cached_venv(env_name: str, build: Callable[[str], None], stack: ExitStack, force: bool = False,
+                     prewarm: bool = False, **meta) -> str:
+    """
+    Look venv `env_name` up in the cache, build it with `build(dst_path)` on a miss, and lease it
+    (see `lease_venv`) until `stack` is closed.
+
+    The lookup only holds the shared lock of the lease, so that jobs using the same venv run at the
+    same time; the exclusive lock is taken to build it. The venv is leased again once built: if it
+    was evicted in between (an exclusive `flock` cannot be turned into a shared one atomically), it
+    is built again.
+
+    When pre-warming, the locks are not waited for: `VenvBusyError` is raised instead, so that the
+    pre-warm worker never stalls behind the jobs it is meant to speed up.
+    """
+    for attempt in range(VENV_LEASE_ATTEMPTS):
+        with ExitStack() as lease:
+            if lease.enter_context(venv_cache.lease(env_name, blocking=not prewarm)) is None:
+                raise VenvBusyError(f"venv {env_name} is being built, not pre-warmed")
+            # a job counts a single hit or miss, not the lookup after its own build
+            if venv_cache.lookup(env_name, count=not prewarm and attempt == 0) and not force:
+                if attempt == 0:
+                    logger.info(f"[SANDBOX | create_venv] cache hit: {env_name}")
+                stack.enter_context(lease.pop_all())
+                break
+        _build_cached_venv(env_name, build, force, prewarm, **meta)
+        force = False
+    else:
+        raise VenvError(f"venv {env_name} evicted after each of {VENV_LEASE_ATTEMPTS} builds")
+    if attempt > 0:
+        venv_cache.evict(keep=[env_name])
+        evict_wheelhouse()
+        logger.info(f"[SANDBOX | create_venv] venv cache stats: {get_venv_cache_stats()}")
     return env_name
 
 
+def _claim_prewarmed_venv(env_name: str):
+    entry = venv_cache.get_entry(env_name)
+    if entry is not None and entry.get("prewarmed"):
+        venv_cache.update_entry(env_name, prewarmed=False)
+        venv_cache.incr("prewarm_hits")
+        logger.info(f"[SANDBOX | create_venv] pre-warmed venv used: {env_name}")
+
+
+def create_venv(req_path: str, force: bool = False, base_req_str: Optional[str] = None,
+                prewarm: bool = False, stack: Optional[ExitStack] = None) -> str:
+    """
+    Create virtual environment (NOTE: this step happens outside of any security sandbox)
+
+    Venvs are cached under `TEMP_VENV_FOLDER` by the digest of the normalized requirements and
+    evicted in LRU order once the cache exceeds `VENV_CACHE_MAX_SIZE`. Wheels are built into
+    `TEMP_WHEELHOUSE_FOLDER` so that a cache miss installs previously built wheels offline; the
+    wheelhouse has its own budget, `WHEELHOUSE_MAX_SIZE` (see `evict_wheelhouse`).
+
+    If `base_req_str` is given (normally the grader's requirements), a base venv is built for it
+    once and the returned venv is a thin overlay on top of it: the base site-packages is chained in
+    with a `.pth` file and only the requirements missing from the base are installed. Packages of
+    the base that the submission does not ask for remain importable.
+
+    :param req_path: path to the requirements.txt file
+    :param force: if True, the cached environment will be overwritten
+    :param base_req_str: content of the requirements.txt shared by every submission of the task
+    :param prewarm: True when building ahead of the job, so that the job run counts a pre-warm hit;
+    raises `VenvBusyError` instead of waiting for a venv that is being built or used
+    :param stack: if given, the venv and its base venv stay leased (see `lease_venv`) until `stack`
+    is closed, so that they cannot be evicted before the job runs
+    :return: venv name
+    """
+    with open(req_path, "r") as f:
+        req_str = f.read()
+        f.close()
+    with ExitStack() as leases:
+        env_name = get_venv_name(req_str)
+        if base_req_str is None:
+            env_name = _get_cached_venv(env_name, lambda dst_path: _build_full_venv(dst_path, req_str), leases,
+                                        force=force, prewarm=prewarm)
+        else:
+            # the lease of the base venv also keeps it while building the overlay on it
+            base_name = _get_cached_venv(get_venv_name(base_req_str),
+                                         lambda dst_path: _build_full_venv(dst_path, base_req_str), leases,
+                                         force=force, prewarm=prewarm)
+            if env_name == base_name:
+                env_name = base_name
+            else:
+                overlay_name = hashlib.sha256(f"{base_name}\0{env_name}".encode("utf-8")).hexdigest()
+                env_name = _get_cached_venv(
+                    overlay_name, lambda dst_path: _build_overlay_venv(dst_path, base_name, req_str, base_req_str),
+                    leases, force=force, prewarm=prewarm, depends_on=[base_name])
+        if stack is not None:
+            stack.enter_context(leases.pop_all())
+    if not prewarm:
+        _claim_prewarmed_venv(env_name)
+    return env_name
+
+
+def get_venv_chain(env_name: str) -> List[str]:
+    """
+    :param env_name: venv name
+    :return: `env_name` followed by the base venvs it is layered on
+    """
+    chain = [env_name]
+    entry = venv_cache.get_entry(env_name)
+    while entry is not None and entry.get("depends_on"):
+        chain.extend(entry["depends_on"])
+        entry = venv_cache.get_entry(entry["depends_on"][-1])
+    return chain
+
+
+@contextmanager
+def lease_venv(env_name: str):
+    """Keep venv `env_name` (and its base venvs) from being evicted while the context manager is held."""
+    with ExitStack() as stack:
+        for name in get_venv_chain(env_name):
+            stack.enter_context(venv_cache.lease(name))
+        yield
+
+
+def get_venv_cache_stats() -> dict:
+    """
+    :return: venv cache counters (hits, misses, builds, build_seconds, evictions, prewarm_hits, entries, size)
+    """
+    return venv_cache.stats()
+
+
 def run_with_venv(env_name: str, command: List[str], task_id: int, job_id: int, celery_task_id: str, home: str = "",
                   rlimit: int = 0, vram_limit: int = 256, time_limit: int = 0) -> str:
     """
@@ -81,8 +351,7 @@ def run_with_venv(env_name: str, command: List[str], task_id: int, job_id: int,
 
     full_cmd = command.copy()
 
-    venv_path = os.path.join(TEMP_VENV_FOLDER, env_name)
-    venv_bin = os.path.join(venv_path, "bin")
+    venv_bin = ":".join(os.path.join(TEMP_VENV_FOLDER, name, "bin") for name in get_venv_chain(env_name))
 
     # Set up environment variables for the command
     env = os.environ.copy()
@@ -0,0 +1,21 @@
+#!/bin/bash
+# Usage: create-overlay-venv.sh <venv path> <base venv path> <index requirements> <direct requirements> <wheelhouse>
+# The new venv has no packages of its own: the base venv's site-packages is chained in through a .pth file,
+# so only the requirements missing from the base venv are installed.
+/usr/bin/python3 -m venv --without-pip "$1" || exit 1
+PURELIB_CMD="import sysconfig; print(sysconfig.get_paths()['purelib'])"
+BASE_PURELIB=$("$2"/bin/python -c "$PURELIB_CMD") || exit 1
+PURELIB=$("$1"/bin/python -c "$PURELIB_CMD") || exit 1
+echo "$BASE_PURELIB" > "$PURELIB"/_airena_base.pth
+# same wheelhouse locking as create-venv.sh
+WHEELHOUSE_LOCK="$5"/.wheelhouse.lock
+if [ -s "$3" ]; then
+  if ! flock -s "$WHEELHOUSE_LOCK" "$1"/bin/python -m pip install --no-index --find-links "$5" -r "$3"; then
+    flock "$WHEELHOUSE_LOCK" "$1"/bin/python -m pip wheel --prefer-binary --find-links "$5" --wheel-dir "$5" \
+      -r "$3" || exit 1
+    flock -s "$WHEELHOUSE_LOCK" "$1"/bin/python -m pip install --no-index --find-links "$5" -r "$3" || exit 1
+  fi
+fi
+if [ -s "$4" ]; then
+  "$1"/bin/python -m pip install -r "$4" || exit 1
+fi
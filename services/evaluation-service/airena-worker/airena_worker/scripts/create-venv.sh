@@ -1,9 +1,22 @@
 #!/bin/bash
+# Usage: create-venv.sh <venv path> <index requirements> <direct requirements> <wheelhouse>
 # shellcheck source=/dev/null
 # /usr/bin/python3 -m venv --copies "$1"
 /usr/bin/python3 -m venv "$1"
 source "$1"/bin/activate
 #pip config set global.index-url https://pypi.tuna.tsinghua.edu.cn/simple
-pip install --upgrade pip
-pip install -r "$2"
+# the wheelhouse is shared by every build: installs hold a shared lock so that its wheels are not evicted
+# underneath them, builds hold an exclusive one so that two builds never write the same wheel
+WHEELHOUSE_LOCK="$4"/.wheelhouse.lock
+if [ -s "$2" ]; then
+  # install from wheels built for earlier venvs, only build the missing ones
+  if ! flock -s "$WHEELHOUSE_LOCK" pip install --no-index --find-links "$4" -r "$2"; then
+    flock "$WHEELHOUSE_LOCK" pip wheel --prefer-binary --find-links "$4" --wheel-dir "$4" -r "$2" || exit 1
+    flock -s "$WHEELHOUSE_LOCK" pip install --no-index --find-links "$4" -r "$2" || exit 1
+  fi
+fi
+if [ -s "$3" ]; then
+  # direct references (e.g. git+https://...) cannot be resolved from the wheelhouse
+  pip install -r "$3" || exit 1
+fi
 deactivate
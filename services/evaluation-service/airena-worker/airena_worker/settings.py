@@ -16,6 +16,7 @@ load_dotenv(verbose=True, dotenv_path=DOTENV_PATH)
 package_directory = os.path.dirname(os.path.abspath(__file__))
 PROFILE_PATH = os.path.join(package_directory, "profiles", "aivle-base.profile")  # "./profiles/aivle-base.profile"
 CREATE_VENV_PATH = os.path.join(package_directory, "scripts", "create-venv.sh")  # "./scripts/create-venv.sh"
+CREATE_OVERLAY_VENV_PATH = os.path.join(package_directory, "scripts", "create-overlay-venv.sh")
 TEMP_FOLDER_ROOT = os.path.join(tempfile.gettempdir(), "aivle-worker")
 if not os.path.isdir(TEMP_FOLDER_ROOT):
     os.mkdir(TEMP_FOLDER_ROOT)
@@ -45,9 +46,60 @@ CELERY_CONCURRENCY = get_env_variable("CELERY_CONCURRENCY", "1")
 WORKER_NAME = get_env_variable("WORKER_NAME", "celery")
 FULL_WORKER_NAME = f"{WORKER_NAME}@{socket.gethostname()}"
 
+# HTTP config
+HTTP_POOL_SIZE = int(get_env_variable("HTTP_POOL_SIZE", "4"))  # kept-alive connections per host and process
+HTTP_RETRIES = int(get_env_variable("HTTP_RETRIES", "3"))  # retries of idempotent API calls
+HTTP_BACKOFF = float(get_env_variable("HTTP_BACKOFF", "0.5"))  # seconds, doubled after every retry
+HTTP_CONNECT_TIMEOUT = float(get_env_variable("HTTP_CONNECT_TIMEOUT", "5"))  # seconds
+HTTP_READ_TIMEOUT = float(get_env_variable("HTTP_READ_TIMEOUT", "30"))  # seconds
+# seconds between two logs of the API latency histograms of a process, logged after its jobs
+HTTP_LATENCY_LOG_INTERVAL = float(get_env_variable("HTTP_LATENCY_LOG_INTERVAL", "300"))
+
+# Download config
+DOWNLOAD_CHUNK_SIZE = int(get_env_variable("DOWNLOAD_CHUNK_SIZE", str(1024 * 1024)))  # bytes
+DOWNLOAD_RETRIES = int(get_env_variable("DOWNLOAD_RETRIES", "3"))
+DOWNLOAD_TIMEOUT = float(get_env_variable("DOWNLOAD_TIMEOUT", "60"))  # seconds without receiving any data
+
+# Outbox config
+# state that must survive a reboot (the temp root is often a tmpfs)
+STATE_FOLDER_ROOT = get_env_variable(
+    "STATE_FOLDER",
+    os.path.join(os.getenv("XDG_STATE_HOME") or os.path.join(os.path.expanduser("~"), ".local", "state"), "aivle-worker"),
+)
+OUTBOX_FOLDER = get_env_variable("OUTBOX_FOLDER", os.path.join(STATE_FOLDER_ROOT, "outbox"))
+OUTBOX_BATCH_SIZE = int(get_env_variable("OUTBOX_BATCH_SIZE", "100"))  # records per bulk request
+OUTBOX_FLUSH_INTERVAL = float(get_env_variable("OUTBOX_FLUSH_INTERVAL", "1"))  # seconds between polls of an empty outbox
+OUTBOX_MAX_BACKOFF = float(get_env_variable("OUTBOX_MAX_BACKOFF", "60"))  # seconds, while a service is down
+OUTBOX_MAX_ATTEMPTS = int(get_env_variable("OUTBOX_MAX_ATTEMPTS", "10"))  # before a rejected result is dropped
+
 # Monitor config
 ZMQ_PORT = get_env_variable("ZMQ_PORT", "15921")
 
+# Cache config
+TEMP_WHEELHOUSE_FOLDER = get_env_variable("WHEELHOUSE_FOLDER", os.path.join(TEMP_FOLDER_ROOT, "wheelhouse"))
+if not os.path.isdir(TEMP_WHEELHOUSE_FOLDER):
+    os.makedirs(TEMP_WHEELHOUSE_FOLDER)
+VENV_CACHE_MAX_SIZE = int(get_env_variable("VENV_CACHE_MAX_SIZE", "20480"))  # MiB, <=0 means no limit
+WHEELHOUSE_MAX_SIZE = int(get_env_variable("WHEELHOUSE_MAX_SIZE", "10240"))  # MiB, <=0 means no limit
+
+TEMP_ASSET_FOLDER = os.path.join(TEMP_FOLDER_ROOT, "assets")
+if not os.path.isdir(TEMP_ASSET_FOLDER):
+    os.mkdir(TEMP_ASSET_FOLDER)
+ASSET_CACHE_MAX_SIZE = int(get_env_variable("ASSET_CACHE_MAX_SIZE", "10240"))  # MiB, <=0 means no limit
+# how grading folders are populated from the asset cache: "reflink" (falls back to copy), "copy" or "hardlink".
+# "hardlink" shares the cached inodes with the grading folder: code running as the worker's user can make them
+# writable again and modify the bundle of every later job of the task, so only use it when jobs are trusted.
+ASSET_LINK_MODE = get_env_variable("ASSET_LINK_MODE", "reflink")
+
+# Pre-warm config
+PREWARM_ENABLE = get_env_variable("PREWARM_ENABLE", "1") == "1"
+PREWARM_CONCURRENCY = get_env_variable("PREWARM_CONCURRENCY", "1")
+PREWARM_NICENESS = int(get_env_variable("PREWARM_NICENESS", "10"))
+
+
+def get_prewarm_queue(queue: str) -> str:
+    return f"{queue}.prewarm"
+
 
 def update_queue(val: str):
     global CELERY_QUEUE
@@ -3,8 +3,9 @@ import os
 from celery import Celery
 from celery.signals import celeryd_after_setup
 
-from .apis import start_job, submit_job
-from .client import run_job
+from .apis import start_job, submit_job, get_job_submission
+from .client import run_job, prewarm_venv
+from .session import log_latency_histograms
 from .settings import CELERY_BROKER_URI, CELERY_RESULT_BACKEND
 
 
@@ -15,9 +16,12 @@ app = Celery("worker", backend=CELERY_RESULT_BACKEND, broker=CELERY_BROKER_URI)
 @app.task(bind=True, name="scheduler.submit_eval_task")
 def evaluate(self, job_id):
     celery_task_id = self.request.id
-    job = start_job(job_id, celery_task_id)
-    result = run_job(job=job, celery_task_id=celery_task_id)
-    submit_job(job.id, celery_task_id, job.submission, result)
+    try:
+        job = start_job(job_id, celery_task_id)
+        result = run_job(job=job, celery_task_id=celery_task_id)
+        submit_job(job.id, celery_task_id, job.submission, result)
+    finally:
+        log_latency_histograms()
     return {
         "ok": result.ok,
         "raw_log": result.raw,
@@ -26,6 +30,16 @@ def evaluate(self, job_id):
     }
 
 
+@app.task(bind=True, name="scheduler.prewarm_venv", ignore_result=True)
+def prewarm(self, job_id):
+    try:
+        submission = get_job_submission(job_id)
+        env_name = prewarm_venv(submission)
+    finally:
+        log_latency_histograms()
+    return {"env_name": env_name}
+
+
 @celeryd_after_setup.connect
 def capture_worker_name(sender, instance, **kwargs):
     os.environ["WORKER_NAME"] = '{0}'.format(sender)
@@ -1,17 +1,26 @@
+import hashlib
+import logging
 import os
 import sys
+import time
+from typing import Optional
 from urllib.parse import urlparse
 
 import requests
 from requests import Session
+from requests.exceptions import ChunkedEncodingError
 
-from .settings import ACCESS_TOKEN
+from .errors import DownloadError, ChecksumMismatchError
+from .models import DownloadResult
+from .settings import ACCESS_TOKEN, DOWNLOAD_CHUNK_SIZE, DOWNLOAD_RETRIES, DOWNLOAD_TIMEOUT
 
 if sys.version_info.major < 3:
     from urllib import url2pathname
 else:
     from urllib.request import url2pathname
 
+logger = logging.getLogger("root")
+
 
 # Reference: https://stackoverflow.com/a/27786580
 class LocalFileAdapter(requests.adapters.BaseAdapter):
@@ -66,13 +75,72 @@ class LocalFileAdapter(requests.adapters.BaseAdapter):
         pass
 
 
-def download_and_save(session: Session, url: str, path: str):
-    if urlparse(url).scheme == "file":
-        r = session.get(url)
-    else:
-        r = session.get(url, headers={"Authorization": f"Token {ACCESS_TOKEN}"}, allow_redirects=False)
-        if r.status_code != 200:
-            raise Exception(r.status_code)  # TODO
-    with open(path, "wb") as f:
-        f.write(r.content)
-        f.close()
+def download_and_save(session: Session, url: str, path: str, retries: int = DOWNLOAD_RETRIES,
+                      chunk_size: int = DOWNLOAD_CHUNK_SIZE, etag: Optional[str] = None) -> DownloadResult:
+    """
+    Stream `url` to `path` chunk by chunk, so that memory usage does not depend on the file size.
+
+    On connection errors and 5xx responses the download is retried with exponential backoff,
+    resuming with a Range request when the server supports it (206), or starting over otherwise.
+    A 416 whose Content-Range is the size already received means the file was complete. If the server sends an
+    `X-Checksum-Sha256` header, the downloaded file is verified against it.
+
+    :param session: requests session
+    :param url: http(s):// or file:// URL
+    :param path: destination file
+    :param retries: number of retries after the first attempt
+    :param chunk_size: size in bytes of the chunks read from the response
+    :param etag: if given, the request is conditional (If-None-Match) and nothing is written on 304
+    :return: DownloadResult with the SHA-256 hex digest of the downloaded file and the server's ETag
+    """
+    headers = {}
+    if urlparse(url).scheme != "file":
+        headers["Authorization"] = f"Token {ACCESS_TOKEN}"
+    digest = hashlib.sha256()
+    received = 0
+    expected_checksum = None
+    response_etag = None
+    for attempt in range(retries + 1):
+        req_headers = dict(headers)
+        if received > 0:
+            req_headers["Range"] = f"bytes={received}-"
+        elif etag is not None:
+            req_headers["If-None-Match"] = etag
+        try:
+            with session.get(url, headers=req_headers, allow_redirects=False, stream=True,
+                             timeout=DOWNLOAD_TIMEOUT) as r:
+                if r.status_code == 304 and etag is not None:
+                    return DownloadResult(checksum=None, etag=etag, not_modified=True)
+                if r.status_code == 200:
+                    # full content: (re)start from the beginning
+                    digest = hashlib.sha256()
+                    received = 0
+                    mode = "wb"
+                elif r.status_code == 206 and received > 0 and \
+                        r.headers.get("Content-Range", "").startswith(f"bytes {received}-"):
+                    mode = "ab"
+                elif r.status_code == 416 and received > 0 and \
+                        r.headers.get("Content-Range", "") == f"bytes */{received}":
+                    # the connection dropped after the last byte: nothing is left to resume
+                    break
+                elif r.status_code >= 500:
+                    raise requests.HTTPError(f"server error [{r.status_code}]", response=r)
+                else:
+                    raise DownloadError(f"download {url} failed [{r.status_code}]")
+                expected_checksum = r.headers.get("X-Checksum-Sha256", expected_checksum)
+                response_etag = r.headers.get("ETag", response_etag)
+                with open(path, mode) as f:
+                    for chunk in r.iter_content(chunk_size=chunk_size):
+                        f.write(chunk)
+                        digest.update(chunk)
+                        received += len(chunk)
+            break
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError, ChunkedEncodingError) as e:
+            if attempt == retries:
+                raise DownloadError(f"download {url} failed after {retries + 1} attempts: {e}")
+            logger.warning(f"[DOWNLOAD] {url} interrupted at {received} bytes ({e}), retrying")
+            time.sleep(2 ** attempt)
+    checksum = digest.hexdigest()
+    if expected_checksum is not None and expected_checksum.lower() != checksum:
+        raise ChecksumMismatchError(f"download {url}: expected sha256 {expected_checksum}, got {checksum}")
+    return DownloadResult(checksum=checksum, etag=response_etag)
@@ -1,12 +1,10 @@
 import json
-import time
-import multiprocessing
-from multiprocessing import Process, Queue
 
 import gymnasium as gym
 import numpy
 from airena_gym import AgentEnv
 from airena_gym import EnvSerializer
+from airena_gym import launch_judge
 from airena_gym import JudgeEnv
 
 from airena_grader.evaluator import StepCountEvaluator
@@ -74,26 +72,14 @@ def create_agent(**kwargs):
     return CartPoleAgent()
 
 
-def run_judge(return_queue: Queue):
-    judge_env = CartPoleJudgeEnv()
-    return_queue.put(judge_env.bind())
-    judge_env.start()
+def create_judge():
+    return CartPoleJudgeEnv()
 
 
 def main():
-    manager = multiprocessing.Manager()
-    return_queue = manager.Queue()
-    judge_proc = Process(target=run_judge, args=(return_queue,))
-    judge_proc.start()
-    port = None
-    for _ in range(10):  # wait for up to 10 seconds
-        time.sleep(1)
-        if not return_queue.empty():
-            port = return_queue.get()
-            break
-    if not isinstance(port, int):
-        raise Exception("judge process not properly initialized")
-    try:
+    # returns as soon as the judge is listening, raises `JudgeLaunchError` if it fails to start
+    with launch_judge(create_judge) as judge:
+        port = judge.port
         n_runs = 10
         env = CartPoleAgentEnv(port=port)
         evaluator = StepCountEvaluator()
@@ -117,8 +103,6 @@ def main():
         # not using firejail
         with open("stdout.log", "w") as f:
             f.write("\n\n" + json.dumps(res))
-    finally:
-        judge_proc.terminate()
 
 
 if __name__ == "__main__":
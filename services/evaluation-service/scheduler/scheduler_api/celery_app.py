@@ -1,7 +1,9 @@
 import os
 
 from celery import Celery
+from celery.utils import uuid
 from kombu import Queue
+from kombu.common import Broadcast
 
 # set the default Django settings module for the 'celery' program.
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "scheduler.settings")
@@ -15,14 +17,31 @@ app.conf.task_queues = (
     Queue("default", routing_key="task.#"),
     Queue("gpu", routing_key="gpu.#"),
     Queue("private", routing_key="private.#"),
-    Queue("training", routing_key="training.#")
+    Queue("training", routing_key="training.#"),
+    # every worker subscribed to a queue gets a copy of its pre-warm messages
+    Broadcast("default.prewarm"),
+    Broadcast("gpu.prewarm"),
+    Broadcast("private.prewarm"),
 )
 
 
+def get_prewarm_queue(queue: str) -> str:
+    return f"{queue}.prewarm"
+
+
+def new_celery_task_id() -> str:
+    """Celery task ID for a job that is not published yet (same format as the IDs generated by Celery)."""
+    return uuid()
+
+
 @app.task(bind=True, name="scheduler.submit_eval_task")
 def evaluate(self, job_id):
     pass
 
+@app.task(bind=True, name="scheduler.prewarm_venv", ignore_result=True)
+def prewarm_venv(self, job_id):
+    pass
+
 @app.task(bind=True, name="scheduler.submit_training_task")
 def train(self, job_id):
     pass
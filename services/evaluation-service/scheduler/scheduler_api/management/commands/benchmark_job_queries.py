@@ -0,0 +1,91 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.test import APIRequestFactory
+
+from scheduler_api.models import Job
+from scheduler_api.views import JobViewSet
+
+SUBMISSION_PREFIX = "bench-"
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the job table with synthetic rows and time the queries behind the job list endpoint "
+        "(status polling, task/group listing, submission lookup). Run it against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=2_000_000, help="number of synthetic jobs")
+        parser.add_argument("--tasks", type=int, default=200, help="number of distinct tasks")
+        parser.add_argument("--groups", type=int, default=500, help="number of distinct groups per task")
+        parser.add_argument("--repeat", type=int, default=20, help="runs per query")
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument("--explain", action="store_true", help="print the query plans")
+        parser.add_argument("--keep", action="store_true", help="keep the synthetic rows afterwards")
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        existing = Job.objects.filter(submission_id__startswith=SUBMISSION_PREFIX).count()
+        if existing < options["rows"]:
+            self._fill(rng, options["rows"] - existing, options["tasks"], options["groups"], options["batch_size"])
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute(f"ANALYZE {Job._meta.db_table}")
+
+        task_id = rng.randrange(options["tasks"])
+        group_id = rng.randrange(options["groups"])
+        submission_id = f"{SUBMISSION_PREFIX}{rng.randrange(options['rows'])}"
+        queries = {
+            "status polling (queued)": lambda: Job.objects.filter(status=Job.STATUS_QUEUED).order_by("-id")[:100],
+            "status polling (running)": lambda: Job.objects.filter(status=Job.STATUS_RUNNING).order_by("-id")[:100],
+            "task listing": lambda: Job.objects.filter(task_id=task_id).order_by("-id")[:100],
+            "task + group listing": lambda: Job.objects.filter(task_id=task_id, group_id=group_id).order_by("-id")[:100],
+            "submission lookup": lambda: Job.objects.filter(submission_id=submission_id),
+        }
+        for name, query in queries.items():
+            self._report(name, lambda: list(query()), options["repeat"])
+            if options["explain"]:
+                self.stdout.write(query().explain())
+
+        # first and next page of the list endpoint, as polled by the dashboards
+        factory = APIRequestFactory()
+        view = JobViewSet.as_view({"get": "list"})
+
+        def list_pages():
+            response = view(factory.get("/api/jobs/", {"task_id": task_id, "group_id": group_id}))
+            if response.data["next"]:
+                view(factory.get(response.data["next"]))
+
+        self._report("list endpoint (2 pages)", list_pages, options["repeat"])
+
+        if not options["keep"]:
+            Job.objects.filter(submission_id__startswith=SUBMISSION_PREFIX).delete()
+
+    def _fill(self, rng, n_rows, n_tasks, n_groups, batch_size):
+        # mostly finished jobs, like a long-running deployment
+        statuses = [Job.STATUS_DONE] * 90 + [Job.STATUS_ERROR] * 8 + [Job.STATUS_RUNNING] + [Job.STATUS_QUEUED]
+        start_time = time.perf_counter()
+        for start in range(0, n_rows, batch_size):
+            # `bulk_create` sends no signal, so nothing is published to Celery
+            Job.objects.bulk_create([
+                Job(task_id=rng.randrange(n_tasks), group_id=rng.randrange(n_groups),
+                    submission_id=f"{SUBMISSION_PREFIX}{i}", status=rng.choice(statuses),
+                    celery_task_id="benchmark")
+                for i in range(start, min(start + batch_size, n_rows))
+            ])
+        self.stdout.write(f"inserted {n_rows} jobs in {time.perf_counter() - start_time:.1f}s")
+
+    def _report(self, name, fn, repeat):
+        fn()  # warm up
+        durations = []
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            fn()
+            durations.append((time.perf_counter() - start_time) * 1000)
+        durations.sort()
+        p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+        self.stdout.write(f"{name:<28} median {statistics.median(durations):8.2f} ms   p95 {p95:8.2f} ms")
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler_api', '0003_trainingjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['task_id', '-id'], name='job_task_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['task_id', 'group_id', '-id'], name='job_task_group_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['status', '-id'], name='job_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['submission_id'], name='job_submission_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trainingjob',
+            index=models.Index(fields=['task_id', 'group_id', '-id'], name='training_job_task_group_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trainingjob',
+            index=models.Index(fields=['status', '-id'], name='training_job_status_idx'),
+        ),
+    ]
@@ -40,6 +40,15 @@ class Job(BaseJob):
     ram_limit = models.PositiveIntegerField(default=256)
     vram_limit = models.PositiveIntegerField(default=256)
 
+    class Meta:
+        # matched to the filters of JobViewSet, whose pages are ordered by "-id"
+        indexes = [
+            models.Index(fields=["task_id", "-id"], name="job_task_idx"),
+            models.Index(fields=["task_id", "group_id", "-id"], name="job_task_group_idx"),
+            models.Index(fields=["status", "-id"], name="job_status_idx"),
+            models.Index(fields=["submission_id"], name="job_submission_idx"),
+        ]
+
     def __str__(self):
         status = self._get_status_description(self.status)
         return f"Job {self.pk} - Task {self.task_id} - Submission {self.submission_id} - Status {status}"
@@ -49,6 +58,13 @@ class TrainingJob(BaseJob):
     
     agent_id = models.CharField(max_length=255)
 
+    class Meta:
+        # matched to the filters of TrainingJobViewSet, whose pages are ordered by "-id"
+        indexes = [
+            models.Index(fields=["task_id", "group_id", "-id"], name="training_job_task_group_idx"),
+            models.Index(fields=["status", "-id"], name="training_job_status_idx"),
+        ]
+
     def __str__(self):
         status = self._get_status_description(self.status)
         return f"TrainingJob {self.pk} - Task {self.task_id} - Agent {self.agent_id} - Status {status}"
@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+
+class JobCursorPagination(CursorPagination):
+    """
+    Pages of jobs, newest first. A cursor page costs one index range scan however long the job
+    history is, unlike a page number (OFFSET) or no pagination at all.
+    """
+    ordering = "-id"
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
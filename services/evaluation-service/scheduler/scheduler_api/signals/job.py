@@ -1,25 +1,52 @@
 import logging
+from typing import Iterable
 
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save
 from django.dispatch import receiver
 
 from scheduler.settings import CELERY_ENABLE
 from scheduler_api.models import Job
-from scheduler_api.celery_app import evaluate
+from scheduler_api.celery_app import app, evaluate, prewarm_venv, get_prewarm_queue, new_celery_task_id
 
 logger = logging.getLogger('django')
 
 
+def assign_celery_task_id(job):
+    """Give a new job its Celery task ID before it is written (`"dummy_task_id"` without Celery)."""
+    job.celery_task_id = new_celery_task_id() if CELERY_ENABLE else "dummy_task_id"
+
+
+def publish_jobs(jobs: Iterable[Job]):
+    """
+    Publish the Celery messages of `jobs` over one broker connection. The messages use the
+    pre-generated `celery_task_id` of each job, so the rows need no update afterwards.
+
+    :param jobs: committed jobs
+    """
+    if not CELERY_ENABLE:
+        return
+    with app.producer_or_acquire() as producer:
+        for job in jobs:
+            # let idle workers build the submission's venv while the job waits in the queue
+            prewarm_venv.apply_async(args=[job.pk], queue=get_prewarm_queue('default'), producer=producer)
+            evaluate.apply_async(args=[job.pk], queue='default', task_id=job.celery_task_id,
+                                 producer=producer) # instance.task.eval_queue.name
+
+
+@receiver(pre_save, sender=Job)
+def assign_celery_task_id_to_job(sender, instance: Job, **kwargs):
+    # the ID is known before the row is written, so the job is saved only once and a worker never
+    # sees the job without its `celery_task_id`
+    if instance._state.adding:
+        assign_celery_task_id(instance)
+
+
 @receiver(post_save, sender=Job)
 def create_celery_task_with_job(sender, instance: Job, created, **kwargs):
     if not created:
-        return  # prevent dead lock
-
-    if CELERY_ENABLE:
-        result = evaluate.apply_async(args=[instance.pk], queue='default') # instance.task.eval_queue.name
-        instance.celery_task_id = result.id
-    else:
-        instance.celery_task_id = "dummy_task_id"
-    # instance.status = Job.STATUS_QUEUED
-    instance.save()
+        return
+
+    # publish only once the job is committed, otherwise a worker may start it before it exists
+    transaction.on_commit(lambda: publish_jobs([instance]))
     logger.info(f"{instance} created")
@@ -1,25 +1,33 @@
 import logging
 
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save
 from django.dispatch import receiver
 
 from scheduler.settings import CELERY_ENABLE
 from scheduler_api.models import TrainingJob
 from scheduler_api.celery_app import train
+from scheduler_api.signals.job import assign_celery_task_id
 
 logger = logging.getLogger('django')
 
 
+def publish_training_job(training_job: TrainingJob):
+    if CELERY_ENABLE:
+        train.apply_async(args=[training_job.pk], queue='training', task_id=training_job.celery_task_id)
+
+
+@receiver(pre_save, sender=TrainingJob)
+def assign_celery_task_id_to_training_job(sender, instance: TrainingJob, **kwargs):
+    # see `assign_celery_task_id_to_job`
+    if instance._state.adding:
+        assign_celery_task_id(instance)
+
+
 @receiver(post_save, sender=TrainingJob)
 def create_celery_task_with_training_job(sender, instance: TrainingJob, created, **kwargs):
     if not created:
-        return  # prevent dead lock
+        return
 
-    if CELERY_ENABLE:
-        result = train.apply_async(args=[instance.pk], queue='training')
-        instance.celery_task_id = result.id
-    else:
-        instance.celery_task_id = "dummy_task_id"
-    # instance.status = Job.STATUS_QUEUED
-    instance.save()
+    transaction.on_commit(lambda: publish_training_job(instance))
     logger.info(f"{instance} created")
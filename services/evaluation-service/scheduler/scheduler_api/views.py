@@ -1,3 +1,5 @@
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.decorators import action
@@ -5,19 +7,90 @@ from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 
 from .models import Job, TrainingJob, Queue
+from .pagination import JobCursorPagination
 from .serializers import JobSerializer, TrainingJobSerializer, QueueSerializer
 from .celery_app import app
+from .signals.job import assign_celery_task_id, publish_jobs
 
 import logging
 
 logger = logging.getLogger("django")
 
+# rows per query of the bulk actions
+BULK_BATCH_SIZE = 1000
+
 
 class JobViewSet(ModelViewSet):
     queryset = Job.objects.all()
     serializer_class = JobSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["status", "task_id", "submission_id", "group_id"]
+    pagination_class = JobCursorPagination
+
+    def perform_create(self, serializer):
+        # the Celery messages are published when this transaction commits (see `signals.job`)
+        with transaction.atomic():
+            serializer.save()
+
+    @action(detail=False, methods=["post"])
+    def bulk_create(self, request):
+        """
+        Create many jobs at once: `{"jobs": [{"task_id": ..., "group_id": ..., "submission_id": ...}, ...]}`.
+        The jobs are inserted with one bulk insert, and their Celery messages are published over one
+        broker connection once the insert is committed.
+        """
+        items = request.data.get("jobs") if isinstance(request.data, dict) else None
+        if not isinstance(items, list):
+            return Response(
+                status=status.HTTP_400_BAD_REQUEST,
+                data={"status": "failed", "reason": "field `jobs` must be a list"},
+            )
+        serializer = self.get_serializer(data=items, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        # `bulk_create` sends neither `pre_save` nor `post_save`: assign the Celery task IDs and
+        # publish the messages here instead
+        jobs = [Job(**data) for data in serializer.validated_data]
+        for job in jobs:
+            assign_celery_task_id(job)
+        with transaction.atomic():
+            jobs = Job.objects.bulk_create(jobs, batch_size=BULK_BATCH_SIZE)
+            transaction.on_commit(lambda: publish_jobs(jobs))
+        logger.info(f"bulk create: {len(jobs)} jobs created")
+        return Response(
+            status=status.HTTP_201_CREATED,
+            data={
+                "status": "success",
+                "jobs": [{"id": job.pk, "celery_task_id": job.celery_task_id} for job in jobs],
+            },
+        )
+
+    @action(detail=False, methods=["post"])
+    def bulk_status(self, request):
+        """
+        Status of many jobs at once: `{"ids": [...]}`. Ids of jobs that do not exist are listed in `missing`.
+        """
+        ids = request.data.get("ids") if isinstance(request.data, dict) else None
+        if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+            return Response(
+                status=status.HTTP_400_BAD_REQUEST,
+                data={"status": "failed", "reason": "field `ids` must be a list of integers"},
+            )
+        jobs = []
+        for i in range(0, len(ids), BULK_BATCH_SIZE):
+            jobs.extend(
+                Job.objects.filter(pk__in=ids[i:i + BULK_BATCH_SIZE])
+                .order_by()
+                .values("id", "status", "celery_task_id", "updated_at")
+            )
+        found = {job["id"] for job in jobs}
+        return Response(
+            {
+                "status": "success",
+                "jobs": jobs,
+                "missing": [pk for pk in ids if pk not in found],
+            }
+        )
 
     @action(detail=True)
     def start(self, request, pk=None):
@@ -79,6 +152,53 @@ class JobViewSet(ModelViewSet):
         job.save()
         return Response({"status": "success"})
 
+    @action(detail=False, methods=["post"])
+    def bulk_complete(self, request):
+        """
+        Complete many jobs at once: `{"jobs": [{"id": ..., "task_id": ..., "ok": ...}, ...]}`.
+        Completing a job again with the same `task_id` succeeds, so batches can be retried safely.
+        """
+        items = request.data.get("jobs") if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not all(
+            isinstance(item, dict) and {"id", "task_id", "ok"} <= item.keys() for item in items
+        ):
+            return Response(
+                status=status.HTTP_400_BAD_REQUEST,
+                data={
+                    "status": "failed",
+                    "reason": "field `jobs` must be a list of objects with `id`, `task_id` and `ok`",
+                },
+            )
+
+        results = []
+        updated = []
+        now = timezone.now()
+        with transaction.atomic():
+            jobs = Job.objects.select_for_update().in_bulk([item["id"] for item in items])
+            for item in items:
+                job = jobs.get(item["id"])
+                new_status = Job.STATUS_DONE if item["ok"] else Job.STATUS_ERROR
+                if job is None:
+                    reason = "job not found"
+                elif job.celery_task_id != item["task_id"]:
+                    reason = "incorrect task_id"
+                elif job.status == new_status:
+                    reason = None  # already completed by a previous batch
+                elif job.status != Job.STATUS_RUNNING:
+                    reason = "job is not running"
+                else:
+                    reason = None
+                    job.status = new_status
+                    job.updated_at = now
+                    updated.append(job)
+                if reason is None:
+                    results.append({"id": item["id"], "status": "success"})
+                else:
+                    results.append({"id": item["id"], "status": "failed", "reason": reason})
+            Job.objects.bulk_update(updated, ["status", "updated_at"])
+        logger.info(f"bulk complete: {len(updated)} of {len(items)} jobs updated")
+        return Response({"status": "success", "results": results})
+
     @action(detail=True)
     def update_job_error(self, request, pk=None):
         if "task_id" not in request.data or "error" not in request.data:
@@ -111,6 +231,11 @@ class TrainingJobViewSet(ModelViewSet):
     serializer_class = TrainingJobSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["status", "task_id", "group_id"]
+    pagination_class = JobCursorPagination
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            serializer.save()
 
     @action(detail=True)
     def start(self, request, pk=None):
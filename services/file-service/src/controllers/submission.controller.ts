@@ -5,6 +5,7 @@ import archiver from "archiver";
 import { Submission } from "../models/Submission";
 import { cuid } from "../lib/ids";
 import { sha256 } from "../lib/hash";
+import { sendContent } from "../lib/range";
 
 // In-memory upload (DB-backed storage)
 const upload = multer({
@@ -133,12 +134,13 @@ export async function downloadSubmission(req: Request, res: Response) {
 
   res.setHeader("Content-Type", submission.mimetype);
   res.setHeader("Content-Length", submission.sizeBytes.toString());
+  res.setHeader("X-Checksum-Sha256", submission.checksumSha256);
   res.setHeader(
     "Content-Disposition",
     `attachment; filename="${submission.filename}"`
   );
 
-  return res.send(Buffer.from(submission.content));
+  return sendContent(req, res, Buffer.from(submission.content));
 }
 
 /**
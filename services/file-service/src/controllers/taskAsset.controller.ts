@@ -4,6 +4,7 @@ import multer from "multer";
 import { TaskAsset, TaskAssetAttrs } from "../models/TaskAsset";
 import { cuid } from "../lib/ids";
 import { sha256 } from "../lib/hash";
+import { sendContent } from "../lib/range";
 
 // Memory upload (files are stored in DB)
 const upload = multer({
@@ -211,12 +212,14 @@ export async function downloadGrader(req: Request, res: Response) {
 
   res.setHeader("Content-Type", asset.mimetype);
   res.setHeader("Content-Length", asset.sizeBytes.toString());
+  res.setHeader("X-Checksum-Sha256", asset.checksumSha256);
+  res.setHeader("ETag", `"${asset.checksumSha256}"`);
   res.setHeader(
     "Content-Disposition",
     `attachment; filename="${asset.filename}"`
   );
 
-  return res.send(Buffer.from(asset.content));
+  return sendContent(req, res, Buffer.from(asset.content));
 }
 
 /**
@@ -235,12 +238,14 @@ export async function downloadTemplate(req: Request, res: Response) {
 
   res.setHeader("Content-Type", asset.mimetype);
   res.setHeader("Content-Length", asset.sizeBytes.toString());
+  res.setHeader("X-Checksum-Sha256", asset.checksumSha256);
+  res.setHeader("ETag", `"${asset.checksumSha256}"`);
   res.setHeader(
     "Content-Disposition",
     `attachment; filename="${asset.filename}"`
   );
 
-  return res.send(Buffer.from(asset.content));
+  return sendContent(req, res, Buffer.from(asset.content));
 }
 
 /**
@@ -255,11 +260,13 @@ export async function downloadTrainer(req: Request, res: Response) {
   }
   res.setHeader("Content-Type", asset.mimetype);
   res.setHeader("Content-Length", asset.sizeBytes.toString());
+  res.setHeader("X-Checksum-Sha256", asset.checksumSha256);
+  res.setHeader("ETag", `"${asset.checksumSha256}"`);
   res.setHeader(
     "Content-Disposition",
     `attachment; filename="${asset.filename}"`
   );
-  return res.send(Buffer.from(asset.content));
+  return sendContent(req, res, Buffer.from(asset.content));
 }
 
 /** 
@@ -275,10 +282,12 @@ export async function downloadTrainingTemplate(req: Request, res: Response) {
 
   res.setHeader("Content-Type", asset.mimetype);
   res.setHeader("Content-Length", asset.sizeBytes.toString());
+  res.setHeader("X-Checksum-Sha256", asset.checksumSha256);
+  res.setHeader("ETag", `"${asset.checksumSha256}"`);
   res.setHeader(
     "Content-Disposition",
     `attachment; filename="${asset.filename}"`
   );
 
-  return res.send(Buffer.from(asset.content));
+  return sendContent(req, res, Buffer.from(asset.content));
 }
@@ -0,0 +1,27 @@
+import { Request, Response } from "express";
+
+/**
+ * Send a stored file, or the single byte range of it asked for with a `Range` header (206),
+ * so that interrupted downloads can be resumed. Requests for several ranges get the whole file.
+ */
+export function sendContent(req: Request, res: Response, content: Buffer) {
+  res.setHeader("Accept-Ranges", "bytes");
+  const ranges = req.range(content.length);
+
+  if (ranges === -1) {
+    // the controllers set Content-Length to the size of the whole file, but a 416 has no body
+    res.removeHeader("Content-Length");
+    res.setHeader("Content-Range", `bytes */${content.length}`);
+    return res.status(416).end();
+  }
+
+  if (Array.isArray(ranges) && ranges.type === "bytes" && ranges.length === 1) {
+    const { start, end } = ranges[0];
+    res.status(206);
+    res.setHeader("Content-Range", `bytes ${start}-${end}/${content.length}`);
+    res.setHeader("Content-Length", (end - start + 1).toString());
+    return res.send(content.subarray(start, end + 1));
+  }
+
+  return res.send(content);
+}
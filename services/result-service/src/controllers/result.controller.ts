@@ -3,12 +3,11 @@ import { Result } from "../models/Result";
 import { StudentSelection } from "../models/StudentSelection";
 
 /**
- * Create or update a result.
- * @param req - The request object.
- * @param res - The response object.
- * @returns The created or updated result.
+ * Insert a result, or update the existing result of the same submission.
+ * @param body - The result fields.
+ * @returns The created or updated row and whether it was created.
  */
-export async function createOrUpdateResult(req: Request, res: Response) {
+async function upsertResult(body: any): Promise<[Result, boolean]> {
   const {
     submissionId,
     evalRunId,
@@ -19,50 +18,62 @@ export async function createOrUpdateResult(req: Request, res: Response) {
     metrics = null,
     error = null,
     artifactsUri = null,
-  } = req.body;
+  } = body;
 
-  try {
-    const [row, created] = await Result.findOrCreate({
-      where: { submissionId },
-      defaults: {
-        submissionId,
-        evalRunId,
-        groupId,
-        taskId,
-        status,
-        score,
-        metrics,
-        error,
-        artifactsUri,
-      },
+  const [row, created] = await Result.findOrCreate({
+    where: { submissionId },
+    defaults: {
+      submissionId,
+      evalRunId,
+      groupId,
+      taskId,
+      status,
+      score,
+      metrics,
+      error,
+      artifactsUri,
+    },
+  });
+
+  if (!created) {
+    await row.update({
+      evalRunId,
+      status,
+      score,
+      metrics,
+      error,
+      artifactsUri,
     });
+  }
 
-    if (!created) {
-      await row.update({
-        evalRunId,
-        status,
-        score,
-        metrics,
-        error,
-        artifactsUri,
-      });
-    }
+  console.log("Result processed:", row.id);
 
-    console.log("Result processed:", row.id);
+  if (taskId && groupId) {
+    console.log("Handling student selection for result:", row.id);
+    await handleStudentSelectionForResult(
+      String(taskId),
+      String(groupId),
+      row.id
+    );
+    console.log("Student selection handled for result:", row.id);
+  }
 
-    if (taskId && groupId) {
-      console.log("Handling student selection for result:", row.id);
-      await handleStudentSelectionForResult(
-        String(taskId),
-        String(groupId),
-        row.id
-      );
-      console.log("Student selection handled for result:", row.id);
-    }
+  return [row, created];
+}
+
+/**
+ * Create or update a result.
+ * @param req - The request object.
+ * @param res - The response object.
+ * @returns The created or updated result.
+ */
+export async function createOrUpdateResult(req: Request, res: Response) {
+  try {
+    const [row, created] = await upsertResult(req.body);
 
     return res.status(created ? 201 : 200).json({
       data: row,
-      meta: { created, idempotentKey: { submissionId } },
+      meta: { created, idempotentKey: { submissionId: req.body.submissionId } },
     });
   } catch (e: any) {
     return res
@@ -71,6 +82,40 @@ export async function createOrUpdateResult(req: Request, res: Response) {
   }
 }
 
+/**
+ * Create or update many results at once. Each result is upserted by
+ * submissionId like in createOrUpdateResult, so a batch can be sent again
+ * safely. Results are processed in order; a failing result does not stop the
+ * others and is reported in its own entry.
+ * @param req - The request object, with the results in `results`.
+ * @param res - The response object.
+ * @returns One entry per result, in the order of the request.
+ */
+export async function bulkCreateOrUpdateResults(req: Request, res: Response) {
+  const { results } = req.body;
+  if (!Array.isArray(results)) {
+    return res.status(400).json({
+      error: { code: "INVALID_BODY", message: "`results` must be an array" },
+    });
+  }
+
+  const data = [];
+  for (const body of results) {
+    try {
+      const [row, created] = await upsertResult(body);
+      data.push({ ok: true, id: row.id, created, submissionId: body.submissionId });
+    } catch (e: any) {
+      data.push({ ok: false, error: e.message, submissionId: body?.submissionId });
+    }
+  }
+
+  const failed = data.filter((item) => !item.ok).length;
+  return res.status(200).json({
+    data,
+    meta: { total: data.length, failed },
+  });
+}
+
 /**
  * Get a result by ID.
  * @param req - The request object.
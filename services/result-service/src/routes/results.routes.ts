@@ -1,6 +1,7 @@
 import { Router } from "express";
 import {
   createOrUpdateResult,
+  bulkCreateOrUpdateResults,
   getResultById,
   listResults,
 } from "../controllers/result.controller";
@@ -8,6 +9,7 @@ import {
 const router = Router();
 
 router.post("/results", createOrUpdateResult);
+router.post("/results/bulk", bulkCreateOrUpdateResults);
 router.get("/results/:id", getResultById);
 router.get("/results", listResults);
 